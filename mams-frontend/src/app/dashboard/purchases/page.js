@@ -11,6 +11,9 @@ export default function PurchasesPage() {
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
     const [isModalOpen, setIsModalOpen] = useState(false);
+    const [nextPage, setNextPage] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
+    const [loadMoreError, setLoadMoreError] = useState(null);
     const { isAuthenticated } = useAuth();
 
     // Function to fetch purchases
@@ -19,7 +22,8 @@ export default function PurchasesPage() {
             setLoading(true);
             setError(null);
             const response = await api.get('/assets/purchases/');
-            setPurchases(response.data);
+            setPurchases(response.data.results);
+            setNextPage(response.data.next);
         } catch (err) {
             console.error("Failed to fetch purchases:", err);
             if (err.response?.status === 401) {
@@ -32,6 +36,22 @@ export default function PurchasesPage() {
         }
     };
 
+    // Follow the `next` cursor of the last page and append its rows
+    const loadMore = async () => {
+        try {
+            setLoadingMore(true);
+            setLoadMoreError(null);
+            const response = await api.get(nextPage);
+            setPurchases((rows) => [...rows, ...response.data.results]);
+            setNextPage(response.data.next);
+        } catch (err) {
+            console.error("Failed to fetch more purchase records:", err);
+            setLoadMoreError('Failed to fetch more purchase records.');
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     useEffect(() => {
         // Only fetch data if user is authenticated
         if (!isAuthenticated) {
@@ -102,6 +122,21 @@ export default function PurchasesPage() {
                     </tbody>
                 </table>
             </div>
+
+            {(nextPage || loadMoreError) && (
+                <div className="flex flex-col items-center mt-4">
+                    {loadMoreError && <p className="text-red-500 mb-2">{loadMoreError}</p>}
+                    {nextPage && (
+                        <button
+                            onClick={loadMore}
+                            disabled={loadingMore}
+                            className="bg-gray-200 text-gray-800 px-4 py-2 rounded-md hover:bg-gray-300 disabled:opacity-50"
+                        >
+                            {loadingMore ? 'Loading...' : 'Load more'}
+                        </button>
+                    )}
+                </div>
+            )}
             <PurchaseFormModal
                 isOpen={isModalOpen}
                 onClose={() => setIsModalOpen(false)}
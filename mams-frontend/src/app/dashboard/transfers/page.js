@@ -12,6 +12,9 @@ export default function TransfersPage() {
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
     const [isModalOpen, setIsModalOpen] = useState(false);
+    const [nextPage, setNextPage] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
+    const [loadMoreError, setLoadMoreError] = useState(null);
     const { isAuthenticated } = useAuth();
 
     const fetchTransfers = async () => {
@@ -20,7 +23,8 @@ export default function TransfersPage() {
             setError(null);
             // Assuming the endpoint is /api/logistics/transfers/
             const response = await api.get('/logistics/transfers/');
-            setTransfers(response.data);
+            setTransfers(response.data.results);
+            setNextPage(response.data.next);
         } catch (err) {
             console.error("Failed to fetch transfers:", err);
             if (err.response?.status === 401) {
@@ -33,6 +37,22 @@ export default function TransfersPage() {
         }
     };
 
+    // Follow the `next` cursor of the last page and append its rows
+    const loadMore = async () => {
+        try {
+            setLoadingMore(true);
+            setLoadMoreError(null);
+            const response = await api.get(nextPage);
+            setTransfers((rows) => [...rows, ...response.data.results]);
+            setNextPage(response.data.next);
+        } catch (err) {
+            console.error("Failed to fetch more transfer records:", err);
+            setLoadMoreError('Failed to fetch more transfer records.');
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     useEffect(() => {
         // Only fetch data if user is authenticated
         if (!isAuthenticated) {
@@ -105,6 +125,21 @@ export default function TransfersPage() {
                 </table>
             </div>
 
+            {(nextPage || loadMoreError) && (
+                <div className="flex flex-col items-center mt-4">
+                    {loadMoreError && <p className="text-red-500 mb-2">{loadMoreError}</p>}
+                    {nextPage && (
+                        <button
+                            onClick={loadMore}
+                            disabled={loadingMore}
+                            className="bg-gray-200 text-gray-800 px-4 py-2 rounded-md hover:bg-gray-300 disabled:opacity-50"
+                        >
+                            {loadingMore ? 'Loading...' : 'Load more'}
+                        </button>
+                    )}
+                </div>
+            )}
+
             <TransferFormModal
                 isOpen={isModalOpen}
                 onClose={() => setIsModalOpen(false)}
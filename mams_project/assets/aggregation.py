@@ -0,0 +1,156 @@
+from datetime import timedelta
+
+from django.db import connections
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import AssetInventory, DailyMovementRollup
+
+# Figures returned by dashboard_totals(), paired with the column that feeds
+# each one. The closing balance comes from AssetInventory (shards included),
+# the movements from the daily rollup table.
+SUMMARY_COLUMNS = (
+    ('closing_balance', 'stock'),
+    ('purchases', 'purchases'),
+    ('transfers_in', 'transfers_in'),
+    ('transfers_out', 'transfers_out'),
+    ('assigned', 'assignments'),
+    ('expended', 'expenditures'),
+)
+SUMMARY_FIELDS = tuple(field for field, column in SUMMARY_COLUMNS)
+
+
+def summary_querysets(base_id=None, equipment_type_id=None, start_date=None, end_date=None):
+    """
+    Build the filtered (inventory, rollup) querysets behind the dashboard.
+    Both dates are inclusive. The inventory rows are annotated with their
+    `stock`, shards included; the rollup may hold several rows per day for
+    a given base and equipment type, so its figures are always summed.
+    """
+    scope = {}
+    if base_id:
+        scope['base_id'] = base_id
+    if equipment_type_id:
+        scope['equipment_type_id'] = equipment_type_id
+
+    inventory = AssetInventory.objects.with_stock().filter(**scope)
+    rollups = DailyMovementRollup.objects.filter(**scope)
+    if start_date:
+        rollups = rollups.filter(day__gte=start_date)
+    if end_date:
+        rollups = rollups.filter(day__lte=end_date)
+    return inventory, rollups
+
+
+def dashboard_totals(base_id=None, equipment_type_id=None, start_date=None, end_date=None):
+    """
+    Compute every dashboard figure in a single database round trip.
+
+    The inventory and rollup querysets are stitched together with UNION ALL,
+    each branch padding the columns it does not feed with zeros, and summed
+    column by column. Returns a dict keyed by SUMMARY_FIELDS with 0 for
+    empty sums.
+    """
+    inventory, rollups = summary_querysets(base_id, equipment_type_id, start_date, end_date)
+    movement_columns = [column for field, column in SUMMARY_COLUMNS[1:]]
+
+    # Run on the database the router picks for these reads (a replica
+    # inside replica_reads())
+    alias = inventory.db
+    inventory_sql, inventory_params = inventory.values_list('stock').query.get_compiler(alias).as_sql()
+    rollup_sql, rollup_params = rollups.values_list(*movement_columns).query.get_compiler(alias).as_sql()
+
+    # The first UNION branch names the columns for the whole union.
+    padding = ', '.join(f'0 AS {column}' for column in movement_columns)
+    rollup_select = ', '.join(f'rollup.{column}' for column in movement_columns)
+    totals = ', '.join(f'COALESCE(SUM(movements.{column}), 0)' for field, column in SUMMARY_COLUMNS)
+    sql = (
+        f'SELECT {totals} FROM ('
+        f'SELECT inventory.stock AS stock, {padding} FROM ({inventory_sql}) inventory'
+        f' UNION ALL '
+        f'SELECT 0, {rollup_select} FROM ({rollup_sql}) rollup'
+        f') movements'
+    )
+
+    with connections[alias].cursor() as cursor:
+        cursor.execute(sql, inventory_params + rollup_params)
+        row = cursor.fetchone()
+    return {field: int(value) for field, value in zip(SUMMARY_FIELDS, row)}
+
+
+# Chart bucket sizes: how the rollup day is truncated in SQL, how a Python
+# date is truncated to the same bucket, and how many buckets apart two bucket
+# starts are. Weeks start on Monday, as with TruncWeek.
+SERIES_INTERVALS = {
+    'day': (F('day'), lambda day: day, lambda first, bucket: (bucket - first).days),
+    'week': (
+        TruncWeek('day'),
+        lambda day: day - timedelta(days=day.weekday()),
+        lambda first, bucket: (bucket - first).days // 7,
+    ),
+    'month': (
+        TruncMonth('day'),
+        lambda day: day.replace(day=1),
+        lambda first, bucket: (bucket.year - first.year) * 12 + bucket.month - first.month,
+    ),
+}
+SERIES_COLUMNS = ('purchases', 'transfers_in', 'transfers_out', 'assignments', 'expenditures')
+SERIES_MAX_BUCKETS = 5000
+
+
+class TooManyBuckets(ValueError):
+    """The requested range holds more than SERIES_MAX_BUCKETS buckets."""
+
+
+def _bucket_starts(interval, first, count):
+    if interval == 'month':
+        months = first.year * 12 + first.month - 1
+        return [first.replace(year=month // 12, month=month % 12 + 1) for month in range(months, months + count)]
+    step = 7 if interval == 'week' else 1
+    return [first + timedelta(days=offset * step) for offset in range(count)]
+
+
+def movement_series(interval, base_id=None, equipment_type_id=None, start_date=None, end_date=None):
+    """
+    Movement totals per day, week or month over the dashboard filters, from
+    one grouped query over the daily rollup. Empty buckets are filled with
+    zeros: each column is allocated zeroed for the whole range and the
+    returned rows are written into it by their computed bucket offset, so
+    the work in Python is proportional to the rows, not the buckets.
+
+    Without start_date the series starts at the first bucket with data;
+    without end_date it runs to today. Returns (bucket starts, {column:
+    list of totals}).
+    """
+    truncate_sql, truncate, offset = SERIES_INTERVALS[interval]
+    last = truncate(end_date or timezone.localdate())
+
+    def bucket_count(first):
+        count = max(offset(first, last) + 1, 0)
+        if count > SERIES_MAX_BUCKETS:
+            raise TooManyBuckets(f"{count} {interval} buckets requested; the limit is {SERIES_MAX_BUCKETS}.")
+        return count
+
+    if start_date:
+        # Refuse oversized ranges before querying
+        bucket_count(truncate(start_date))
+    inventory, rollups = summary_querysets(base_id, equipment_type_id, start_date, end_date)
+    rows = list(
+        rollups.annotate(bucket=truncate_sql).values('bucket')
+        .annotate(**{f'total_{column}': Sum(column) for column in SERIES_COLUMNS})
+        .order_by('bucket').values_list('bucket', *(f'total_{column}' for column in SERIES_COLUMNS))
+    )
+    if not (start_date or rows):
+        return [], {column: [] for column in SERIES_COLUMNS}
+    first = truncate(start_date or rows[0][0])
+    if rows:
+        last = max(last, truncate(rows[-1][0]))
+    count = bucket_count(first)
+
+    columns = [[0] * count for column in SERIES_COLUMNS]
+    for bucket, *totals in rows:
+        position = offset(first, truncate(bucket))
+        for values, total in zip(columns, totals):
+            values[position] = int(total)
+    return _bucket_starts(interval, first, count), dict(zip(SERIES_COLUMNS, columns))
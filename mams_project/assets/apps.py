@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class AssetsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'assets'
+
+    def ready(self):
+        # Connect the reference-data cache invalidation and the
+        # reconciliation touch-tracking signals
+        from . import reconciliation, refcache  # noqa: F401
@@ -0,0 +1,129 @@
+import codecs
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.response import Response
+
+from mams_project import metrics
+from . import inventory
+from .rollups import record_movements
+
+
+class NDJSONParser(BaseParser):
+    """Parses newline-delimited JSON into a list of objects, skipping blank lines."""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        rows = []
+        for line_number, line in enumerate(codecs.getreader(encoding)(stream), start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError as exc:
+                raise ParseError(f"NDJSON parse error on line {line_number}: {exc}")
+        return rows
+
+
+class BulkCreateMixin:
+    """
+    Adds a `bulk/` action that ingests an array of records (JSON or NDJSON)
+    in one request: rows are validated with the viewset's serializer, the
+    records are written with bulk_create, and the net inventory change per
+    (base, equipment_type) is applied with a handful of set-based statements.
+
+    By default the whole batch is atomic and any invalid row rejects it.
+    With `?partial=true` valid rows are kept and only failing rows rejected;
+    a batch in which every row fails is still answered 400.
+    Viewsets implement bulk_movements() and may set the stock error message.
+    """
+    insufficient_stock_error = "Insufficient assets."
+
+    def bulk_movements(self, record):
+        """Return the (base_id, equipment_type_id, delta) inventory changes of `record`."""
+        raise NotImplementedError
+
+    def bulk_save_kwargs(self):
+        """Extra attributes set on every record, like serializer.save(**kwargs)."""
+        return {}
+
+    @action(detail=False, methods=['post'], url_path='bulk', parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request, *args, **kwargs):
+        rows = request.data
+        if not isinstance(rows, list):
+            raise ParseError("Expected a list of records.")
+        max_rows = getattr(settings, 'BULK_MAX_ROWS', 10000)
+        if len(rows) > max_rows:
+            raise ParseError(f"At most {max_rows} records can be submitted at once.")
+        partial = request.query_params.get('partial', '').lower() in ('1', 'true', 'yes')
+
+        # --- 1. Validate every row in one pass ---
+        errors = {}
+        records = {}
+        model = self.get_serializer_class().Meta.model
+        for index, row in enumerate(rows):
+            serializer = self.get_serializer(data=row)
+            if serializer.is_valid():
+                records[index] = model(**serializer.validated_data, **self.bulk_save_kwargs())
+            else:
+                errors[index] = serializer.errors
+
+        if errors and (not partial or not records):
+            return self._bulk_response(rows, {}, errors, status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            # --- 2. Replay the rows against locked inventory, in order ---
+            movements = {index: self.bulk_movements(record) for index, record in records.items()}
+            stock = inventory.lock(
+                (base_id, equipment_type_id)
+                for changes in movements.values() for base_id, equipment_type_id, delta in changes
+            )
+            balances = {pair: row.quantity for pair, row in stock.items()}
+            for index in list(records):
+                pending = defaultdict(int)
+                for base_id, equipment_type_id, delta in movements[index]:
+                    pending[base_id, equipment_type_id] += delta
+                if any(balances[pair] + delta < 0 for pair, delta in pending.items()):
+                    metrics.inventory_conflict(self.basename)
+                    errors[index] = {"error": self.insufficient_stock_error}
+                    del records[index]
+                    continue
+                for pair, delta in pending.items():
+                    balances[pair] += delta
+
+            if errors and (not partial or not records):
+                transaction.set_rollback(True)
+                return self._bulk_response(rows, {}, errors, status.HTTP_400_BAD_REQUEST)
+
+            # --- 3. Write records, inventory and rollups set-wise ---
+            created = model.objects.bulk_create(records.values())
+            changed = [row for pair, row in stock.items() if row.quantity != balances[pair]]
+            for row in changed:
+                row.quantity = balances[(row.base_id, row.equipment_type_id)]
+            inventory.save_quantities(changed)
+            record_movements(created)
+
+        return self._bulk_response(rows, dict(zip(records, created)), errors, status.HTTP_201_CREATED)
+
+    def _bulk_response(self, rows, created, errors, status_code):
+        results = []
+        for index in range(len(rows)):
+            if index in created:
+                results.append({"index": index, "status": "created", "id": created[index].pk})
+            elif index in errors:
+                results.append({"index": index, "status": "rejected", "errors": errors[index]})
+            else:
+                results.append({"index": index, "status": "skipped"})
+        return Response({
+            "created": len(created),
+            "rejected": len(errors),
+            "results": results,
+        }, status=status_code)
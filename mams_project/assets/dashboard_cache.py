@@ -0,0 +1,148 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from mams_project.shared_cache import is_shared
+
+# Every cached summary embeds the version counter of the base it covers (or
+# of the all-bases scope) plus a global epoch. Writes bump the counters of the
+# bases they touch and the all-bases counter, so stale entries simply stop
+# being addressed and age out; nothing has to be deleted. The counters only
+# reach other workers through a shared cache: with a process-local one,
+# summaries are kept for at most LOCAL_CACHE_MAX_TIMEOUT seconds, which bounds
+# how long a write made in another process (e.g. the transfer queue) goes
+# unseen.
+VERSION_KEY = 'dashboard:version:{scope}'
+EPOCH_KEY = 'dashboard:epoch'
+SUMMARY_KEY = 'dashboard:{kind}:{scope}:v{version}:e{epoch}:{equipment_type}:{start_date}:{end_date}'
+BUMPED_KEY = 'dashboard:bumped:{scope}'
+HITS_KEY = 'dashboard:stats:hits'
+MISSES_KEY = 'dashboard:stats:misses'
+ALL_BASES = 'all'
+
+
+def _alias():
+    return getattr(settings, 'DASHBOARD_CACHE_ALIAS', 'default')
+
+
+def _cache():
+    return caches[_alias()]
+
+
+def shared():
+    """Whether the version counters are seen by every process."""
+    return is_shared(_alias())
+
+
+def _timeout():
+    timeout = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300)
+    if not shared():
+        timeout = min(timeout, getattr(settings, 'LOCAL_CACHE_MAX_TIMEOUT', 5))
+    return timeout
+
+
+def _seed():
+    # Counters are seeded from the clock so a counter that was evicted can
+    # never restart at a value an older cache entry was stored under.
+    return time.time_ns()
+
+
+def _incr(cache, key, initial):
+    """Atomically increment a counter, creating it at `initial` on first use."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, initial, timeout=None):
+            return initial
+        return cache.incr(key)
+
+
+def _versions(cache, keys):
+    """Read the given version counters in one cache call, seeding missing ones."""
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            cache.add(key, _seed(), timeout=None)
+            values[key] = cache.get(key)
+    return values
+
+
+def summary_key(base_id, equipment_type_id, start_date, end_date, kind='summary'):
+    """
+    Build the cache key for one set of effective dashboard filters. `kind`
+    separates the summary from other figures cached under the same filters.
+    """
+    cache = _cache()
+    scope = base_id or ALL_BASES
+    version_key = VERSION_KEY.format(scope=scope)
+    versions = _versions(cache, [version_key, EPOCH_KEY])
+    return SUMMARY_KEY.format(
+        kind=kind,
+        scope=scope,
+        version=versions[version_key],
+        epoch=versions[EPOCH_KEY],
+        equipment_type=equipment_type_id or 'all',
+        start_date=start_date.isoformat() if start_date else '',
+        end_date=end_date.isoformat() if end_date else '',
+    )
+
+
+def get_summary(key):
+    """Return the cached summary for `key`, or None, recording a hit or miss."""
+    cache = _cache()
+    data = cache.get(key)
+    _incr(cache, HITS_KEY if data is not None else MISSES_KEY, 1)
+    return data
+
+
+def set_summary(key, data):
+    _cache().set(key, data, _timeout())
+
+
+def _mark_bumped(cache, scopes):
+    # Flags that expire once replicas can be expected to have caught up
+    window = getattr(settings, 'REPLICA_LAG_WINDOW', 2)
+    if window > 0:
+        cache.set_many({BUMPED_KEY.format(scope=scope): True for scope in scopes}, timeout=window)
+
+
+def bump_bases(base_ids):
+    """Invalidate cached summaries covering any of `base_ids`, and the all-bases ones."""
+    cache = _cache()
+    scopes = {*base_ids, ALL_BASES}
+    for scope in scopes:
+        _incr(cache, VERSION_KEY.format(scope=scope), _seed())
+    _mark_bumped(cache, scopes)
+
+
+def bump_all():
+    """Invalidate every cached summary, e.g. after the rollup table is rebuilt."""
+    cache = _cache()
+    _incr(cache, EPOCH_KEY, _seed())
+    _mark_bumped(cache, ['epoch'])
+
+
+def recently_bumped(base_id):
+    """
+    Whether the scope of `base_id` (or all bases) was invalidated within the
+    last REPLICA_LAG_WINDOW seconds. Figures a replica computes in that
+    window may predate the write behind the bump, so they must not be cached
+    or tagged under the new version.
+    """
+    scopes = [base_id or ALL_BASES, 'epoch']
+    return bool(_cache().get_many([BUMPED_KEY.format(scope=scope) for scope in scopes]))
+
+
+def stats():
+    """Return the hit/miss counters accumulated since they were last reset."""
+    cache = _cache()
+    counts = cache.get_many([HITS_KEY, MISSES_KEY])
+    return {
+        'hits': counts.get(HITS_KEY, 0),
+        'misses': counts.get(MISSES_KEY, 0),
+    }
+
+
+def reset_stats():
+    _cache().delete_many([HITS_KEY, MISSES_KEY])
@@ -0,0 +1,105 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from . import refcache, search
+from .rollups import LEDGERS
+from .scoping import date_bounds
+
+
+def _int(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: "A whole number is required."})
+
+
+def _date(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: "A date in YYYY-MM-DD format is required."})
+    return parsed
+
+
+class ListFilterBackend(BaseFilterBackend):
+    """
+    Query-string filters for the list endpoints, applied after role-based
+    scoping and before pagination.
+
+    Every ledger takes the dashboard's filters, on the columns its
+    composite indexes lead with: base (any of the model's base_fields),
+    equipment_type, category, start_date and end_date (inclusive, on the
+    ledger's date), plus min_quantity and max_quantity. A category is
+    resolved to its equipment type ids in memory, so it narrows the same
+    equipment_type column rather than joining.
+
+    Viewsets declare:
+      filter_fields -- {param: ORM lookup} exact filters of their own,
+                       e.g. {'vendor': 'vendor'}
+      search_fields -- text fields `search` (word prefix) and `fuzzy`
+                       match; see assets/search.py
+      search_cache  -- a ReferenceCache to search in memory instead
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        for param, lookup in getattr(view, 'filter_fields', {}).items():
+            if params.get(param):
+                try:
+                    queryset = queryset.filter(**{lookup: params[param]})
+                except (ValueError, DjangoValidationError):
+                    raise ValidationError({param: "Invalid value."})
+        if queryset.model in LEDGERS:
+            queryset = self.filter_ledger(params, queryset)
+        term, fuzzy = params.get('fuzzy') or params.get('search'), bool(params.get('fuzzy'))
+        if term and getattr(view, 'search_fields', ()):
+            queryset = self.search(view, queryset, term, fuzzy)
+        return queryset
+
+    def filter_ledger(self, params, queryset):
+        base_id = _int(params, 'base')
+        if base_id is not None:
+            queryset = queryset.for_base(base_id)
+        equipment_type_id = _int(params, 'equipment_type')
+        if equipment_type_id is not None:
+            queryset = queryset.filter(equipment_type_id=equipment_type_id)
+        if params.get('category'):
+            category = params['category'].lower()
+            queryset = queryset.filter(equipment_type_id__in=[
+                row.pk for row in refcache.equipment_types.all() if row.category.lower() == category
+            ])
+
+        date_field = LEDGERS[queryset.model][0]
+        lower, upper = date_bounds(_date(params, 'start_date'), _date(params, 'end_date'))
+        if lower:
+            queryset = queryset.filter(**{f'{date_field}__gte': lower})
+        if upper:
+            queryset = queryset.filter(**{f'{date_field}__lt': upper})
+
+        min_quantity, max_quantity = _int(params, 'min_quantity'), _int(params, 'max_quantity')
+        if min_quantity is not None:
+            queryset = queryset.filter(quantity__gte=min_quantity)
+        if max_quantity is not None:
+            queryset = queryset.filter(quantity__lte=max_quantity)
+        return queryset
+
+    def search(self, view, queryset, term, fuzzy):
+        reference = getattr(view, 'search_cache', None)
+        if reference is not None:
+            rows = search.search_rows(reference.all(), view.search_fields, term, fuzzy)
+            return queryset.filter(pk__in=[row.pk for row in rows])
+        matches = None
+        for field in view.search_fields:
+            found = search.search(queryset, field, term, fuzzy)
+            matches = found if matches is None else matches | found
+        return matches
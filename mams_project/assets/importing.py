@@ -0,0 +1,271 @@
+import csv
+import hashlib
+import io
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, time
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import EquipmentType, ImportCheckpoint, PurchaseRecord
+from .rollups import LEDGERS, explicit_ledger_dates
+from logistics.models import AssignmentRecord, ExpenditureRecord, TransferRecord
+from users.models import Base, User
+
+
+class RejectedRecord(ValueError):
+    """A source record that cannot be imported; the message says why."""
+
+
+@dataclass
+class LedgerFormat:
+    """
+    Columns of one ledger's import file. The layout is that of the ledger's
+    export (`export/csv/`, `export/ndjson/`), so an export can be loaded back
+    as-is; id columns are ignored and references are resolved by name.
+    """
+    model: type
+    bases: dict                      # column -> FK attname
+    users: dict = field(default_factory=dict)
+    optional_users: tuple = ()
+    text: dict = field(default_factory=dict)  # column -> default
+
+    @property
+    def date_field(self):
+        return LEDGERS[self.model][0]
+
+
+LEDGER_FORMATS = {
+    'purchases': LedgerFormat(PurchaseRecord, {'base': 'base_id'}, text={'vendor': ''}),
+    'transfers': LedgerFormat(
+        TransferRecord, {'from_base': 'from_base_id', 'to_base': 'to_base_id'},
+        users={'initiated_by': 'initiated_by_id'}, optional_users=('initiated_by',),
+        text={'status': TransferRecord.Status.COMPLETED},
+    ),
+    'assignments': LedgerFormat(
+        AssignmentRecord, {'issuing_base': 'issuing_base_id'}, users={'assigned_to': 'assigned_to_id'},
+    ),
+    'expenditures': LedgerFormat(ExpenditureRecord, {'base': 'base_id'}, text={'notes': ''}),
+}
+
+
+def read_records(path):
+    """Yield the records of a CSV or NDJSON file one at a time, as dicts."""
+    if path.endswith(('.ndjson', '.jsonl')):
+        with open(path, encoding='utf-8') as source:
+            for line_number, line in enumerate(source, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError as exc:
+                    yield RejectedRecord(f"line {line_number}: invalid JSON ({exc})")
+    else:
+        with open(path, encoding='utf-8', newline='') as source:
+            yield from csv.DictReader(source)
+
+
+def fingerprint(path):
+    """Identify a source file by its size and leading megabyte."""
+    digest = hashlib.sha256(str(os.path.getsize(path)).encode())
+    with open(path, 'rb') as source:
+        digest.update(source.read(1 << 20))
+    return digest.hexdigest()
+
+
+class NameMap:
+    """
+    In-memory name -> id lookups for bases, equipment types and users, loaded
+    once per import. With `create_missing`, unknown bases and equipment types
+    are created on first sight instead of rejecting the record.
+    """
+
+    def __init__(self, create_missing=False):
+        self.create_missing = create_missing
+        self.bases = dict(Base.objects.values_list('name', 'id'))
+        self.users = dict(User.objects.values_list('username', 'id'))
+        self.equipment_types = {}
+        for equipment_id, name, category in EquipmentType.objects.order_by('id').values_list('id', 'name', 'category'):
+            self.equipment_types.setdefault((name, category), equipment_id)
+            self.equipment_types.setdefault((name, None), equipment_id)
+
+    def base(self, name):
+        if name not in self.bases:
+            if not self.create_missing:
+                raise RejectedRecord(f"unknown base {name!r}")
+            self.bases[name] = Base.objects.get_or_create(name=name)[0].pk
+        return self.bases[name]
+
+    def equipment_type(self, name, category):
+        key = (name, category or None)
+        if key not in self.equipment_types:
+            if not (self.create_missing and category):
+                raise RejectedRecord(f"unknown equipment type {name!r}")
+            equipment_id = EquipmentType.objects.get_or_create(name=name, category=category)[0].pk
+            self.equipment_types[key] = equipment_id
+            self.equipment_types.setdefault((name, None), equipment_id)
+        return self.equipment_types[key]
+
+    def user(self, username):
+        if username not in self.users:
+            raise RejectedRecord(f"unknown user {username!r}")
+        return self.users[username]
+
+
+def _parse_timestamp(value):
+    value = (value or '').strip()
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise RejectedRecord(f"invalid date {value!r}")
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _parse_quantity(value):
+    try:
+        quantity = int(value)
+    except (TypeError, ValueError):
+        raise RejectedRecord(f"invalid quantity {value!r}")
+    if quantity <= 0:
+        raise RejectedRecord(f"quantity must be positive, got {quantity}")
+    return quantity
+
+
+class LedgerImporter:
+    """
+    Load one source file into a ledger in chunks. Each chunk is inserted
+    (COPY on PostgreSQL, bulk_create elsewhere) and the file's checkpoint
+    advanced in one transaction; re-running after a crash skips the records
+    already committed. Dates are taken from the file, not from auto_now_add.
+    Inventory and rollups are not touched: rebuild them once loading is done.
+    """
+
+    def __init__(self, ledger, path, names, chunk_size=5000, rejects=None):
+        self.format = LEDGER_FORMATS[ledger]
+        self.ledger = ledger
+        self.path = os.path.abspath(path)
+        self.names = names
+        self.chunk_size = chunk_size
+        self.rejects = rejects
+        model = self.format.model
+        self.columns = [
+            model._meta.get_field(name).attname
+            for name in ('equipment_type', 'quantity', self.format.date_field)
+        ] + list(self.format.bases.values()) + list(self.format.users.values()) + list(self.format.text)
+        if model is PurchaseRecord:
+            self.columns.append('unit_price')
+
+    def checkpoint(self, restart=False):
+        checkpoint, created = ImportCheckpoint.objects.get_or_create(
+            ledger=self.ledger, source=self.path, defaults={'fingerprint': fingerprint(self.path)},
+        )
+        if restart and not created:
+            checkpoint.delete()
+            return self.checkpoint()
+        if checkpoint.fingerprint != fingerprint(self.path):
+            raise RejectedRecord(
+                f"{self.path} changed since its import started; use --restart to import it from the beginning"
+            )
+        return checkpoint
+
+    def convert(self, record):
+        """Map one source record to model column values, or raise RejectedRecord."""
+        if isinstance(record, RejectedRecord):
+            raise record
+        spec = self.format
+        values = {
+            'equipment_type_id': self.names.equipment_type(record.get('equipment_type'), record.get('category')),
+            'quantity': _parse_quantity(record.get('quantity')),
+            spec.date_field: _parse_timestamp(record.get(spec.date_field)),
+        }
+        for column, attname in spec.bases.items():
+            values[attname] = self.names.base(record.get(column))
+        for column, attname in spec.users.items():
+            username = record.get(column)
+            if not username and column in spec.optional_users:
+                values[attname] = None
+            else:
+                values[attname] = self.names.user(username)
+        for column, default in spec.text.items():
+            values[column] = record.get(column) or default
+        if spec.model is TransferRecord and values['status'] not in TransferRecord.Status.values:
+            raise RejectedRecord(f"invalid status {values['status']!r}")
+        if spec.model is PurchaseRecord:
+            price = record.get('unit_price')
+            try:
+                values['unit_price'] = Decimal(str(price)) if price not in (None, '') else None
+            except InvalidOperation:
+                raise RejectedRecord(f"invalid unit_price {price!r}")
+        if 'from_base_id' in values and values['from_base_id'] == values['to_base_id']:
+            raise RejectedRecord("source and destination base are the same")
+        return values
+
+    def load(self, rows):
+        model = self.format.model
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                if hasattr(cursor, 'copy_expert'):
+                    self.copy(cursor, rows)
+                    return
+        with explicit_ledger_dates():
+            model.objects.bulk_create([model(**row) for row in rows], batch_size=self.chunk_size)
+
+    def copy(self, cursor, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(['\\N' if row[column] is None else row[column] for column in self.columns])
+        buffer.seek(0)
+        table = connection.ops.quote_name(self.format.model._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(column) for column in self.columns)
+        cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+
+    def run(self, checkpoint, progress=None):
+        """Import the records after the checkpoint. Returns the checkpoint."""
+        records = read_records(self.path)
+        for _ in range(checkpoint.records_read):
+            next(records, None)
+
+        while True:
+            rows, rejected, read = [], [], 0
+            for record in records:
+                read += 1
+                try:
+                    rows.append(self.convert(record))
+                except RejectedRecord as exc:
+                    rejected.append({'record': checkpoint.records_read + read, 'error': str(exc), 'data': record})
+                if read == self.chunk_size:
+                    break
+            if not read:
+                break
+            if rejected and self.rejects is None:
+                first = rejected[0]
+                raise RejectedRecord(f"record {first['record']}: {first['error']}")
+
+            # The rejects are on disk before the checkpoint moves past them:
+            # a crash in between repeats them on resume rather than losing them
+            if rejected:
+                for entry in rejected:
+                    self.rejects.write(json.dumps(entry, default=str) + '\n')
+                self.rejects.flush()
+            with transaction.atomic():
+                if rows:
+                    self.load(rows)
+                checkpoint.records_read += read
+                checkpoint.records_imported += len(rows)
+                checkpoint.records_rejected += len(rejected)
+                checkpoint.save()
+            if progress:
+                progress(checkpoint)
+
+        checkpoint.completed = True
+        checkpoint.save(update_fields=['completed', 'updated_at'])
+        return checkpoint
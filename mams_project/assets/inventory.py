@@ -0,0 +1,276 @@
+import time
+from functools import reduce
+from itertools import groupby
+from operator import or_
+
+from django.db import connection, transaction
+from django.db.models import F, Q
+
+from . import dashboard_cache, sharding
+from .models import AssetInventory, DailyMovementRollup, InventoryShard
+from .rollups import net_movement_sql
+
+
+class InsufficientStock(Exception):
+    """Raised when a base does not hold enough of an equipment type."""
+
+
+def stock(base_id, equipment_type_id):
+    """What a pair holds right now, shards included, read without locking."""
+    return AssetInventory.objects.with_stock().filter(
+        base_id=base_id, equipment_type_id=equipment_type_id
+    ).values_list('stock', flat=True).first() or 0
+
+
+def withdraw(base_id, equipment_type_id, quantity):
+    """
+    Decrement stock in a single conditional UPDATE. The row is only touched if
+    it holds at least `quantity`, so concurrent requests can never overdraw it;
+    zero rows affected means there was not enough stock. Sharded pairs are
+    decremented through their shards instead.
+    """
+    if sharding.sharded_pairs.get(base_id, equipment_type_id) and _withdraw_from_shards(
+        base_id, equipment_type_id, quantity
+    ):
+        return
+    if _withdraw_from_row(base_id, equipment_type_id, quantity):
+        return
+    # The pair may have been sharded since this process last looked, and
+    # demoted again since the UPDATE above
+    if _withdraw_from_shards(base_id, equipment_type_id, quantity):
+        return
+    if not _withdraw_from_row(base_id, equipment_type_id, quantity):
+        raise InsufficientStock()
+
+
+def _withdraw_from_row(base_id, equipment_type_id, quantity):
+    """Take `quantity` from an unsharded pair's row; False if it holds too little or is sharded."""
+    started = time.monotonic()
+    updated = AssetInventory.objects.filter(
+        base_id=base_id, equipment_type_id=equipment_type_id, shards=0, quantity__gte=quantity
+    ).update(quantity=F('quantity') - quantity)
+    if updated:
+        sharding.observe(base_id, equipment_type_id, time.monotonic() - started)
+    return bool(updated)
+
+
+def _withdraw_from_shards(base_id, equipment_type_id, quantity):
+    """
+    Take `quantity` from a sharded pair. Returns False if the pair has no
+    shards; raises InsufficientStock if they hold too little between them.
+    """
+    shards = InventoryShard.objects.filter(base_id=base_id, equipment_type_id=equipment_type_id)
+    # One random shard that holds enough on its own, skipping the shards
+    # other requests have locked
+    shard_id = (
+        shards.filter(quantity__gte=quantity).select_for_update(skip_locked=True)
+        .order_by('?').values_list('pk', flat=True).first()
+    )
+    if shard_id is not None and shards.filter(pk=shard_id, quantity__gte=quantity).update(
+        quantity=F('quantity') - quantity
+    ):
+        sharding.record_write(base_id, equipment_type_id)
+        return True
+
+    # None is free or holds enough alone: lock them all, take the quantity
+    # from their total and spread what is left evenly again, so the next
+    # withdrawals find a shard that can serve them.
+    rows = list(shards.select_for_update().order_by('shard'))
+    if not rows:
+        return False
+    total = sum(row.quantity for row in rows)
+    if total < quantity:
+        raise InsufficientStock()
+    for row, share in zip(rows, sharding.split(total - quantity, len(rows))):
+        row.quantity = share
+    InventoryShard.objects.bulk_update(rows, ['quantity'])
+    sharding.record_write(base_id, equipment_type_id)
+    return True
+
+
+def deposit(base_id, equipment_type_id, quantity):
+    """
+    Increment stock, creating the inventory row if needed, in a single upsert.
+    Sharded pairs are incremented through one of their shards instead.
+    """
+    if sharding.sharded_pairs.get(base_id, equipment_type_id) and _deposit_to_shards(
+        base_id, equipment_type_id, quantity
+    ):
+        return
+    started = time.monotonic()
+    table = connection.ops.quote_name(AssetInventory._meta.db_table)
+    if connection.features.supports_update_conflicts_with_target:
+        # The row of a sharded pair is left as it is (no row counts as written)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (base_id, equipment_type_id, quantity, shards) VALUES (%s, %s, %s, 0) "
+                f"ON CONFLICT (equipment_type_id, base_id) "
+                f"DO UPDATE SET quantity = {table}.quantity + EXCLUDED.quantity WHERE {table}.shards = 0",
+                [base_id, equipment_type_id, quantity],
+            )
+            written = cursor.rowcount
+    else:
+        # Backends without ON CONFLICT: update, and create the row on first use.
+        written = AssetInventory.objects.filter(
+            base_id=base_id, equipment_type_id=equipment_type_id, shards=0
+        ).update(quantity=F('quantity') + quantity)
+    if written:
+        sharding.observe(base_id, equipment_type_id, time.monotonic() - started)
+        return
+    if _deposit_to_shards(base_id, equipment_type_id, quantity):
+        return
+    # No row yet, or the pair was demoted after the upsert
+    if not AssetInventory.objects.filter(base_id=base_id, equipment_type_id=equipment_type_id).update(
+        quantity=F('quantity') + quantity
+    ):
+        AssetInventory.objects.create(base_id=base_id, equipment_type_id=equipment_type_id, quantity=quantity)
+
+
+def _deposit_to_shards(base_id, equipment_type_id, quantity):
+    """Add `quantity` to a random shard of the pair. Returns False if the pair has no shards."""
+    shards = InventoryShard.objects.filter(base_id=base_id, equipment_type_id=equipment_type_id)
+    increment = {'quantity': F('quantity') + quantity}
+    # Shard 0 always exists; it takes the stock if the picked shard does not
+    shard = sharding.pick_shard(base_id, equipment_type_id)
+    if shards.filter(shard=shard).update(**increment) or (shard and shards.filter(shard=0).update(**increment)):
+        sharding.record_write(base_id, equipment_type_id)
+        return True
+    return False
+
+
+def move(from_base_id, to_base_id, equipment_type_id, quantity):
+    """
+    Move stock between two bases. The two rows are always written in
+    ascending base id order, so transfers running in opposite directions
+    lock them in the same order and cannot deadlock. Must run inside a
+    transaction: if the source is short, the destination increment made
+    before the check is rolled back with it.
+    """
+    steps = [
+        (from_base_id, withdraw),
+        (to_base_id, deposit),
+    ]
+    for base_id, apply in sorted(steps, key=lambda step: step[0]):
+        apply(base_id, equipment_type_id, quantity)
+
+
+def _exactly(pairs):
+    return reduce(or_, (Q(base_id=base_id, equipment_type_id=equipment_type_id) for base_id, equipment_type_id in pairs))
+
+
+def _lock_rows(pairs, exact):
+    if exact:
+        condition = _exactly(pairs)
+    else:
+        # Filtering on the two id sets keeps the statement small however many
+        # pairs there are; it may lock a few extra rows of the same bases.
+        condition = Q(
+            base_id__in={base_id for base_id, equipment_type_id in pairs},
+            equipment_type_id__in={equipment_type_id for base_id, equipment_type_id in pairs},
+        )
+    rows = AssetInventory.objects.select_for_update().filter(condition).order_by('base_id', 'equipment_type_id')
+    wanted = set(pairs)
+    return {
+        (row.base_id, row.equipment_type_id): row
+        for row in rows if (row.base_id, row.equipment_type_id) in wanted
+    }
+
+
+def _lock_shards(stock, pairs):
+    """Lock the shards of the sharded pairs among `pairs` and add them to their rows' quantity."""
+    sharded = [pair for pair in pairs if stock[pair].shards]
+    if not sharded:
+        return
+    for pair in sharded:
+        stock[pair].shard_rows = []
+    for shard in InventoryShard.objects.select_for_update().filter(_exactly(sharded)).order_by(
+        'base_id', 'equipment_type_id', 'shard'
+    ):
+        row = stock[shard.base_id, shard.equipment_type_id]
+        row.quantity += shard.quantity
+        row.shard_rows.append(shard)
+
+
+def lock(pairs):
+    """
+    Make sure an inventory row exists for every (base_id, equipment_type_id)
+    in `pairs` and lock them all, in a fixed order, for the rest of the
+    transaction. Two statements regardless of how many pairs are involved
+    when none of them is sharded. Returns a dict mapping each pair to its
+    AssetInventory row; the quantity of a sharded pair's row is its whole
+    stock, shards included.
+    """
+    pairs = sorted(set(pairs))
+    if not pairs:
+        return {}
+    AssetInventory.objects.bulk_create(
+        [AssetInventory(base_id=base_id, equipment_type_id=equipment_type_id) for base_id, equipment_type_id in pairs],
+        ignore_conflicts=True,
+    )
+    hinted = {pair for pair in pairs if sharding.sharded_pairs.get(*pair)}
+    if not hinted:
+        stock = _lock_rows(pairs, exact=False)
+    else:
+        # The shards of a sharded pair are locked before any later pair, the
+        # order withdraw() and deposit() take them in, so this cannot
+        # deadlock with them: one statement per run of sharded or unsharded
+        # pairs, each locking exactly its pairs.
+        stock = {}
+        for is_sharded, run in groupby(pairs, key=hinted.__contains__):
+            run = list(run)
+            stock.update(_lock_rows(run, exact=True))
+            if is_sharded:
+                _lock_shards(stock, run)
+    # Pairs sharded since this process last looked
+    _lock_shards(stock, [pair for pair, row in stock.items() if row.shards and not hasattr(row, 'shard_rows')])
+    return stock
+
+
+def save_quantities(rows, batch_size=500):
+    """
+    Write back the quantities of rows previously returned by lock(). The
+    stock of a sharded pair is spread evenly over its shards again.
+    """
+    plain, sharded, shards = [], [], []
+    for row in rows:
+        if getattr(row, 'shard_rows', None):
+            sharded.append(row.pk)
+            for shard, quantity in zip(row.shard_rows, sharding.split(row.quantity, len(row.shard_rows))):
+                shard.quantity = quantity
+                shards.append(shard)
+        else:
+            plain.append(row)
+    AssetInventory.objects.bulk_update(plain, ['quantity'], batch_size=batch_size)
+    if sharded:
+        AssetInventory.objects.filter(pk__in=sharded).update(quantity=0)
+        InventoryShard.objects.bulk_update(shards, ['quantity'], batch_size=batch_size)
+
+
+def rebuild_inventory():
+    """
+    Recompute every inventory row from the movement history in the daily
+    rollups (rebuild those first if the ledgers were loaded directly), in a
+    single INSERT ... SELECT. A pair whose history nets out negative is set
+    to zero. Sharded pairs are folded back into single rows. Returns (rows
+    written, rows clamped to zero).
+    """
+    inventory = connection.ops.quote_name(AssetInventory._meta.db_table)
+    shards = connection.ops.quote_name(InventoryShard._meta.db_table)
+    rollup = connection.ops.quote_name(DailyMovementRollup._meta.db_table)
+    net = (
+        f"SELECT rollup.base_id, rollup.equipment_type_id, SUM({net_movement_sql('rollup')}) AS net "
+        f"FROM {rollup} rollup GROUP BY rollup.base_id, rollup.equipment_type_id"
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM ({net}) totals WHERE net < 0")
+        clamped = cursor.fetchone()[0]
+        cursor.execute(f"DELETE FROM {inventory}")
+        cursor.execute(f"DELETE FROM {shards}")
+        cursor.execute(
+            f"INSERT INTO {inventory} (base_id, equipment_type_id, quantity, shards) "
+            f"SELECT base_id, equipment_type_id, CASE WHEN net < 0 THEN 0 ELSE net END, 0 FROM ({net}) totals"
+        )
+        written = cursor.rowcount
+        transaction.on_commit(dashboard_cache.bump_all)
+        transaction.on_commit(sharding.sharded_pairs.invalidate)
+    return written, clamped
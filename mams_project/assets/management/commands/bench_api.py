@@ -0,0 +1,270 @@
+import json
+import math
+import random
+import subprocess
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.utils import timezone
+
+from assets import dashboard_cache
+from assets.models import AssetInventory, EquipmentType, PurchaseRecord
+from logistics.models import AssignmentRecord, ExpenditureRecord, TransferRecord
+from users.models import Base, User
+from users.serializers import MyTokenObtainPairSerializer
+
+from .seed_world import ACTIVITIES, CALLSIGNS, CATEGORIES, VENDOR_KINDS, VENDOR_NAMES
+
+LEDGER_PATHS = {
+    'purchases': '/api/assets/purchases/',
+    'transfers': '/api/logistics/transfers/',
+    'assignments': '/api/logistics/assignments/',
+    'expenditures': '/api/logistics/expenditures/',
+}
+SCENARIOS = (
+    'dashboard', 'dashboard_uncached',
+    'purchases_list', 'transfers_list', 'assignments_list', 'expenditures_list',
+    'purchase_create', 'transfer_create', 'assignment_create', 'expenditure_create',
+    'purchases_filtered', 'purchases_search', 'purchases_fuzzy', 'expenditures_search', 'expenditures_fuzzy',
+    'equipment_search',
+)
+# Words seed_world writes into each searchable text column
+SEARCH_WORDS = {
+    'purchases': VENDOR_NAMES + VENDOR_KINDS,
+    'expenditures': tuple(word for phrase in ACTIVITIES for word in phrase.split()) + CALLSIGNS,
+}
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    return samples[max(0, math.ceil(pct / 100 * len(samples)) - 1)]
+
+
+class InProcessClient:
+    """Requests through Django's test client: no network, no server needed."""
+
+    def __init__(self, token):
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {token}', HTTP_HOST='localhost')
+
+    def request(self, method, path, params=None, body=None):
+        if method == 'GET':
+            return self.client.get(path, params or {}).status_code
+        return self.client.post(path, body, content_type='application/json').status_code
+
+
+class ServerClient:
+    """Requests over HTTP to a running server; safe to share between threads."""
+
+    def __init__(self, base_url, token):
+        self.base_url = base_url.rstrip('/')
+        self.headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+
+    def request(self, method, path, params=None, body=None):
+        url = self.base_url + path
+        if params:
+            url += '?' + urllib.parse.urlencode(params)
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(url, data=data, method=method, headers=self.headers)
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as exc:
+            return exc.code
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the dashboard, the ledger list endpoints (plain, filtered and searched), "
+        "equipment type search and each create endpoint, and print p50/p95/p99 latency "
+        "and throughput per scenario as JSON. Runs in-process "
+        "through Django's test client, or against a running server with --url. In-process "
+        "writes are rolled back at the end unless --keep is given; writes made through "
+        "--url are kept. Seed data first, e.g. with seed_world."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Timed requests per scenario.")
+        parser.add_argument('--warmup', type=int, default=20, help="Untimed requests per scenario.")
+        parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+        parser.add_argument('--url', help="Base URL of a running server, e.g. http://localhost:8000.")
+        parser.add_argument('--concurrency', type=int, default=1, help="Parallel clients; requires --url.")
+        parser.add_argument('--seed', type=int, default=1, help="Random seed for request parameters.")
+        parser.add_argument('--keep', action='store_true', help="Keep records created in-process.")
+        parser.add_argument('--output', help="Also write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        if options['concurrency'] > 1 and not options['url']:
+            raise CommandError("--concurrency needs --url; the in-process client is single-threaded.")
+        self.rng = random.Random(options['seed'])
+        self.prepare_targets()
+
+        user, _ = User.objects.get_or_create(username='bench-admin', defaults={'role': User.Role.ADMIN})
+        token = str(MyTokenObtainPairSerializer.get_token(user).access_token)
+
+        if options['url']:
+            self.client = ServerClient(options['url'], token)
+            results = self.run_all(options)
+        else:
+            self.client = InProcessClient(token)
+            with transaction.atomic():
+                results = self.run_all(options)
+                if not options['keep']:
+                    transaction.set_rollback(True)
+
+        report = json.dumps({'meta': self.meta(options), 'results': results}, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(report + '\n')
+        self.stdout.write(report)
+
+    def prepare_targets(self):
+        self.bases = list(Base.objects.values_list('id', flat=True))
+        self.equipment_types = list(EquipmentType.objects.values_list('id', flat=True))
+        self.personnel = list(User.objects.values_list('id', flat=True)[:1000])
+        # Well-stocked rows, so withdrawals during the run never hit a shortfall
+        self.stocked = list(
+            AssetInventory.objects.with_stock().filter(stock__gt=0).order_by('-stock')
+            .values_list('base_id', 'equipment_type_id')[:50]
+        )
+        if not (self.bases and self.equipment_types and self.stocked) or len(self.bases) < 2:
+            raise CommandError("Not enough data to benchmark against; run seed_world first.")
+
+    def meta(self, options):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'commit': commit,
+            'timestamp': timezone.now().isoformat(),
+            'mode': 'server' if options['url'] else 'in-process',
+            'database': connection.vendor,
+            'debug': settings.DEBUG,
+            'requests': options['requests'],
+            'warmup': options['warmup'],
+            'concurrency': options['concurrency'],
+            'rows': {
+                'purchases': PurchaseRecord.objects.count(),
+                'transfers': TransferRecord.objects.count(),
+                'assignments': AssignmentRecord.objects.count(),
+                'expenditures': ExpenditureRecord.objects.count(),
+            },
+        }
+
+    # --- Scenarios: each returns the arguments of one request ---
+
+    def dashboard(self):
+        params = {}
+        if self.rng.random() < 0.7:
+            params['base'] = self.rng.choice(self.bases)
+        if self.rng.random() < 0.5:
+            params['equipment_type'] = self.rng.choice(self.equipment_types)
+        window = self.rng.choice((None, 30, 90, 365))
+        if window:
+            today = timezone.localdate()
+            params['start_date'] = (today - timedelta(days=window)).isoformat()
+            params['end_date'] = today.isoformat()
+        return 'GET', '/api/assets/dashboard/summary/', params, None
+
+    def list_request(self, ledger):
+        return 'GET', LEDGER_PATHS[ledger], {'page_size': self.rng.choice((20, 50, 100))}, None
+
+    def create_request(self, ledger):
+        base_id, equipment_type_id = self.rng.choice(self.stocked)
+        body = {'equipment_type_id': equipment_type_id, 'quantity': 1}
+        if ledger == 'purchases':
+            body.update(base_id=self.rng.choice(self.bases), equipment_type_id=self.rng.choice(self.equipment_types))
+        elif ledger == 'transfers':
+            body.update(from_base_id=base_id, to_base_id=self.rng.choice([b for b in self.bases if b != base_id]))
+        elif ledger == 'assignments':
+            body.update(issuing_base_id=base_id, assigned_to_id=self.rng.choice(self.personnel))
+        else:
+            body.update(base_id=base_id, notes="Benchmark")
+        return 'POST', LEDGER_PATHS[ledger], None, body
+
+    def filtered_request(self, ledger, kind):
+        if kind == 'filtered':
+            base_id, equipment_type_id = self.rng.choice(self.stocked)
+            today = timezone.localdate()
+            params = {
+                'base': base_id, 'equipment_type': equipment_type_id,
+                'start_date': (today - timedelta(days=90)).isoformat(), 'end_date': today.isoformat(),
+            }
+        else:
+            word = self.rng.choice(SEARCH_WORDS[ledger]).lower()
+            if kind == 'search':
+                params = {'search': word[:self.rng.randint(3, max(3, len(word)))]}
+            else:
+                # One letter dropped, as a typo would
+                typo = self.rng.randrange(len(word))
+                params = {'fuzzy': word[:typo] + word[typo + 1:]}
+        return 'GET', LEDGER_PATHS[ledger], params, None
+
+    def equipment_search(self):
+        word = self.rng.choice(CATEGORIES + ('synthetic', 'item')).lower()
+        return 'GET', '/api/assets/equipment-types/', {'search': word[:3]}, None
+
+    def build(self, scenario):
+        if scenario.startswith('dashboard'):
+            return self.dashboard()
+        if scenario == 'equipment_search':
+            return self.equipment_search()
+        name, kind = scenario.rsplit('_', 1)
+        ledger = name if name.endswith('s') else f'{name}s'
+        if kind == 'list':
+            return self.list_request(ledger)
+        if kind == 'create':
+            return self.create_request(ledger)
+        return self.filtered_request(ledger, kind)
+
+    # --- Measurement ---
+
+    def timed_request(self, scenario, args):
+        if scenario == 'dashboard_uncached':
+            # Untimed; with --url this only reaches the server's cache if it is shared
+            dashboard_cache.bump_all()
+        started = time.perf_counter()
+        status = self.client.request(*args)
+        return (time.perf_counter() - started) * 1000, status
+
+    def run_all(self, options):
+        return {scenario: self.run(scenario, options) for scenario in options['scenarios']}
+
+    def run(self, scenario, options):
+        self.stderr.write(f"Benchmarking {scenario}...")
+        for _ in range(options['warmup']):
+            self.client.request(*self.build(scenario))
+
+        # Requests are built up front so parameter generation is not timed
+        requests = [self.build(scenario) for _ in range(options['requests'])]
+        started = time.perf_counter()
+        if options['concurrency'] > 1:
+            with ThreadPoolExecutor(options['concurrency']) as pool:
+                outcomes = list(pool.map(lambda args: self.timed_request(scenario, args), requests))
+        else:
+            outcomes = [self.timed_request(scenario, args) for args in requests]
+        wall = time.perf_counter() - started
+
+        samples = sorted(latency for latency, status in outcomes)
+        errors = sum(1 for latency, status in outcomes if status >= 400)
+        return {
+            'count': len(samples),
+            'errors': errors,
+            'p50_ms': round(percentile(samples, 50), 3),
+            'p95_ms': round(percentile(samples, 95), 3),
+            'p99_ms': round(percentile(samples, 99), 3),
+            'mean_ms': round(sum(samples) / len(samples), 3),
+            'max_ms': round(samples[-1], 3),
+            'throughput_rps': round(len(samples) / wall, 1),
+        }
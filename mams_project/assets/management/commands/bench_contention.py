@@ -0,0 +1,148 @@
+import json
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+
+from assets import inventory, sharding
+from assets.models import AssetInventory, PurchaseRecord
+from assets.rollups import record_movement
+from logistics.models import ExpenditureRecord
+
+from .bench_api import percentile
+
+MODES = ('row', 'sharded')
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure how expenditures against one hot (base, equipment_type) pair scale with "
+        "concurrent writers, with the pair's stock in its single inventory row and split "
+        "over --shards shard rows. Each worker thread runs the transaction of the "
+        "expenditure create endpoint (stock withdrawal, ledger insert, rollup update) "
+        "back to back, optionally holding it open for --hold-ms. Prints p50/p95/p99 "
+        "latency and throughput per mode as JSON. The expenditures are committed; run it "
+        "against a benchmark database, e.g. one filled by seed_world. SQLite serializes "
+        "all writers whatever the layout, so compare the modes on PostgreSQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+        parser.add_argument('--threads', type=int, default=16, help="Concurrent writers.")
+        parser.add_argument('--requests', type=int, default=1000, help="Expenditures per mode.")
+        parser.add_argument('--shards', type=int, default=8, help="Shards in the sharded mode.")
+        parser.add_argument('--hold-ms', type=float, default=0, help="Extra time each transaction stays open.")
+        parser.add_argument('--base', type=int, help="Base id of the pair (default: the best-stocked pair).")
+        parser.add_argument('--equipment-type', type=int, help="Equipment type id of the pair.")
+        parser.add_argument('--output', help="Also write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        if options['shards'] < 2:
+            raise CommandError("--shards must be at least 2.")
+        pair = self.target(options)
+        was_sharded = AssetInventory.objects.get(base_id=pair[0], equipment_type_id=pair[1]).shards > 0
+        # Buy enough stock that no mode runs short, keeping the ledgers balanced
+        with transaction.atomic():
+            purchase = PurchaseRecord.objects.create(
+                base_id=pair[0], equipment_type_id=pair[1], quantity=options['requests'] * len(options['modes']),
+                vendor="Benchmark",
+            )
+            inventory.deposit(*pair, purchase.quantity)
+            record_movement(purchase)
+
+        results = {}
+        try:
+            for mode in options['modes']:
+                if mode == 'sharded':
+                    sharding.promote(*pair, count=options['shards'])
+                else:
+                    sharding.demote(*pair)
+                sharding.sharded_pairs.invalidate()
+                self.stderr.write(f"Benchmarking {mode}...")
+                results[mode] = self.run(pair, options)
+        finally:
+            if was_sharded:
+                sharding.promote(*pair, count=options['shards'])
+            else:
+                sharding.demote(*pair)
+
+        report = json.dumps({
+            'meta': {
+                'database': connection.vendor,
+                'base_id': pair[0],
+                'equipment_type_id': pair[1],
+                'threads': options['threads'],
+                'requests': options['requests'],
+                'shards': options['shards'],
+                'hold_ms': options['hold_ms'],
+            },
+            'results': results,
+        }, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(report + '\n')
+        self.stdout.write(report)
+
+    def target(self, options):
+        if options['base'] and options['equipment_type']:
+            pair = (options['base'], options['equipment_type'])
+            if not AssetInventory.objects.filter(base_id=pair[0], equipment_type_id=pair[1]).exists():
+                raise CommandError(f"No inventory row for base {pair[0]} and equipment type {pair[1]}.")
+            return pair
+        pair = (
+            AssetInventory.objects.with_stock().order_by('-stock')
+            .values_list('base_id', 'equipment_type_id').first()
+        )
+        if pair is None:
+            raise CommandError("No inventory to benchmark against; run seed_world first.")
+        return pair
+
+    def expend(self, pair, hold):
+        base_id, equipment_type_id = pair
+        with transaction.atomic():
+            inventory.withdraw(base_id, equipment_type_id, 1)
+            record_movement(ExpenditureRecord.objects.create(
+                base_id=base_id, equipment_type_id=equipment_type_id, quantity=1, notes="Benchmark",
+            ))
+            if hold:
+                time.sleep(hold)
+
+    def worker(self, pair, count, hold):
+        samples, errors = [], Counter()
+        try:
+            for _ in range(count):
+                started = time.perf_counter()
+                try:
+                    self.expend(pair, hold)
+                except (inventory.InsufficientStock, DatabaseError) as exc:
+                    errors[type(exc).__name__] += 1
+                    continue
+                samples.append((time.perf_counter() - started) * 1000)
+        finally:
+            connection.close()
+        return samples, errors
+
+    def run(self, pair, options):
+        threads = options['threads']
+        counts = [options['requests'] // threads + (index < options['requests'] % threads) for index in range(threads)]
+        hold = options['hold_ms'] / 1000
+        started = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            outcomes = list(pool.map(lambda count: self.worker(pair, count, hold), counts))
+        wall = time.perf_counter() - started
+
+        samples = sorted(sample for thread_samples, errors in outcomes for sample in thread_samples)
+        errors = sum((errors for thread_samples, errors in outcomes), Counter())
+        if not samples:
+            raise CommandError(f"Every expenditure failed: {dict(errors)}")
+        return {
+            'count': len(samples),
+            'errors': dict(errors),
+            'p50_ms': round(percentile(samples, 50), 3),
+            'p95_ms': round(percentile(samples, 95), 3),
+            'p99_ms': round(percentile(samples, 99), 3),
+            'max_ms': round(samples[-1], 3),
+            'throughput_rps': round(len(samples) / wall, 1),
+        }
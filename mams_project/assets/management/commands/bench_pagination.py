@@ -0,0 +1,79 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from assets.models import EquipmentType, PurchaseRecord
+from assets.views import PurchaseRecordViewSet
+from mams_project.pagination import KeysetPagination
+from users.models import Base
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare offset and keyset pagination of the purchase ledger at increasing depths. "
+        "Seeds the requested number of rows inside a transaction that is rolled back "
+        "afterwards unless --keep is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help="Ledger size to benchmark against.")
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per depth; the median is reported.")
+        parser.add_argument('--keep', action='store_true', help="Keep the seeded rows.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed(options['rows'])
+            results = self.run(options['rows'], options['page_size'], options['repeat'])
+            if not options['keep']:
+                transaction.set_rollback(True)
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def seed(self, rows, batch_size=10_000):
+        missing = rows - PurchaseRecord.objects.count()
+        if missing <= 0:
+            return
+        base, _ = Base.objects.get_or_create(name="Benchmark Base")
+        equipment, _ = EquipmentType.objects.get_or_create(name="Benchmark Item", category="Ammunition")
+        self.stderr.write(f"Seeding {missing} purchase records...")
+        for start in range(0, missing, batch_size):
+            PurchaseRecord.objects.bulk_create(
+                [PurchaseRecord(base=base, equipment_type=equipment, quantity=1)
+                 for _ in range(min(batch_size, missing - start))],
+                batch_size=batch_size,
+            )
+
+    def timed(self, fn, repeat):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - started) * 1000)
+        return round(sorted(samples)[len(samples) // 2], 3)
+
+    def run(self, rows, page_size, repeat):
+        view = PurchaseRecordViewSet()
+        queryset = PurchaseRecordViewSet.queryset
+        factory = APIRequestFactory()
+        paginator = KeysetPagination()
+
+        key_fields = [field.lstrip('-') for field in view.cursor_ordering]
+
+        depths = [depth for depth in (0, 1_000, 10_000, 100_000, 500_000, rows - page_size) if 0 <= depth < rows]
+        results = []
+        for depth in sorted(set(depths)):
+            params = {'page_size': page_size}
+            if depth:
+                # The cursor a client would hold after reading `depth` rows
+                previous = queryset.values_list(*key_fields)[depth - 1]
+                params['cursor'] = paginator.encode_cursor(previous)
+            request = Request(factory.get('/api/assets/purchases/', params, HTTP_HOST='localhost'))
+
+            offset_ms = self.timed(lambda: list(queryset[depth:depth + page_size]), repeat)
+            keyset_ms = self.timed(lambda: paginator.paginate_queryset(queryset, request, view), repeat)
+            results.append({'depth': depth, 'offset_ms': offset_ms, 'keyset_ms': keyset_ms})
+        return {'rows': rows, 'page_size': page_size, 'results': results}
@@ -0,0 +1,159 @@
+import io
+import json
+import os
+import select
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from mams_project.shared_cache import is_shared
+
+from .bench_api import SCENARIOS
+
+SERVERS = {
+    # The synchronous views behind gunicorn's pre-forked sync workers
+    'wsgi': (['mams_project.wsgi:application'], 'False'),
+    # The async views behind uvicorn workers, managed by gunicorn
+    'asgi': (['mams_project.asgi:application', '-k', 'uvicorn.workers.UvicornWorker'], 'True'),
+}
+
+
+def wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f"The server exited during startup with status {process.returncode}.")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f"The server did not listen on port {port} within {timeout}s.")
+
+
+class SlowClients(threading.Thread):
+    """
+    Keep `count` connections open that send a request line and then stall
+    before finishing the headers, like clients on a poor link. A connection
+    the server drops (e.g. when it recycles a stuck worker) is replaced, so
+    the stalled clients are present for the whole run.
+    """
+
+    def __init__(self, port, count):
+        super().__init__(daemon=True)
+        self.port = port
+        self.count = count
+        self.sockets = []
+        self.stopped = threading.Event()
+
+    def connect(self):
+        sock = socket.create_connection(('127.0.0.1', self.port))
+        sock.sendall(b'GET /api/assets/dashboard/summary/ HTTP/1.1\r\nHost: localhost\r\n')
+        return sock
+
+    def run(self):
+        self.sockets = [self.connect() for _ in range(self.count)]
+        while not self.stopped.wait(0.2):
+            readable, _, _ = select.select(self.sockets, [], [], 0)
+            for sock in readable:
+                # A stalled request gets nothing back until the server gives
+                # up on it (an error response, a close or a reset)
+                sock.close()
+                self.sockets[self.sockets.index(sock)] = self.connect()
+
+    def __enter__(self):
+        if self.count:
+            self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        if self.is_alive():
+            self.join()
+        for sock in self.sockets:
+            sock.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the WSGI deployment (gunicorn sync workers, synchronous views) with the ASGI "
+        "one (uvicorn workers, async views): each is started on a local port with the same "
+        "number of workers and the database of the current settings, then driven by bench_api "
+        "with concurrent clients. --slow-clients keeps that many connections stalled mid-request "
+        "for the whole run. Prints p50/p95/p99 latency and throughput per server and scenario."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', nargs='+', choices=SERVERS, default=list(SERVERS))
+        parser.add_argument('--workers', type=int, default=2, help="Worker processes per server.")
+        parser.add_argument('--port', type=int, default=8150, help="Port the servers are started on.")
+        parser.add_argument('--concurrency', type=int, default=16, help="Parallel benchmark clients.")
+        parser.add_argument('--slow-clients', type=int, default=0, help="Stalled connections held open.")
+        parser.add_argument('--requests', type=int, default=400, help="Timed requests per scenario.")
+        parser.add_argument('--warmup', type=int, default=20, help="Untimed requests per scenario.")
+        parser.add_argument(
+            '--scenarios', nargs='+', choices=[s for s in SCENARIOS if s != 'dashboard_uncached'],
+            default=['dashboard', 'purchases_list', 'transfers_list'],
+        )
+        parser.add_argument('--output', help="Also write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        results, meta = {}, None
+        for name in options['servers']:
+            self.stderr.write(f"Starting the {name} server...")
+            with self.server(name, options), SlowClients(options['port'], options['slow_clients']):
+                report = self.bench(options)
+            meta = report['meta']
+            results[name] = report['results']
+
+        meta.update(
+            mode='servers', workers=options['workers'], slow_clients=options['slow_clients'],
+        )
+        report = json.dumps({'meta': meta, 'results': results}, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(report + '\n')
+        self.stdout.write(report)
+
+    @contextmanager
+    def server(self, name, options):
+        target, async_views = SERVERS[name]
+        env = {**os.environ, 'ASYNC_VIEWS': async_views, 'ACCESS_LOG_LEVEL': 'WARNING'}
+        if not is_shared():
+            # Several workers need a shared cache; a directory is enough here
+            env.update(
+                CACHE_BACKEND='django.core.cache.backends.filebased.FileBasedCache',
+                CACHE_LOCATION=tempfile.mkdtemp(prefix='mams-bench-cache-'),
+            )
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', *target, '--workers', str(options['workers']),
+             '--bind', f"127.0.0.1:{options['port']}", '--log-level', 'warning'],
+            cwd=settings.BASE_DIR, env=env,
+        )
+        try:
+            wait_for_port(options['port'], process)
+            yield process
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    def bench(self, options):
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command(
+                'bench_api', url=f"http://127.0.0.1:{options['port']}", concurrency=options['concurrency'],
+                requests=options['requests'], warmup=options['warmup'], scenarios=options['scenarios'],
+                output=output.name, stdout=io.StringIO(), stderr=self.stderr,
+            )
+            with open(output.name) as report:
+                return json.load(report)
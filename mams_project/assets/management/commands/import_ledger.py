@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from assets import inventory
+from assets.models import InventorySnapshot
+from assets.importing import LEDGER_FORMATS, LedgerImporter, NameMap, RejectedRecord
+from assets.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Import historical ledger records from CSV or NDJSON files (the layout of the ledger "
+        "exports), keeping their original dates. Files are streamed and loaded in chunks; an "
+        "interrupted import resumes from its last committed chunk when run again. Afterwards "
+        "the daily rollups and the inventory are rebuilt from the full ledger history."
+    )
+
+    def add_arguments(self, parser):
+        for ledger in LEDGER_FORMATS:
+            parser.add_argument(f'--{ledger}', metavar='FILE', help=f"File of {ledger} to import.")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Records committed per transaction.")
+        parser.add_argument(
+            '--rejects', metavar='FILE',
+            help="Write records that cannot be imported to this NDJSON file and carry on. "
+                 "Without it the import stops at the first bad record.",
+        )
+        parser.add_argument(
+            '--create-missing', action='store_true',
+            help="Create unknown bases, and equipment types that come with a category, instead of rejecting.",
+        )
+        parser.add_argument('--restart', action='store_true', help="Ignore checkpoints and import from the start.")
+        parser.add_argument(
+            '--no-rebuild', action='store_true',
+            help="Skip the rollup and inventory rebuild, e.g. when more files follow in another run.",
+        )
+
+    def handle(self, *args, **options):
+        sources = [(ledger, options[ledger]) for ledger in LEDGER_FORMATS if options[ledger]]
+        if not sources:
+            raise CommandError("Give at least one file, e.g. --purchases purchases.csv")
+
+        names = NameMap(create_missing=options['create_missing'])
+        rejects = open(options['rejects'], 'a', encoding='utf-8') if options['rejects'] else None
+        try:
+            for ledger, path in sources:
+                self.import_file(ledger, path, names, rejects, options)
+        finally:
+            if rejects:
+                rejects.close()
+
+        if not options['no_rebuild']:
+            self.stderr.write("Rebuilding daily rollups and inventory...")
+            rebuild_rollups()
+            written, clamped = inventory.rebuild_inventory()
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} inventory rows."))
+            if clamped:
+                self.stdout.write(self.style.WARNING(
+                    f"{clamped} base/equipment pairs have more outflows than inflows and were set to zero."
+                ))
+            # Back-dated records invalidate every snapshot taken before them
+            dropped, _ = InventorySnapshot.objects.all().delete()
+            if dropped:
+                self.stdout.write(self.style.WARNING(
+                    f"Dropped {dropped} inventory snapshot rows; re-take them with snapshot_inventory --backfill."
+                ))
+
+    def import_file(self, ledger, path, names, rejects, options):
+        importer = LedgerImporter(ledger, path, names, chunk_size=options['chunk_size'], rejects=rejects)
+        try:
+            checkpoint = importer.checkpoint(restart=options['restart'])
+            if checkpoint.completed:
+                self.stdout.write(f"{path}: already imported; use --restart to import it again.")
+                return
+            if checkpoint.records_read:
+                self.stderr.write(f"{path}: resuming after record {checkpoint.records_read}.")
+            checkpoint = importer.run(checkpoint, progress=lambda done: self.stderr.write(
+                f"{path}: {done.records_read} records read", ending='\r',
+            ))
+        except (OSError, RejectedRecord) as exc:
+            raise CommandError(f"{path}: {exc}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{path}: imported {checkpoint.records_imported} {ledger}, rejected {checkpoint.records_rejected}."
+        ))
@@ -0,0 +1,52 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from assets import sharding
+
+
+def parse_pair(value):
+    base_id, _, equipment_type_id = value.partition(':')
+    try:
+        return int(base_id), int(equipment_type_id)
+    except ValueError:
+        raise CommandError(f"Invalid pair {value!r}; use BASE_ID:EQUIPMENT_TYPE_ID.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold sharded inventory pairs that have gone quiet back into single rows. Hot pairs "
+        "are promoted automatically while requests run; schedule this every few minutes to "
+        "demote them again once the burst is over. --promote and --demote shard or unshard "
+        "given pairs by hand; --demote-all unshards everything, e.g. after setting "
+        "INVENTORY_SHARDS to 0."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--promote', nargs='+', default=[], metavar='BASE:TYPE', help="Pairs to shard.")
+        parser.add_argument('--demote', nargs='+', default=[], metavar='BASE:TYPE', help="Pairs to unshard.")
+        parser.add_argument('--demote-all', action='store_true', help="Unshard every sharded pair.")
+        parser.add_argument(
+            '--shards', type=int, help="Shards per promoted pair (default: INVENTORY_SHARDS).",
+        )
+
+    def handle(self, *args, **options):
+        count = options['shards'] or sharding.shard_count()
+        promote = [parse_pair(value) for value in options['promote']]
+        if promote and count < 2:
+            raise CommandError("Promotion needs at least 2 shards; set --shards or INVENTORY_SHARDS.")
+
+        promoted = [pair for pair in promote if sharding.promote(*pair, count=count)]
+        if options['demote_all']:
+            demoted = sharding.demote_all()
+        elif options['demote']:
+            demoted = [pair for pair in map(parse_pair, options['demote']) if sharding.demote(*pair)]
+        elif promote:
+            demoted = []
+        else:
+            demoted = sharding.demote_idle()
+
+        self.stdout.write(json.dumps({
+            'promoted': [f'{base_id}:{equipment_type_id}' for base_id, equipment_type_id in promoted],
+            'demoted': [f'{base_id}:{equipment_type_id}' for base_id, equipment_type_id in demoted],
+        }, indent=2))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from assets.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily movement rollup table from the raw ledgers."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Number of rollup rows inserted per statement.",
+        )
+
+    def handle(self, *args, **options):
+        written = rebuild_rollups(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} daily rollup rows."))
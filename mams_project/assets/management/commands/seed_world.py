@@ -0,0 +1,220 @@
+import json
+import random
+import time
+from collections import defaultdict
+from datetime import timedelta
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from assets import inventory
+from assets.models import EquipmentType, PurchaseRecord
+from assets.rollups import explicit_ledger_dates, rebuild_rollups
+from logistics.models import AssignmentRecord, ExpenditureRecord, TransferRecord
+from users.models import Base, User
+
+CATEGORIES = ("Weapon", "Ammunition", "Vehicle", "Communications", "Medical")
+# Vocabulary for vendor names and expenditure notes, so text search has
+# realistic distinct values to work on
+VENDOR_NAMES = (
+    "Apex", "Atlas", "Summit", "Liberty", "Frontier", "Eagle", "Granite", "Pioneer", "Sentinel", "Vanguard",
+    "Ironclad", "Patriot", "Meridian", "Keystone", "Bastion", "Horizon", "Redstone", "Falcon", "Citadel", "Anchor",
+)
+VENDOR_KINDS = ("Defense", "Arms", "Logistics", "Industries", "Supply", "Systems", "Munitions", "Armory")
+ACTIVITIES = (
+    "Training exercise", "Live fire qualification", "Range day", "Field maintenance", "Combat patrol",
+    "Marksmanship course", "Convoy escort", "Equipment trial",
+)
+CALLSIGNS = (
+    "Alpha", "Bravo", "Charlie", "Delta", "Echo", "Foxtrot", "Golf", "Hotel", "India", "Juliett", "Kilo", "Lima",
+    "Mike", "November", "Oscar", "Papa", "Quebec", "Romeo", "Sierra", "Tango", "Uniform", "Victor", "Whiskey",
+    "Xray", "Yankee", "Zulu",
+)
+
+
+class World:
+    """
+    Random draws for one synthetic world. Bases and equipment types follow a
+    Zipf-like popularity, so a few large bases and common items carry most
+    of the traffic; dates lean towards the recent end of the window, thin
+    out at weekends and cluster in working hours.
+    """
+
+    def __init__(self, rng, bases, equipment_types, personnel, days, skew):
+        self.rng = rng
+        self.bases = bases
+        self.equipment_types = equipment_types
+        self.personnel = personnel
+        self.days = days
+        self.skew = skew
+        self.now = timezone.now()
+        self.base_weights = list(accumulate(1 / (rank + 1) for rank in range(len(bases))))
+        self.equipment_weights = list(accumulate(1 / (rank + 1) ** 0.8 for rank in range(len(equipment_types))))
+
+    def base(self, exclude=None):
+        while True:
+            base = self.rng.choices(self.bases, cum_weights=self.base_weights)[0]
+            if base != exclude:
+                return base
+
+    def equipment_type(self):
+        return self.rng.choices(self.equipment_types, cum_weights=self.equipment_weights)[0]
+
+    def date(self):
+        while True:
+            day = self.now - timedelta(days=int(self.days * self.rng.random() ** self.skew))
+            if day.weekday() < 5 or self.rng.random() < 0.3:
+                break
+        hour = min(23, max(0, int(self.rng.gauss(13, 3))))
+        return day.replace(hour=hour, minute=self.rng.randrange(60), second=self.rng.randrange(60), microsecond=0)
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic world for load testing: bases, equipment types, personnel and "
+        "ledger records with realistic date skew, written with bulk inserts. Seeding is "
+        "additive and reproducible for a given --seed. Inventory is credited with the net "
+        "of the generated movements and the daily rollups are rebuilt at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bases', type=int, default=20)
+        parser.add_argument('--equipment-types', type=int, default=100)
+        parser.add_argument('--personnel', type=int, default=500)
+        parser.add_argument('--purchases', type=int, default=1_000_000)
+        parser.add_argument('--transfers', type=int, default=1_000_000)
+        parser.add_argument('--assignments', type=int, default=500_000)
+        parser.add_argument('--expenditures', type=int, default=1_000_000)
+        parser.add_argument('--days', type=int, default=730, help="Length of the history, ending today.")
+        parser.add_argument('--skew', type=float, default=2.0, help="Above 1, recent days get more records.")
+        parser.add_argument('--seed', type=int, default=1, help="Random seed.")
+        parser.add_argument('--batch-size', type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        world = World(
+            rng,
+            self.ensure_bases(options['bases']),
+            self.ensure_equipment_types(options['equipment_types']),
+            self.ensure_personnel(options['personnel']),
+            options['days'],
+            options['skew'],
+        )
+        self.net = defaultdict(int)
+
+        def purchase():
+            base, equipment_type = world.base(), world.equipment_type()
+            quantity = rng.randint(20, 500)
+            self.net[base, equipment_type] += quantity
+            return PurchaseRecord(
+                base_id=base, equipment_type_id=equipment_type, quantity=quantity,
+                purchase_date=world.date(), vendor=f"{rng.choice(VENDOR_NAMES)} {rng.choice(VENDOR_KINDS)}",
+            )
+
+        def transfer():
+            from_base = world.base()
+            to_base, equipment_type = world.base(exclude=from_base), world.equipment_type()
+            quantity = rng.randint(1, 50)
+            self.net[from_base, equipment_type] -= quantity
+            self.net[to_base, equipment_type] += quantity
+            return TransferRecord(
+                from_base_id=from_base, to_base_id=to_base, equipment_type_id=equipment_type,
+                quantity=quantity, transfer_date=world.date(),
+            )
+
+        def assignment():
+            base, equipment_type = world.base(), world.equipment_type()
+            quantity = rng.randint(1, 5)
+            self.net[base, equipment_type] -= quantity
+            return AssignmentRecord(
+                issuing_base_id=base, equipment_type_id=equipment_type, quantity=quantity,
+                assigned_to_id=rng.choice(world.personnel), assignment_date=world.date(),
+            )
+
+        def expenditure():
+            base, equipment_type = world.base(), world.equipment_type()
+            quantity = rng.randint(1, 40)
+            self.net[base, equipment_type] -= quantity
+            return ExpenditureRecord(
+                base_id=base, equipment_type_id=equipment_type, quantity=quantity,
+                expenditure_date=world.date(),
+                notes=f"{rng.choice(ACTIVITIES)} {rng.choice(CALLSIGNS)} {rng.randrange(100)}",
+            )
+
+        counts = {}
+        with explicit_ledger_dates():
+            for name, model, make in (
+                ('purchases', PurchaseRecord, purchase),
+                ('transfers', TransferRecord, transfer),
+                ('assignments', AssignmentRecord, assignment),
+                ('expenditures', ExpenditureRecord, expenditure),
+            ):
+                counts[name] = self.insert(name, model, make, options[name])
+            counts['purchases'] += self.cover_shortfalls(world)
+
+        self.credit_inventory()
+        self.stderr.write("Rebuilding daily rollups...")
+        rebuild_rollups(batch_size=self.batch_size)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(json.dumps({
+            'seed': options['seed'],
+            'bases': len(world.bases),
+            'equipment_types': len(world.equipment_types),
+            'personnel': len(world.personnel),
+            'records': counts,
+            'seconds': round(elapsed, 2),
+            'records_per_second': round(sum(counts.values()) / elapsed, 1) if elapsed else None,
+        }, indent=2))
+
+    def ensure_bases(self, count):
+        names = [f"Synthetic Base {number:03d}" for number in range(count)]
+        Base.objects.bulk_create([Base(name=name, location="Synthetic") for name in names], ignore_conflicts=True)
+        return list(Base.objects.filter(name__in=names).order_by('name').values_list('id', flat=True))
+
+    def ensure_equipment_types(self, count):
+        names = [f"Synthetic Item {number:04d}" for number in range(count)]
+        existing = set(EquipmentType.objects.filter(name__in=names).values_list('name', flat=True))
+        EquipmentType.objects.bulk_create([
+            EquipmentType(name=name, category=CATEGORIES[number % len(CATEGORIES)])
+            for number, name in enumerate(names) if name not in existing
+        ])
+        return list(EquipmentType.objects.filter(name__in=names).order_by('name').values_list('id', flat=True))
+
+    def ensure_personnel(self, count):
+        usernames = [f"synthetic-{number:05d}" for number in range(count)]
+        # Unusable passwords: these accounts exist only to receive assignments
+        User.objects.bulk_create([User(username=name, password='!') for name in usernames], ignore_conflicts=True)
+        return list(User.objects.filter(username__in=usernames).order_by('username').values_list('id', flat=True))
+
+    def insert(self, name, model, make, count):
+        self.stderr.write(f"Seeding {count} {name}...")
+        for start in range(0, count, self.batch_size):
+            model.objects.bulk_create([make() for _ in range(min(self.batch_size, count - start))])
+        return count
+
+    def cover_shortfalls(self, world):
+        """Add the purchases needed so that no base ends up with negative stock."""
+        top_ups = [
+            PurchaseRecord(
+                base_id=base, equipment_type_id=equipment_type, quantity=-quantity,
+                purchase_date=world.now - timedelta(days=world.days), vendor="Initial stock",
+            )
+            for (base, equipment_type), quantity in self.net.items() if quantity < 0
+        ]
+        PurchaseRecord.objects.bulk_create(top_ups, batch_size=self.batch_size)
+        for record in top_ups:
+            self.net[record.base_id, record.equipment_type_id] += record.quantity
+        return len(top_ups)
+
+    def credit_inventory(self):
+        """Add the net movement of the generated records to the inventory."""
+        with transaction.atomic():
+            stock = inventory.lock(self.net)
+            for pair, row in stock.items():
+                row.quantity += self.net[pair]
+            inventory.save_quantities(list(stock.values()), batch_size=self.batch_size)
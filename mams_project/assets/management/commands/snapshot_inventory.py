@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from assets.snapshots import snapshot_days, take_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Record the end-of-day stock of every base and equipment type in InventorySnapshot. "
+        "Historical balances (the inventory as-of endpoint, past dashboard periods) start "
+        "from the nearest snapshot, so schedule this daily, after midnight; by default it "
+        "snapshots yesterday. --backfill covers a range of past days at once, e.g. after "
+        "an import. Re-running for a day replaces its snapshot."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--day', help="Day to snapshot, YYYY-MM-DD (default: yesterday).")
+        parser.add_argument(
+            '--backfill', type=int, metavar='DAYS',
+            help="Snapshot the DAYS days ending on --day instead of a single day.",
+        )
+        parser.add_argument('--every', type=int, default=1, help="With --backfill, snapshot one day in EVERY.")
+
+    def handle(self, *args, **options):
+        if options['day']:
+            day = parse_date(options['day'])
+            if day is None:
+                raise CommandError(f"Invalid --day {options['day']!r}; use YYYY-MM-DD.")
+        else:
+            day = timezone.localdate() - timedelta(days=1)
+        if options['every'] < 1:
+            raise CommandError("--every must be at least 1.")
+
+        days = snapshot_days(day, options['backfill'], options['every']) if options['backfill'] else [day]
+        for snapshot_day in days:
+            written = take_snapshot(snapshot_day)
+            self.stdout.write(self.style.SUCCESS(f"{snapshot_day}: snapshotted {written} inventory rows."))
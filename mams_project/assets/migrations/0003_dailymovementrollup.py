@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0002_initial'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMovementRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('purchases', models.PositiveIntegerField(default=0)),
+                ('transfers_in', models.PositiveIntegerField(default=0)),
+                ('transfers_out', models.PositiveIntegerField(default=0)),
+                ('assignments', models.PositiveIntegerField(default=0)),
+                ('expenditures', models.PositiveIntegerField(default=0)),
+                ('base', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.base')),
+                ('equipment_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='assets.equipmenttype')),
+            ],
+            options={
+                'unique_together': {('day', 'base', 'equipment_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0003_dailymovementrollup'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dailymovementrollup',
+            index=models.Index(fields=['base', 'equipment_type', 'day'], name='rollup_base_equip_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaserecord',
+            index=models.Index(fields=['base', 'equipment_type', 'purchase_date'], name='purchase_base_equip_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaserecord',
+            index=models.Index(fields=['purchase_date'], name='purchase_date_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0005_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ledger', models.CharField(max_length=20)),
+                ('source', models.CharField(max_length=500)),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('records_read', models.PositiveBigIntegerField(default=0)),
+                ('records_imported', models.PositiveBigIntegerField(default=0)),
+                ('records_rejected', models.PositiveBigIntegerField(default=0)),
+                ('completed', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('ledger', 'source')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0007_touchedinventorypair'),
+        ('users', '0002_user_token_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('quantity', models.IntegerField()),
+                ('base', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.base')),
+                ('equipment_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='assets.equipmenttype')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['base', 'equipment_type', 'day'], name='snapshot_base_equip_day_idx')],
+                'unique_together': {('day', 'base', 'equipment_type')},
+            },
+        ),
+    ]
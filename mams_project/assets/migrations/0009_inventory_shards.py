@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0008_inventorysnapshot'),
+        ('users', '0002_user_token_version'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='dailymovementrollup',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='assetinventory',
+            name='shards',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='dailymovementrollup',
+            name='shard',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailymovementrollup',
+            unique_together={('day', 'base', 'equipment_type', 'shard')},
+        ),
+        migrations.CreateModel(
+            name='InventoryShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('base', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.base')),
+                ('equipment_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='assets.equipmenttype')),
+            ],
+            options={
+                'unique_together': {('base', 'equipment_type', 'shard')},
+            },
+        ),
+    ]
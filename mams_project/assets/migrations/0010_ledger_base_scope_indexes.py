@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0009_inventory_shards'),
+        ('users', '0002_user_token_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='purchaserecord',
+            index=models.Index(fields=['base', 'purchase_date', 'id'], name='purchase_base_date_idx'),
+        ),
+    ]
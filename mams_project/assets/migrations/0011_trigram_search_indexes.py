@@ -0,0 +1,34 @@
+from django.db import migrations
+
+# pg_trgm GIN indexes behind the text search of the list endpoints (see
+# assets/search.py). They exist on PostgreSQL only, so they are created
+# here rather than declared on the model; other databases search an
+# in-memory index instead.
+INDEXES = [('purchaserecord', 'purchase_vendor_trgm_idx', 'vendor')]
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for model_name, name, column in INDEXES:
+        table = apps.get_model('assets', model_name)._meta.db_table
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model_name, name, column in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0010_ledger_base_scope_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
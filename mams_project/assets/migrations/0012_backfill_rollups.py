@@ -0,0 +1,61 @@
+from collections import defaultdict
+
+from django.db import migrations
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+
+# The daily rollup (0003) was introduced without filling it from the
+# records already in the ledgers, so databases migrated from before it
+# showed no history on the dashboard. Rebuild it once here from the settled
+# ledger records. This is a frozen copy of assets.rollups.LEDGERS and
+# UNSETTLED against the historical models; the dashboard cache is left to
+# expire on its own.
+LEDGERS = [
+    ('assets', 'PurchaseRecord', 'purchase_date', [('base', 'purchases')]),
+    ('logistics', 'TransferRecord', 'transfer_date', [('to_base', 'transfers_in'), ('from_base', 'transfers_out')]),
+    ('logistics', 'AssignmentRecord', 'assignment_date', [('issuing_base', 'assignments')]),
+    ('logistics', 'ExpenditureRecord', 'expenditure_date', [('base', 'expenditures')]),
+]
+UNSETTLED = {
+    'TransferRecord': {'status__in': ['PENDING', 'REJECTED']},
+}
+
+
+def backfill_rollups(apps, schema_editor):
+    DailyMovementRollup = apps.get_model('assets', 'DailyMovementRollup')
+    db_alias = schema_editor.connection.alias
+
+    totals = defaultdict(lambda: defaultdict(int))
+    for app_label, model_name, date_field, targets in LEDGERS:
+        model = apps.get_model(app_label, model_name)
+        records = model.objects.using(db_alias).exclude(**UNSETTLED.get(model_name, {}))
+        for base_field, rollup_field in targets:
+            grouped = (
+                records.annotate(day=TruncDate(date_field))
+                .values('day', f'{base_field}_id', 'equipment_type_id')
+                .annotate(total=Sum('quantity'))
+            )
+            for row in grouped:
+                key = (row['day'], row[f'{base_field}_id'], row['equipment_type_id'])
+                totals[key][rollup_field] += row['total']
+
+    DailyMovementRollup.objects.using(db_alias).all().delete()
+    DailyMovementRollup.objects.using(db_alias).bulk_create(
+        [
+            DailyMovementRollup(day=day, base_id=base_id, equipment_type_id=equipment_type_id, **columns)
+            for (day, base_id, equipment_type_id), columns in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0011_trigram_search_indexes'),
+        ('logistics', '0007_trigram_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
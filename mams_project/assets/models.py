@@ -1,6 +1,10 @@
 from django.db import models
+from django.db.models import Case, F, OuterRef, Subquery, Sum, When
+from django.db.models.functions import Coalesce
 from users.models import Base
 
+from .scoping import BaseScopedQuerySet
+
 class EquipmentType(models.Model):
     name = models.CharField(max_length=100) # e.g., "M4 Rifle", "5.56mm Rounds", "Humvee"
     category = models.CharField(max_length=50) # e.g., "Weapon", "Ammunition", "Vehicle"
@@ -9,11 +13,34 @@ class EquipmentType(models.Model):
     def __str__(self):
         return f"{self.name} ({self.category})"
 
+class AssetInventoryQuerySet(models.QuerySet):
+    def with_stock(self):
+        """
+        Annotate `stock`, the quantity a pair holds: `quantity`, plus for a
+        sharded pair whatever its InventoryShard rows hold.
+        """
+        shard_total = Subquery(
+            InventoryShard.objects.filter(base_id=OuterRef('base_id'), equipment_type_id=OuterRef('equipment_type_id'))
+            .order_by().values('base_id', 'equipment_type_id').annotate(total=Sum('quantity')).values('total'),
+            output_field=models.IntegerField(),
+        )
+        return self.annotate(stock=Case(
+            When(shards=0, then=F('quantity')),
+            default=F('quantity') + Coalesce(shard_total, 0),
+            output_field=models.IntegerField(),
+        ))
+
+
 class AssetInventory(models.Model):
     """Tracks the quantity of a specific equipment type at a base."""
     equipment_type = models.ForeignKey(EquipmentType, on_delete=models.CASCADE)
     base = models.ForeignKey(Base, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=0)
+    # How many InventoryShard rows hold this pair's stock; 0 while it is all
+    # held in `quantity` (see assets/sharding.py)
+    shards = models.PositiveSmallIntegerField(default=0)
+
+    objects = AssetInventoryQuerySet.as_manager()
 
     class Meta:
         unique_together = ('equipment_type', 'base') # Ensure one entry per equipment per base
@@ -31,5 +58,119 @@ class PurchaseRecord(models.Model):
     vendor = models.CharField(max_length=100, blank=True)
     unit_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
 
+    base_fields = ('base',)
+    objects = BaseScopedQuerySet.as_manager()
+
+    class Meta:
+        # Match the dashboard/list access paths: scope by base and equipment,
+        # then range-scan or order by date.
+        indexes = [
+            models.Index(fields=['base', 'equipment_type', 'purchase_date'], name='purchase_base_equip_date_idx'),
+            models.Index(fields=['purchase_date', 'id'], name='purchase_date_idx'),
+            # A base commander's list: one base, in keyset order
+            models.Index(fields=['base', 'purchase_date', 'id'], name='purchase_base_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"Purchased {self.quantity} of {self.equipment_type.name} for {self.base.name}"
+
+
+class DailyMovementRollup(models.Model):
+    """
+    Per-day movement totals for one equipment type at one base (split over
+    several rows per day for a sharded pair).
+    Maintained alongside every ledger write so the dashboard can answer any
+    date range without scanning the raw records.
+    """
+    day = models.DateField()
+    base = models.ForeignKey(Base, on_delete=models.CASCADE)
+    equipment_type = models.ForeignKey(EquipmentType, on_delete=models.CASCADE)
+    shard = models.PositiveSmallIntegerField(default=0)
+    purchases = models.PositiveIntegerField(default=0)
+    transfers_in = models.PositiveIntegerField(default=0)
+    transfers_out = models.PositiveIntegerField(default=0)
+    assignments = models.PositiveIntegerField(default=0)
+    expenditures = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('day', 'base', 'equipment_type', 'shard')
+        indexes = [
+            models.Index(fields=['base', 'equipment_type', 'day'], name='rollup_base_equip_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.equipment_type.name} at {self.base.name} on {self.day}"
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Progress of one `import_ledger` source file. Updated in the same
+    transaction as each loaded chunk, so an interrupted import resumes after
+    the last committed record without loading anything twice.
+    """
+    ledger = models.CharField(max_length=20)
+    source = models.CharField(max_length=500)
+    fingerprint = models.CharField(max_length=64)
+    records_read = models.PositiveBigIntegerField(default=0)
+    records_imported = models.PositiveBigIntegerField(default=0)
+    records_rejected = models.PositiveBigIntegerField(default=0)
+    completed = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('ledger', 'source')
+
+    def __str__(self):
+        return f"{self.ledger} from {self.source}: {self.records_read} records read"
+
+
+class TouchedInventoryPair(models.Model):
+    """
+    A (base, equipment_type) pair whose ledger records were saved or deleted
+    one by one (API create/update/destroy, admin). Incremental reconciliation
+    re-checks these pairs and then deletes the rows it has processed.
+    """
+    base = models.ForeignKey(Base, on_delete=models.CASCADE)
+    equipment_type = models.ForeignKey(EquipmentType, on_delete=models.CASCADE)
+    touched_at = models.DateTimeField(auto_now_add=True)
+
+
+class InventorySnapshot(models.Model):
+    """
+    Stock of one equipment type at one base at the end of `day`, written by
+    the snapshot job. Historical balances are answered from the nearest
+    snapshot plus the daily rollups in between. Pairs holding nothing that
+    day have no row.
+    """
+    day = models.DateField()
+    base = models.ForeignKey(Base, on_delete=models.CASCADE)
+    equipment_type = models.ForeignKey(EquipmentType, on_delete=models.CASCADE)
+    quantity = models.IntegerField()
+
+    class Meta:
+        unique_together = ('day', 'base', 'equipment_type')
+        indexes = [
+            models.Index(fields=['base', 'equipment_type', 'day'], name='snapshot_base_equip_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.equipment_type.name} at {self.base.name} on {self.day}"
+
+
+class InventoryShard(models.Model):
+    """
+    One slice of the stock of a hot (base, equipment_type) pair. The pair's
+    stock is split over several shard rows so concurrent withdrawals lock
+    different rows; what it holds is the sum of its shards.
+    """
+    base = models.ForeignKey(Base, on_delete=models.CASCADE)
+    equipment_type = models.ForeignKey(EquipmentType, on_delete=models.CASCADE)
+    shard = models.PositiveSmallIntegerField()
+    quantity = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('base', 'equipment_type', 'shard')
+
     def __str__(self):
-        return f"Purchased {self.quantity} of {self.equipment_type.name} for {self.base.name}"
\ No newline at end of file
+        return f"Shard {self.shard}: {self.quantity} x {self.equipment_type.name} at {self.base.name}"
@@ -0,0 +1,198 @@
+from collections import namedtuple
+from functools import partial
+
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from . import dashboard_cache, inventory
+from .models import AssetInventory, TouchedInventoryPair
+from .rollups import DIRECTIONS, LEDGERS, rebuild_rollups, settled
+
+Drift = namedtuple('Drift', 'base_id equipment_type_id expected actual')
+
+
+def _scope(queryset, base_field, pairs):
+    if pairs is None:
+        return queryset
+    return queryset.filter(**{
+        f'{base_field}_id__in': {base_id for base_id, equipment_type_id in pairs},
+        'equipment_type_id__in': {equipment_type_id for base_id, equipment_type_id in pairs},
+    })
+
+
+def expected_balances(pairs=None):
+    """
+    Recompute the stock every (base, equipment_type) should hold from the
+    four ledgers in one grouped query: each ledger contributes a UNION ALL
+    branch of signed quantities per base it touches. With `pairs`, only
+    those pairs are computed (using the ledgers' base/equipment indexes).
+    Transfers still pending in the queue, or rejected by it, are left out.
+    Returns {(base_id, equipment_type_id): quantity}.
+    """
+    quote = connection.ops.quote_name
+    branches, params = [], []
+    for model, (date_field, targets) in LEDGERS.items():
+        for base_field, rollup_field in targets:
+            queryset = _scope(settled(model), base_field, pairs)
+            sql, branch_params = queryset.values_list(
+                f'{base_field}_id', 'equipment_type_id', 'quantity'
+            ).query.sql_with_params()
+            sign = '' if DIRECTIONS[rollup_field] > 0 else '-'
+            branches.append(
+                f'SELECT ledger.{quote(f"{base_field}_id")} AS base_id, ledger.{quote("equipment_type_id")}'
+                f' AS equipment_type_id, {sign}ledger.{quote("quantity")} AS quantity FROM ({sql}) ledger'
+            )
+            params.extend(branch_params)
+    sql = (
+        f'SELECT movements.base_id, movements.equipment_type_id, SUM(movements.quantity) FROM ('
+        + ' UNION ALL '.join(branches)
+        + ') movements GROUP BY movements.base_id, movements.equipment_type_id'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        balances = {(base_id, equipment_type_id): int(total) for base_id, equipment_type_id, total in cursor}
+    if pairs is not None:
+        wanted = set(pairs)
+        balances = {pair: total for pair, total in balances.items() if pair in wanted}
+    return balances
+
+
+def find_drift(pairs=None):
+    """
+    Diff expected balances against AssetInventory. Returns the number of
+    pairs checked and the list of Drift, sorted by pair.
+    """
+    expected = expected_balances(pairs)
+    actual = dict(
+        ((base_id, equipment_type_id), quantity)
+        for base_id, equipment_type_id, quantity in _scope(AssetInventory.objects.with_stock(), 'base', pairs)
+        .values_list('base_id', 'equipment_type_id', 'stock')
+    )
+    checked = set(expected) | set(actual) if pairs is None else set(pairs)
+    drift = [
+        Drift(*pair, expected.get(pair, 0), actual.get(pair, 0))
+        for pair in sorted(checked) if expected.get(pair, 0) != actual.get(pair, 0)
+    ]
+    return len(checked), drift
+
+
+def repair(drift):
+    """
+    Set drifted inventory rows to their expected balance. The rows are locked
+    first and the balances recomputed under the lock, so writes that
+    committed meanwhile are taken into account. The daily rollup rows of the
+    repaired pairs are rebuilt from the ledgers too, so snapshots and
+    historical balances agree with the repaired stock. A negative expected
+    balance (more recorded outflows than inflows) cannot be stored and is
+    left for a person to resolve. Returns the list of Drift that was
+    repaired.
+    """
+    pairs = [(item.base_id, item.equipment_type_id) for item in drift]
+    repaired = []
+    with transaction.atomic():
+        stock = inventory.lock(pairs)
+        expected = expected_balances(pairs)
+        changed = []
+        for pair, row in stock.items():
+            quantity = expected.get(pair, 0)
+            if quantity >= 0 and row.quantity != quantity:
+                repaired.append(Drift(*pair, quantity, row.quantity))
+                row.quantity = quantity
+                changed.append(row)
+        inventory.save_quantities(changed)
+        rebuild_rollups(pairs=[(item.base_id, item.equipment_type_id) for item in repaired])
+        bases = {item.base_id for item in repaired}
+        transaction.on_commit(lambda: dashboard_cache.bump_bases(bases))
+    return repaired
+
+
+def reconcile(incremental=False, fix=False):
+    """
+    Check inventory against the ledgers, and optionally repair it.
+
+    The full check covers every pair. The incremental check covers only the
+    pairs recorded in TouchedInventoryPair since the last incremental run,
+    and consumes those records. Returns (pairs checked, drift, repaired).
+    """
+    pairs, last_touch = None, None
+    if incremental:
+        touched = list(TouchedInventoryPair.objects.order_by('id').values_list('id', 'base_id', 'equipment_type_id'))
+        if not touched:
+            return 0, [], []
+        last_touch = touched[-1][0]
+        pairs = {(base_id, equipment_type_id) for touch_id, base_id, equipment_type_id in touched}
+
+    checked, drift = find_drift(pairs)
+    repaired = repair(drift) if fix and drift else []
+    if last_touch is not None:
+        # Pairs touched while this ran have higher ids and wait for the next
+        # run; drift left unrepaired stays queued so it keeps being reported.
+        with transaction.atomic():
+            TouchedInventoryPair.objects.filter(id__lte=last_touch).delete()
+            fixed = {(item.base_id, item.equipment_type_id) for item in repaired}
+            _touch({(item.base_id, item.equipment_type_id) for item in drift} - fixed)
+    return checked, drift, repaired
+
+
+# --- Touch tracking -----------------------------------------------------
+
+def _pairs_of(model, values):
+    date_field, targets = LEDGERS[model]
+    return {(values[f'{base_field}_id'], values['equipment_type_id']) for base_field, rollup_field in targets}
+
+
+def _touch(pairs):
+    TouchedInventoryPair.objects.bulk_create(
+        [TouchedInventoryPair(base_id=base_id, equipment_type_id=equipment_type_id) for base_id, equipment_type_id in pairs]
+    )
+
+
+def _touch_on_commit(pairs, using):
+    # Ledger writes only queue their pairs; everything one transaction touches
+    # is inserted once, in a single statement, when it commits. A rolled-back
+    # transaction (or savepoint) drops its pending insert, and the next touch
+    # on the connection starts a new one. A touch lost to a crash between the
+    # commit and the insert is still caught by the full check.
+    connection = transaction.get_connection(using)
+    pending = getattr(connection, 'pending_touches', None)
+    if pending is not None and any(callback is pending[1] for sids, callback, robust in connection.run_on_commit):
+        pending[0].update(pairs)
+        return
+    flush = partial(_flush_touches, connection)
+    connection.pending_touches = (set(pairs), flush)
+    transaction.on_commit(flush, using=using)
+
+
+def _flush_touches(connection):
+    (pairs, flush), connection.pending_touches = connection.pending_touches, None
+    _touch(pairs)
+
+
+def _fields(model):
+    date_field, targets = LEDGERS[model]
+    return [f'{base_field}_id' for base_field, rollup_field in targets] + ['equipment_type_id']
+
+
+def _before_save(sender, instance, raw=False, using=None, **kwargs):
+    # An update can move a record to another base or equipment type; the
+    # pairs it leaves are touched as well as the ones it lands on.
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    previous = sender.objects.filter(pk=instance.pk).values(*_fields(sender)).first()
+    if previous:
+        _touch_on_commit(_pairs_of(sender, previous), using)
+
+
+def _after_save(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        _touch_on_commit(_pairs_of(sender, {field: getattr(instance, field) for field in _fields(sender)}), using)
+
+
+def _after_delete(sender, instance, using=None, **kwargs):
+    _touch_on_commit(_pairs_of(sender, {field: getattr(instance, field) for field in _fields(sender)}), using)
+
+
+for _model in LEDGERS:
+    pre_save.connect(_before_save, sender=_model, dispatch_uid=f'reconciliation-pre-{_model._meta.label}')
+    post_save.connect(_after_save, sender=_model, dispatch_uid=f'reconciliation-save-{_model._meta.label}')
+    post_delete.connect(_after_delete, sender=_model, dispatch_uid=f'reconciliation-delete-{_model._meta.label}')
@@ -0,0 +1,194 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework import serializers
+
+from .models import EquipmentType
+from mams_project.shared_cache import is_shared
+from users.models import Base
+
+
+class ReferenceCache:
+    """
+    In-process copy of a small, rarely changing table (bases, equipment
+    types), loaded with one query and served from memory.
+
+    A version stamp in the Django cache is bumped by save/delete signals.
+    Each process re-reads the stamp at most every
+    REFERENCE_CACHE_CHECK_INTERVAL seconds and reloads the table when it has
+    moved, so changes made by other workers show up within that interval.
+    Changes made in this process show up immediately. A lookup that misses
+    falls back to the database, so newly created rows are never rejected.
+
+    When the cache is process-local the stamp cannot carry other workers'
+    changes: the table is then reloaded every interval regardless, and
+    get() confirms each id against the database, so a row deleted elsewhere
+    is rejected rather than written as a dangling foreign key.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.version_key = f'refdata:version:{model._meta.label_lower}'
+        self.changed_key = f'refdata:changed:{model._meta.label_lower}'
+        self._lock = threading.Lock()
+        self._rows = None
+        self._representations = {}
+        self._version = None
+        self._checked_at = 0.0
+        self.hits = self.misses = self.reloads = 0
+
+    def __deepcopy__(self, memo):
+        # DRF deep-copies declared fields per serializer; they must all keep
+        # pointing at the one shared cache.
+        return self
+
+    def _shared_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, time.time_ns(), timeout=None)
+            version = cache.get(self.version_key)
+        return version
+
+    def _rows_for_current_version(self):
+        interval = getattr(settings, 'REFERENCE_CACHE_CHECK_INTERVAL', 5)
+        now = time.monotonic()
+        if self._rows is not None and now - self._checked_at < interval:
+            return self._rows
+        version = self._shared_version()
+        with self._lock:
+            if self._rows is None or version != self._version or not is_shared():
+                self._rows = {row.pk: row for row in self.model.objects.all()}
+                self._representations = {}
+                self._version = version
+                self.reloads += 1
+            self._checked_at = now
+            return self._rows
+
+    def validators(self):
+        """
+        Return (version, changed_at) for conditional GETs of the table: the
+        shared version stamp, read afresh rather than through the check
+        interval, and the time of the last change if it is still known.
+        """
+        values = cache.get_many([self.version_key, self.changed_key])
+        version = values.get(self.version_key)
+        if version is None:
+            version = self._shared_version()
+        return version, values.get(self.changed_key)
+
+    def all(self):
+        """Return every cached row."""
+        return list(self._rows_for_current_version().values())
+
+    def get(self, pk):
+        """Return the row with primary key `pk`, or None if it does not exist."""
+        return self._lookup(pk, confirm=not is_shared())
+
+    def _lookup(self, pk, confirm):
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            return None
+        rows = self._rows_for_current_version()
+        row = rows.get(pk)
+        if row is not None and not confirm:
+            self.hits += 1
+            return row
+        self.misses += 1
+        row = self.model.objects.filter(pk=pk).first()
+        if row is not None:
+            rows[pk] = row
+        else:
+            rows.pop(pk, None)
+        return row
+
+    def represent(self, pk, serializer_class):
+        """Return serializer_class(row).data for `pk`, memoised until the next reload."""
+        self._rows_for_current_version()
+        key = (pk, serializer_class)
+        representation = self._representations.get(key)
+        if representation is not None:
+            self.hits += 1
+            return representation
+        # Rendering an existing foreign key needs no confirmation
+        row = self._lookup(pk, confirm=False)
+        if row is None:
+            return None
+        representation = self._representations[key] = dict(serializer_class(row).data)
+        return representation
+
+    def invalidate(self):
+        """Drop this process's copy now and bump the shared stamp on commit."""
+        with self._lock:
+            self._rows = None
+        transaction.on_commit(lambda: self._bump())
+
+    def _bump(self):
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            cache.add(self.version_key, time.time_ns(), timeout=None)
+        cache.set(self.changed_key, int(time.time()), timeout=None)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'reloads': self.reloads}
+
+
+bases = ReferenceCache(Base)
+equipment_types = ReferenceCache(EquipmentType)
+
+
+@receiver([post_save, post_delete], sender=Base)
+def _base_changed(sender, **kwargs):
+    bases.invalidate()
+
+
+@receiver([post_save, post_delete], sender=EquipmentType)
+def _equipment_type_changed(sender, **kwargs):
+    equipment_types.invalidate()
+
+
+def stats():
+    return {'bases': bases.stats(), 'equipment_types': equipment_types.stats()}
+
+
+class CachedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField that validates ids against a ReferenceCache."""
+
+    def __init__(self, reference_cache, **kwargs):
+        self.reference_cache = reference_cache
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        row = self.reference_cache.get(data)
+        if row is None:
+            try:
+                int(data)
+            except (TypeError, ValueError):
+                self.fail('incorrect_type', data_type=type(data).__name__)
+            self.fail('does_not_exist', pk_value=data)
+        return row
+
+
+class CachedNestedField(serializers.Field):
+    """
+    Read-only nested representation of a cached reference row, rendered from
+    the foreign key id alone so list querysets need not join the table.
+    Declare it with `source='<fk>_id'`.
+    """
+
+    def __init__(self, serializer_class, reference_cache, **kwargs):
+        self.serializer_class = serializer_class
+        self.reference_cache = reference_cache
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, pk):
+        return self.reference_cache.represent(pk, self.serializer_class)
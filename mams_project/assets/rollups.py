@@ -0,0 +1,232 @@
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import dashboard_cache, sharding
+from .models import DailyMovementRollup, PurchaseRecord
+from logistics.models import TransferRecord, AssignmentRecord, ExpenditureRecord
+
+# How each ledger feeds the rollup: the record's date field, and for every
+# base the record touches, which rollup column receives its quantity.
+LEDGERS = {
+    PurchaseRecord: ('purchase_date', [('base', 'purchases')]),
+    TransferRecord: ('transfer_date', [('to_base', 'transfers_in'), ('from_base', 'transfers_out')]),
+    AssignmentRecord: ('assignment_date', [('issuing_base', 'assignments')]),
+    ExpenditureRecord: ('expenditure_date', [('base', 'expenditures')]),
+}
+
+# Ledger records that have not moved any stock: transfers still waiting in
+# the transfer queue, or rejected by it.
+UNSETTLED = {
+    TransferRecord: {'status__in': [TransferRecord.Status.PENDING, TransferRecord.Status.REJECTED]},
+}
+
+
+def settled(model):
+    """The records of a ledger that have moved stock."""
+    queryset = model.objects.all()
+    if model in UNSETTLED:
+        queryset = queryset.exclude(**UNSETTLED[model])
+    return queryset
+
+
+# How each rollup column moves stock: inflows add, outflows subtract.
+DIRECTIONS = {
+    'purchases': 1,
+    'transfers_in': 1,
+    'transfers_out': -1,
+    'assignments': -1,
+    'expenditures': -1,
+}
+
+
+def net_movement_sql(alias):
+    """SQL for the signed stock change of a rollup row, e.g. `r.purchases + r.transfers_in - ...`."""
+    terms = [f"{'+' if sign > 0 else '-'} {alias}.{column}" for column, sign in DIRECTIONS.items()]
+    return ' '.join(terms).lstrip('+ ')
+
+
+@contextmanager
+def explicit_ledger_dates():
+    """
+    Suspend auto_now_add on the ledger date fields, so records can be written
+    with the dates they carry (seeding, imports). The switch is process-wide:
+    use it from management commands, not from request handling.
+    """
+    fields = [model._meta.get_field(date_field) for model, (date_field, targets) in LEDGERS.items()]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def add_movement(day, base_id, equipment_type_id, **deltas):
+    """
+    Add `deltas` (rollup column -> quantity) to the rollup row for
+    (day, base, equipment_type), creating the row if it does not exist yet.
+    A sharded pair's day is spread over one row per shard, picked at random,
+    so its writers do not queue on one rollup row either. Call inside the
+    transaction that writes the ledger record.
+    """
+    key = {
+        'day': day, 'base_id': base_id, 'equipment_type_id': equipment_type_id,
+        'shard': sharding.pick_shard(base_id, equipment_type_id),
+    }
+    increments = {field: F(field) + amount for field, amount in deltas.items()}
+
+    if DailyMovementRollup.objects.filter(**key).update(**increments):
+        return
+    try:
+        # The savepoint keeps the caller's transaction usable if a concurrent
+        # request created the same row first.
+        with transaction.atomic():
+            DailyMovementRollup.objects.create(**key, **deltas)
+    except IntegrityError:
+        DailyMovementRollup.objects.filter(**key).update(**increments)
+
+
+def is_settled(record):
+    """Whether a ledger record has moved stock (see UNSETTLED)."""
+    for lookup, values in UNSETTLED.get(type(record), {}).items():
+        if getattr(record, lookup.removesuffix('__in')) in values:
+            return False
+    return True
+
+
+def _deltas(records):
+    # {(base_id, equipment_type_id, day): {rollup column: quantity}}
+    deltas = defaultdict(lambda: defaultdict(int))
+    for record in records:
+        date_field, targets = LEDGERS[type(record)]
+        day = timezone.localdate(getattr(record, date_field))
+        for base_field, rollup_field in targets:
+            key = (getattr(record, f'{base_field}_id'), record.equipment_type_id, day)
+            deltas[key][rollup_field] += record.quantity
+    return deltas
+
+
+def _bump_on_commit(deltas):
+    base_ids = {base_id for base_id, equipment_type_id, day in deltas}
+    if base_ids:
+        transaction.on_commit(lambda: dashboard_cache.bump_bases(base_ids))
+
+
+def record_movement(record):
+    """
+    Fold a newly created ledger record into the daily rollup, and invalidate
+    the cached dashboard summaries of the bases it touched once the
+    surrounding transaction commits.
+    """
+    record_movements([record])
+
+
+def record_movements(records):
+    """
+    Fold a batch of newly created ledger records into the daily rollup with
+    one upsert per (day, base, equipment_type) touched, rather than per record.
+    """
+    deltas = _deltas(records)
+    # Rows are written in ascending base id order so concurrent transfers in
+    # opposite directions lock them consistently.
+    for base_id, equipment_type_id, day in sorted(deltas):
+        add_movement(day, base_id, equipment_type_id, **deltas[base_id, equipment_type_id, day])
+    _bump_on_commit(deltas)
+
+
+def remove_movements(records):
+    """
+    Take ledger records that are about to be edited or deleted back out of
+    the daily rollup. A sharded pair's day is drawn down shard by shard, with
+    its rows locked. Records that never moved stock are skipped.
+    """
+    deltas = _deltas(record for record in records if is_settled(record))
+    for base_id, equipment_type_id, day in sorted(deltas):
+        rows = list(
+            DailyMovementRollup.objects.select_for_update()
+            .filter(day=day, base_id=base_id, equipment_type_id=equipment_type_id).order_by('shard')
+        )
+        columns = deltas[base_id, equipment_type_id, day]
+        for column, amount in columns.items():
+            for row in rows:
+                taken = min(amount, getattr(row, column))
+                setattr(row, column, getattr(row, column) - taken)
+                amount -= taken
+        DailyMovementRollup.objects.bulk_update(rows, list(columns))
+    _bump_on_commit(deltas)
+
+
+class RollupCorrectionMixin:
+    """
+    Keep the daily rollup, and with it the dashboard, in step with edits and
+    deletions of ledger records. Stock is not moved back here: the drift an
+    edit leaves in AssetInventory is found and repaired by reconciliation.
+    """
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            instance = serializer.instance
+            remove_movements([type(instance).objects.select_for_update().get(pk=instance.pk)])
+            record = serializer.save()
+            if is_settled(record):
+                record_movements([record])
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            remove_movements([type(instance).objects.select_for_update().get(pk=instance.pk)])
+            instance.delete()
+
+
+def rebuild_rollups(batch_size=1000, pairs=None):
+    """
+    Recompute the rollup table from the settled records of the raw ledgers
+    with one grouped query per ledger column. With `pairs`, only the rows of
+    those (base_id, equipment_type_id) pairs are rebuilt. Returns the number
+    of rollup rows written.
+    """
+    scope, wanted = Q(), None
+    if pairs is not None:
+        wanted = set(pairs)
+        if not wanted:
+            return 0
+        for base_id, equipment_type_id in wanted:
+            scope |= Q(base_id=base_id, equipment_type_id=equipment_type_id)
+
+    totals = defaultdict(lambda: defaultdict(int))
+    for model, (date_field, targets) in LEDGERS.items():
+        for base_field, rollup_field in targets:
+            grouped = settled(model)
+            if wanted is not None:
+                grouped = grouped.filter(**{
+                    f'{base_field}_id__in': {base_id for base_id, equipment_type_id in wanted},
+                    'equipment_type_id__in': {equipment_type_id for base_id, equipment_type_id in wanted},
+                })
+            grouped = (
+                grouped.annotate(day=TruncDate(date_field))
+                .values('day', f'{base_field}_id', 'equipment_type_id')
+                .annotate(total=Sum('quantity'))
+            )
+            for row in grouped:
+                key = (row['day'], row[f'{base_field}_id'], row['equipment_type_id'])
+                if wanted is None or key[1:] in wanted:
+                    totals[key][rollup_field] += row['total']
+
+    rows = [
+        DailyMovementRollup(day=day, base_id=base_id, equipment_type_id=equipment_type_id, **columns)
+        for (day, base_id, equipment_type_id), columns in totals.items()
+    ]
+    with transaction.atomic():
+        DailyMovementRollup.objects.filter(scope).delete()
+        DailyMovementRollup.objects.bulk_create(rows, batch_size=batch_size)
+        if wanted is None:
+            transaction.on_commit(dashboard_cache.bump_all)
+        else:
+            base_ids = {base_id for base_id, equipment_type_id in wanted}
+            transaction.on_commit(lambda: dashboard_cache.bump_bases(base_ids))
+    return len(rows)
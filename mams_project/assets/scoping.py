@@ -0,0 +1,110 @@
+from datetime import datetime, time, timedelta
+from functools import reduce
+from operator import or_
+
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+class FilterError(Exception):
+    """The filters of a request cannot be applied; the message is for the client."""
+
+
+class UnassignedCommander(FilterError):
+    """A base commander has no base to scope their requests to."""
+
+
+def _id(params, name):
+    value = params.get(name, '')
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise FilterError(f"'{name}' must be a whole number.")
+
+
+def _date(params, name):
+    value = params.get(name, '')
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        # Well-formed but impossible, e.g. 2024-13-45
+        parsed = None
+    if parsed is None:
+        raise FilterError(f"'{name}' must be a valid date (YYYY-MM-DD).")
+    return parsed
+
+
+def resolve_filters(request):
+    """
+    Parse the dashboard-style filters (base, equipment_type, start_date and
+    end_date, both dates inclusive) from the query string and apply
+    role-based scoping: a base commander is always restricted to their own
+    base, whatever they asked for. Raises FilterError if they cannot be
+    applied.
+    """
+    params = request.query_params
+    filters = {
+        'base_id': _id(params, 'base'),
+        'equipment_type_id': _id(params, 'equipment_type'),
+        'start_date': _date(params, 'start_date'),
+        'end_date': _date(params, 'end_date'),
+    }
+
+    user = request.user
+    if user.role == 'BASE_COMMANDER':
+        if not user.base_id:
+            raise UnassignedCommander("User is not assigned to a base.")
+        # Force filter to the commander's base
+        filters['base_id'] = user.base_id
+    return filters
+
+
+def date_bounds(start_date=None, end_date=None):
+    """
+    Turn an inclusive (start_date, end_date) pair of dates into aware
+    datetimes usable as a half-open [lower, upper) range on a DateTimeField.
+    Comparing the raw column (rather than `__date`) keeps the range on the
+    (base, equipment_type, <date>) indexes.
+    """
+    tz = timezone.get_current_timezone()
+    lower = timezone.make_aware(datetime.combine(start_date, time.min), tz) if start_date else None
+    upper = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min), tz) if end_date else None
+    return lower, upper
+
+
+class BaseScopedQuerySet(models.QuerySet):
+    """
+    QuerySet of ledger records that belong to bases. The model names its
+    base foreign keys in `base_fields`, e.g. ('from_base', 'to_base') for
+    transfers; a record belongs to a base if any of them points at it.
+    """
+
+    def for_base(self, base_id):
+        return self.filter(reduce(or_, (Q(**{f'{field}_id': base_id}) for field in self.model.base_fields)))
+
+    def visible_to(self, user):
+        """The records `user` may see: a base commander only sees their own base's."""
+        if getattr(user, 'role', None) != 'BASE_COMMANDER':
+            return self
+        if not user.base_id:
+            return self.none()
+        return self.for_base(user.base_id)
+
+
+class BaseScopedMixin:
+    """
+    Scope a viewset's queryset to what the requesting user may see (see
+    BaseScopedQuerySet.visible_to). Filtering and pagination apply on top,
+    so a commander's pages are full pages of their own base's records read
+    from its index range, and get_object() answers 404 for another base's
+    record without loading it.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().visible_to(self.request.user)
@@ -0,0 +1,162 @@
+"""
+Prefix and fuzzy text search for the list endpoints.
+
+A prefix search matches records where some word of the field starts with
+the search term; a fuzzy search matches records with a word that is close
+to each word of the term (typos, plurals).
+
+On PostgreSQL both run in SQL against the pg_trgm GIN indexes on the
+searched ledger columns: the prefix search as a word-boundary regex, the
+fuzzy one with the word-similarity operator. Elsewhere (SQLite) each
+process keeps an in-memory prefix index of the distinct values of the
+column and turns a search into `field IN (...)` over the matching values.
+Ledgers are append-only, so the index catches up with one primary-key
+range query per search and is rebuilt in full every
+SEARCH_INDEX_REBUILD_INTERVAL seconds to pick up edited records.
+
+Equipment types are reference data already held in memory by refcache,
+so they are always searched there.
+"""
+import difflib
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Max
+
+_WORD = re.compile(r'\w+')
+
+
+def words(text):
+    return _WORD.findall(text.lower())
+
+
+def _phrase(term):
+    # The term as a phrase starting at a word boundary, in any case
+    return re.compile(r'\b' + re.escape(term.lower()))
+
+
+def _max_values():
+    return getattr(settings, 'SEARCH_MAX_VALUES', 1000)
+
+
+class PrefixIndex:
+    """Words of a set of strings, kept sorted and searched by bisection."""
+
+    def __init__(self, values=()):
+        self.values = set()
+        self.words = []
+        self.by_word = defaultdict(set)
+        self.add(values)
+
+    def add(self, values):
+        new = {value for value in values if value and value not in self.values}
+        if not new:
+            return
+        self.values |= new
+        for value in new:
+            for word in set(words(value)):
+                if word not in self.by_word:
+                    insort(self.words, word)
+                self.by_word[word].add(value)
+
+    def prefix(self, term):
+        """Values with a word starting with `term`; a multi-word term must match as a phrase."""
+        term_words = words(term)
+        if not term_words:
+            return set()
+        first = term_words[0]
+        candidates = set()
+        for word in self.words[bisect_left(self.words, first):]:
+            if not word.startswith(first):
+                break
+            candidates |= self.by_word[word]
+        if len(term_words) == 1:
+            return candidates
+        phrase = _phrase(' '.join(term_words))
+        return {value for value in candidates if phrase.search(' '.join(words(value)))}
+
+    def fuzzy(self, term, cutoff=0.75):
+        """Values holding a word close to every word of `term`."""
+        matches = None
+        for term_word in words(term):
+            found = set()
+            for word in difflib.get_close_matches(term_word, self.words, n=20, cutoff=cutoff):
+                found |= self.by_word[word]
+            matches = found if matches is None else matches & found
+        return matches or set()
+
+    def match(self, term, fuzzy=False):
+        return self.fuzzy(term) if fuzzy else self.prefix(term)
+
+
+class ColumnIndex:
+    """A PrefixIndex of the distinct values of one ledger text column."""
+
+    def __init__(self, model, field):
+        self.model = model
+        self.field = field
+        self._lock = threading.Lock()
+        self._index = None
+        self._last_pk = 0
+        self._built_at = 0.0
+
+    def match(self, term, fuzzy=False):
+        interval = getattr(settings, 'SEARCH_INDEX_REBUILD_INTERVAL', 300)
+        with self._lock:
+            now = time.monotonic()
+            if self._index is None or now - self._built_at >= interval:
+                self._index, self._last_pk, self._built_at = PrefixIndex(), 0, now
+            rows = list(
+                self.model.objects.filter(pk__gt=self._last_pk).exclude(**{self.field: ''})
+                .order_by().values(self.field).annotate(last=Max('pk'))
+            )
+            if rows:
+                self._index.add(row[self.field] for row in rows)
+                self._last_pk = max(row['last'] for row in rows)
+            return self._index.match(term, fuzzy)
+
+
+_column_indexes = {}
+_column_indexes_lock = threading.Lock()
+
+
+def column_index(model, field):
+    key = (model, field)
+    index = _column_indexes.get(key)
+    if index is None:
+        with _column_indexes_lock:
+            index = _column_indexes.setdefault(key, ColumnIndex(model, field))
+    return index
+
+
+def reset():
+    """Drop every column index; each is rebuilt by its next search."""
+    with _column_indexes_lock:
+        _column_indexes.clear()
+
+
+def search(queryset, field, term, fuzzy=False):
+    """Filter `queryset` to rows whose `field` matches `term`."""
+    if connection.vendor == 'postgresql':
+        if fuzzy:
+            from django.contrib.postgres.lookups import TrigramWordSimilar
+            return queryset.filter(TrigramWordSimilar(F(field), term))
+        return queryset.filter(**{f'{field}__iregex': r'\m' + re.escape(term)})
+
+    values = column_index(queryset.model, field).match(term, fuzzy)
+    if not fuzzy and len(values) > _max_values():
+        # Too broad for an IN list: scan with the same phrase match instead
+        return queryset.filter(**{f'{field}__iregex': _phrase(term).pattern})
+    return queryset.filter(**{f'{field}__in': values})
+
+
+def search_rows(rows, fields, term, fuzzy=False):
+    """The in-memory `rows` (e.g. from refcache) whose `fields` match `term`."""
+    texts = {row.pk: ' '.join(getattr(row, field) for field in fields) for row in rows}
+    matches = PrefixIndex(texts.values()).match(term, fuzzy)
+    return [row for row in rows if texts[row.pk] in matches]
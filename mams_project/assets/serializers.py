@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from .models import EquipmentType, AssetInventory, PurchaseRecord
 from users.models import Base
+from . import refcache
+from .refcache import CachedNestedField, CachedPrimaryKeyRelatedField
 
 class BaseSerializer(serializers.ModelSerializer):
     class Meta:
@@ -14,13 +16,15 @@ class EquipmentTypeSerializer(serializers.ModelSerializer):
 
 class PurchaseRecordSerializer(serializers.ModelSerializer):
     # We can add nested serializers for better frontend display
-    equipment_type = EquipmentTypeSerializer(read_only=True)
-    equipment_type_id = serializers.PrimaryKeyRelatedField(
-        queryset=EquipmentType.objects.all(), source='equipment_type', write_only=True
+    # Related ids are validated and nested objects rendered from the
+    # in-process reference-data cache rather than the database
+    equipment_type = CachedNestedField(EquipmentTypeSerializer, refcache.equipment_types, source='equipment_type_id')
+    equipment_type_id = CachedPrimaryKeyRelatedField(
+        refcache.equipment_types, queryset=EquipmentType.objects.all(), source='equipment_type', write_only=True
     )
-    base = BaseSerializer(read_only=True)
-    base_id = serializers.PrimaryKeyRelatedField(
-        queryset=Base.objects.all(), source='base', write_only=True
+    base = CachedNestedField(BaseSerializer, refcache.bases, source='base_id')
+    base_id = CachedPrimaryKeyRelatedField(
+        refcache.bases, queryset=Base.objects.all(), source='base', write_only=True
     )
     
     class Meta:
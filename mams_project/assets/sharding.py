@@ -0,0 +1,205 @@
+"""
+Sharded stock counters for hot (base, equipment_type) pairs.
+
+Every withdrawal from a pair updates its one AssetInventory row, so bursts
+of requests against the same pair queue on that row's lock. A pair whose
+stock updates keep waiting is promoted: its stock moves into
+INVENTORY_SHARDS InventoryShard rows and AssetInventory.shards records how
+many. Withdrawals then take from one shard that holds enough, skipping
+shards other requests have locked; deposits go to a random shard, and the
+pair's daily rollup is spread over as many rows. Reads add the shards back
+up (AssetInventory.objects.with_stock()). Pairs that have gone quiet are
+demoted by the rebalance_inventory_shards command.
+"""
+import random
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from mams_project import metrics
+
+from .models import AssetInventory, InventoryShard
+
+CONTENDED_KEY = 'inventory:contended:{window}:{base_id}:{equipment_type_id}'
+WRITES_KEY = 'inventory:writes:{window}:{base_id}:{equipment_type_id}'
+VERSION_KEY = 'inventory:sharded:version'
+
+
+def shard_count():
+    """Shards a promoted pair is split into; 0 turns automatic promotion off."""
+    return getattr(settings, 'INVENTORY_SHARDS', 0)
+
+
+def split(total, count):
+    """Spread `total` over `count` shards as evenly as possible."""
+    return [total // count + (index < total % count) for index in range(count)]
+
+
+def _window_length():
+    return getattr(settings, 'INVENTORY_CONTENTION_WINDOW', 60)
+
+
+def _window():
+    return int(time.time() // _window_length())
+
+
+def _count(key):
+    """Increment a per-window counter, creating it on first use."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout=3 * _window_length()):
+            return 1
+        return cache.incr(key)
+
+
+class ShardedPairs:
+    """
+    In-process map of the sharded pairs to their shard counts. It tells
+    writers which path to try first and how to spread rollup rows; writers
+    fall back to the other path when it is stale, so it never has to be
+    exact. Reloaded like the reference-data cache: when the version stamp
+    bumped by promotion and demotion has moved, checked at most every
+    REFERENCE_CACHE_CHECK_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pairs = {}
+        self._version = None
+        self._checked_at = None
+
+    def get(self, base_id, equipment_type_id):
+        """Shard count of the pair, or 0 if it is not sharded."""
+        return self._current().get((base_id, equipment_type_id), 0)
+
+    def _current(self):
+        interval = getattr(settings, 'REFERENCE_CACHE_CHECK_INTERVAL', 5)
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < interval:
+            return self._pairs
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+            version = cache.get(VERSION_KEY)
+        with self._lock:
+            if self._checked_at is None or version != self._version:
+                self._pairs = {
+                    (base_id, equipment_type_id): shards
+                    for base_id, equipment_type_id, shards in AssetInventory.objects.filter(shards__gt=0)
+                    .values_list('base_id', 'equipment_type_id', 'shards')
+                }
+                self._version = version
+            self._checked_at = now
+            return self._pairs
+
+    def invalidate(self):
+        """Make every process reload the map; this one on its next lookup."""
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+        self._checked_at = None
+
+
+sharded_pairs = ShardedPairs()
+
+
+def pick_shard(base_id, equipment_type_id):
+    """A random shard of the pair for a write, or 0 if it is not known to be sharded."""
+    count = sharded_pairs.get(base_id, equipment_type_id)
+    return random.randrange(count) if count else 0
+
+
+def observe(base_id, equipment_type_id, waited):
+    """
+    Note a stock update of an unsharded pair that took `waited` seconds.
+    Once INVENTORY_PROMOTE_AFTER updates of the pair within one window took
+    longer than INVENTORY_CONTENTION_WAIT, it is promoted after the current
+    transaction commits.
+    """
+    if shard_count() < 2 or waited < getattr(settings, 'INVENTORY_CONTENTION_WAIT', 0.05):
+        return
+    key = CONTENDED_KEY.format(window=_window(), base_id=base_id, equipment_type_id=equipment_type_id)
+    # Only the update that reaches the threshold promotes
+    if _count(key) == getattr(settings, 'INVENTORY_PROMOTE_AFTER', 20):
+        transaction.on_commit(lambda: promote(base_id, equipment_type_id))
+
+
+def record_write(base_id, equipment_type_id):
+    """Count a write to a sharded pair, for demote_idle()."""
+    _count(WRITES_KEY.format(window=_window(), base_id=base_id, equipment_type_id=equipment_type_id))
+
+
+def promote(base_id, equipment_type_id, count=None):
+    """
+    Move the pair's stock from its inventory row into `count` (default
+    INVENTORY_SHARDS) evenly filled shards. Returns False if the pair has
+    no inventory row or is already sharded.
+    """
+    count = count or shard_count()
+    if count < 2:
+        return False
+    with transaction.atomic():
+        row = AssetInventory.objects.select_for_update().filter(
+            base_id=base_id, equipment_type_id=equipment_type_id
+        ).first()
+        if row is None or row.shards:
+            return False
+        InventoryShard.objects.bulk_create([
+            InventoryShard(base_id=base_id, equipment_type_id=equipment_type_id, shard=shard, quantity=quantity)
+            for shard, quantity in enumerate(split(row.quantity, count))
+        ])
+        row.quantity, row.shards = 0, count
+        row.save(update_fields=['quantity', 'shards'])
+        transaction.on_commit(sharded_pairs.invalidate)
+    metrics.inventory_sharding('promoted')
+    return True
+
+
+def demote(base_id, equipment_type_id):
+    """
+    Fold a sharded pair's shards back into its inventory row. Returns False
+    if the pair is not sharded.
+    """
+    with transaction.atomic():
+        row = AssetInventory.objects.select_for_update().filter(
+            base_id=base_id, equipment_type_id=equipment_type_id
+        ).first()
+        if row is None or not row.shards:
+            return False
+        shards = InventoryShard.objects.filter(base_id=base_id, equipment_type_id=equipment_type_id)
+        row.quantity += sum(shards.select_for_update().order_by('shard').values_list('quantity', flat=True))
+        shards.delete()
+        row.shards = 0
+        row.save(update_fields=['quantity', 'shards'])
+        transaction.on_commit(sharded_pairs.invalidate)
+    metrics.inventory_sharding('demoted')
+    return True
+
+
+def demote_idle():
+    """
+    Demote the pairs that have been sharded for at least two windows and
+    saw fewer than INVENTORY_DEMOTE_BELOW writes in the last complete
+    window. Returns the demoted pairs.
+    """
+    cutoff = timezone.now() - timedelta(seconds=2 * _window_length())
+    pairs = list(
+        InventoryShard.objects.filter(shard=0, created_at__lte=cutoff).values_list('base_id', 'equipment_type_id')
+    )
+    previous = _window() - 1
+    keys = {
+        pair: WRITES_KEY.format(window=previous, base_id=pair[0], equipment_type_id=pair[1]) for pair in pairs
+    }
+    writes = cache.get_many(list(keys.values()))
+    threshold = getattr(settings, 'INVENTORY_DEMOTE_BELOW', 30)
+    return [pair for pair, key in keys.items() if writes.get(key, 0) < threshold and demote(*pair)]
+
+
+def demote_all():
+    """Demote every sharded pair, e.g. after sharding has been turned off. Returns the demoted pairs."""
+    pairs = list(AssetInventory.objects.filter(shards__gt=0).values_list('base_id', 'equipment_type_id'))
+    return [pair for pair in pairs if demote(*pair)]
@@ -0,0 +1,120 @@
+from datetime import timedelta
+
+from django.db import connection, connections, transaction
+from django.db.models import F, Max, Min, Q
+from django.utils import timezone
+
+from .aggregation import summary_querysets
+from .models import DailyMovementRollup, InventorySnapshot
+from .rollups import net_movement_sql
+
+
+def take_snapshot(day):
+    """
+    Record the stock every pair held at the end of `day`: the current
+    inventory minus the movements rolled up for later days, computed and
+    written in one INSERT ... SELECT. Replaces an existing snapshot of that
+    day. Returns the number of rows written.
+    """
+    quote = connection.ops.quote_name
+    snapshot = quote(InventorySnapshot._meta.db_table)
+    inventory_sql, inventory_params = summary_querysets()[0].values_list(
+        'base_id', 'equipment_type_id', 'stock'
+    ).query.sql_with_params()
+    later_sql, later_params = DailyMovementRollup.objects.filter(day__gt=day).values_list(
+        'base_id', 'equipment_type_id', 'purchases', 'transfers_in', 'transfers_out', 'assignments', 'expenditures',
+    ).query.sql_with_params()
+    with transaction.atomic(), connection.cursor() as cursor:
+        InventorySnapshot.objects.filter(day=day).delete()
+        cursor.execute(
+            f"INSERT INTO {snapshot} (day, base_id, equipment_type_id, quantity) "
+            f"SELECT %s, stock.base_id, stock.equipment_type_id, SUM(stock.quantity) FROM ("
+            f"SELECT inventory.base_id AS base_id, inventory.equipment_type_id AS equipment_type_id, "
+            f"inventory.stock AS quantity FROM ({inventory_sql}) inventory"
+            f" UNION ALL "
+            f"SELECT rollup.base_id, rollup.equipment_type_id, -({net_movement_sql('rollup')}) FROM ({later_sql}) rollup"
+            f") stock GROUP BY stock.base_id, stock.equipment_type_id HAVING SUM(stock.quantity) <> 0",
+            [connection.ops.adapt_datefield_value(day), *inventory_params, *later_params],
+        )
+        return cursor.rowcount
+
+
+def _nearest_anchor(day):
+    """
+    Pick the closest known balance to the end of `day`: a snapshot on or
+    before it, a snapshot after it, or the live inventory (today). Returns
+    (anchor day, is_snapshot).
+    """
+    today = timezone.localdate()
+    bounds = InventorySnapshot.objects.aggregate(
+        before=Max('day', filter=Q(day__lte=day)),
+        after=Min('day', filter=Q(day__gt=day)),
+    )
+    candidates = [(today, False)]
+    if bounds['before']:
+        candidates.append((bounds['before'], True))
+    if bounds['after']:
+        candidates.append((bounds['after'], True))
+    return min(candidates, key=lambda candidate: abs((candidate[0] - day).days))
+
+
+def balances_as_of(day, base_id=None, equipment_type_id=None):
+    """
+    Stock held by each (base, equipment_type) at the end of `day`, as
+    {(base_id, equipment_type_id): quantity}, optionally scoped like the
+    dashboard. Starts from the nearest snapshot (or the live inventory) and
+    applies only the daily rollups between it and `day`, forwards or
+    backwards, so the cost is bounded by the snapshot interval rather than
+    the length of the history. Two queries.
+    """
+    inventory, rollups = summary_querysets(base_id, equipment_type_id)
+    if day >= timezone.localdate():
+        return {
+            (row_base, row_equipment): quantity
+            for row_base, row_equipment, quantity in inventory.values_list('base_id', 'equipment_type_id', 'stock')
+        }
+
+    anchor_day, is_snapshot = _nearest_anchor(day)
+    if is_snapshot:
+        anchor = InventorySnapshot.objects.filter(day=anchor_day).annotate(stock=F('quantity'))
+        if base_id:
+            anchor = anchor.filter(base_id=base_id)
+        if equipment_type_id:
+            anchor = anchor.filter(equipment_type_id=equipment_type_id)
+    else:
+        anchor = inventory
+    if anchor_day <= day:
+        # Roll forwards over (anchor_day, day]
+        delta, sign = rollups.filter(day__gt=anchor_day, day__lte=day), ''
+    else:
+        # Roll backwards over (day, anchor_day]
+        delta, sign = rollups.filter(day__gt=day, day__lte=anchor_day), '-'
+
+    alias = anchor.db
+    anchor_sql, anchor_params = anchor.values_list(
+        'base_id', 'equipment_type_id', 'stock'
+    ).query.get_compiler(alias).as_sql()
+    delta_sql, delta_params = delta.values_list(
+        'base_id', 'equipment_type_id', 'purchases', 'transfers_in', 'transfers_out', 'assignments', 'expenditures',
+    ).query.get_compiler(alias).as_sql()
+    sql = (
+        f"SELECT stock.base_id, stock.equipment_type_id, SUM(stock.quantity) FROM ("
+        f"SELECT anchor.base_id AS base_id, anchor.equipment_type_id AS equipment_type_id, "
+        f"anchor.stock AS quantity FROM ({anchor_sql}) anchor"
+        f" UNION ALL "
+        f"SELECT rollup.base_id, rollup.equipment_type_id, {sign}({net_movement_sql('rollup')}) FROM ({delta_sql}) rollup"
+        f") stock GROUP BY stock.base_id, stock.equipment_type_id"
+    )
+    with connections[alias].cursor() as cursor:
+        cursor.execute(sql, anchor_params + delta_params)
+        return {(row_base, row_equipment): int(quantity) for row_base, row_equipment, quantity in cursor}
+
+
+def total_as_of(day, base_id=None, equipment_type_id=None):
+    """Total stock in scope at the end of `day`."""
+    return sum(balances_as_of(day, base_id, equipment_type_id).values())
+
+
+def snapshot_days(end, days, every):
+    """The days a backfill of `days` days ending on `end` snapshots, one every `every` days."""
+    return [end - timedelta(days=offset) for offset in range(0, days, every)]
@@ -1,9 +1,40 @@
 # assets/tests.py
+import base64
+import csv
+import io
+import json
+import logging
+import os
+import tempfile
+from unittest import mock
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.routers import DefaultRouter
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+from mams_project.async_views import async_list_routes
+from mams_project.access_log import QueueListenerHandler
+from mams_project.testing import ConstantQueryCountMixin, QueryPlanAssertionsMixin, shared_cache
 from users.models import User, Base
-from .models import EquipmentType, AssetInventory, PurchaseRecord
+from users.serializers import MyTokenObtainPairSerializer
+from datetime import timedelta
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from logistics.models import TransferRecord, AssignmentRecord, ExpenditureRecord
+from .models import (
+    EquipmentType, AssetInventory, PurchaseRecord, DailyMovementRollup, TouchedInventoryPair, InventoryShard,
+)
+from .aggregation import dashboard_totals, summary_querysets
+from .importing import LedgerImporter
+from .rollups import rebuild_rollups
+from .snapshots import balances_as_of, take_snapshot, total_as_of
+from .views import AsyncDashboardSummaryView, DashboardSummaryView, PurchaseRecordViewSet
+from . import dashboard_cache, inventory, reconciliation, refcache, search, sharding
 
 class PurchaseTransactionTests(APITestCase):
     def setUp(self):
@@ -54,4 +85,1144 @@ class PurchaseTransactionTests(APITestCase):
 
         # Refresh inventory from DB and check the new total
         inventory.refresh_from_db()
-        self.assertEqual(inventory.quantity, 15) # 10 (initial) + 5 (new) = 15
\ No newline at end of file
+        self.assertEqual(inventory.quantity, 15) # 10 (initial) + 5 (new) = 15
+
+class DashboardSummaryTests(APITestCase):
+    def setUp(self):
+        """Seed two bases with inventory and one movement of every kind."""
+        cache.clear()
+        self.base = Base.objects.create(name="Main Operating Base")
+        self.other_base = Base.objects.create(name="Forward Operating Base")
+        self.admin_user = User.objects.create_user(username='admin', password='password123', role=User.Role.ADMIN)
+        self.commander = User.objects.create_user(
+            username='commander', password='password123', role=User.Role.BASE_COMMANDER, base=self.base
+        )
+        self.equipment = EquipmentType.objects.create(name="M4 Rifle", category="Weapon")
+
+        AssetInventory.objects.create(base=self.base, equipment_type=self.equipment, quantity=40)
+        AssetInventory.objects.create(base=self.other_base, equipment_type=self.equipment, quantity=7)
+        PurchaseRecord.objects.create(base=self.base, equipment_type=self.equipment, quantity=50)
+        TransferRecord.objects.create(
+            equipment_type=self.equipment, quantity=8, from_base=self.base, to_base=self.other_base
+        )
+        TransferRecord.objects.create(
+            equipment_type=self.equipment, quantity=3, from_base=self.other_base, to_base=self.base
+        )
+        AssignmentRecord.objects.create(
+            equipment_type=self.equipment, quantity=2, issuing_base=self.base, assigned_to=self.commander
+        )
+        ExpenditureRecord.objects.create(base=self.base, equipment_type=self.equipment, quantity=5)
+        rebuild_rollups()
+
+        self.url = reverse('dashboard-summary')
+
+    def test_totals_for_single_base(self):
+        totals = dashboard_totals(base_id=self.base.pk)
+        self.assertEqual(totals, {
+            'closing_balance': 40,
+            'purchases': 50,
+            'transfers_in': 3,
+            'transfers_out': 8,
+            'assigned': 2,
+            'expended': 5,
+        })
+
+    def test_date_range_is_inclusive_of_end_date(self):
+        today = timezone.localdate()
+        self.assertEqual(dashboard_totals(start_date=today, end_date=today)['purchases'], 50)
+        yesterday = today - timedelta(days=1)
+        self.assertEqual(dashboard_totals(start_date=yesterday, end_date=yesterday)['purchases'], 0)
+
+    def test_summary_is_a_single_round_trip(self):
+        """Regression guard: the whole summary must stay one database query."""
+        self.client.force_authenticate(user=self.admin_user)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'base': self.base.pk, 'equipment_type': self.equipment.pk})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['closing_balance'], 40)
+        self.assertEqual(response.data['assigned'], 2)
+        self.assertEqual(response.data['net_movement']['total'], 50 + 3 - 8 - 5)
+
+    def test_write_endpoints_maintain_rollup(self):
+        """Rows written through the API match a full rebuild from the ledgers."""
+        self.client.force_authenticate(user=self.admin_user)
+        self.client.post(reverse('purchase-list'), {
+            "equipment_type_id": self.equipment.pk, "base_id": self.base.pk, "quantity": 4,
+        }, format='json')
+        self.client.post(reverse('transfer-list'), {
+            "equipment_type_id": self.equipment.pk, "from_base_id": self.base.pk,
+            "to_base_id": self.other_base.pk, "quantity": 6,
+        }, format='json')
+        self.client.post(reverse('expenditure-list'), {
+            "equipment_type_id": self.equipment.pk, "base_id": self.other_base.pk, "quantity": 1,
+        }, format='json')
+
+        columns = ('day', 'base_id', 'equipment_type_id', 'purchases', 'transfers_in',
+                   'transfers_out', 'assignments', 'expenditures')
+        incremental = list(DailyMovementRollup.objects.order_by('base_id').values_list(*columns))
+        rebuild_rollups()
+        rebuilt = list(DailyMovementRollup.objects.order_by('base_id').values_list(*columns))
+        self.assertEqual(incremental, rebuilt)
+        self.assertEqual(dashboard_totals(base_id=self.base.pk)['purchases'], 54)
+
+    def test_edits_and_deletions_maintain_rollup(self):
+        self.client.force_authenticate(user=self.admin_user)
+        self.client.get(self.url, {'base': self.base.pk})
+        purchase = PurchaseRecord.objects.get()
+        transfer = TransferRecord.objects.get(from_base=self.base)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('purchase-detail', args=[purchase.pk]), {"quantity": 3}, format='json')
+            self.client.patch(reverse('transfer-detail', args=[transfer.pk]), {"to_base_id": self.base.pk}, format='json')
+        response = self.client.get(self.url, {'base': self.base.pk})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        details = response.data['net_movement']['details']
+        self.assertEqual((details['purchases'], details['transfers_in']), (3, 11))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('purchase-detail', args=[purchase.pk]))
+        response = self.client.get(self.url, {'base': self.base.pk})
+        self.assertEqual(response.data['net_movement']['details']['purchases'], 0)
+
+        columns = ('day', 'base_id', 'equipment_type_id', 'purchases', 'transfers_in',
+                   'transfers_out', 'assignments', 'expenditures')
+        incremental = set(DailyMovementRollup.objects.values_list(*columns))
+        rebuild_rollups()
+        self.assertEqual(set(DailyMovementRollup.objects.values_list(*columns)), incremental)
+
+    def test_repeat_requests_are_served_from_cache(self):
+        self.client.force_authenticate(user=self.admin_user)
+        params = {'base': self.base.pk}
+        self.assertEqual(self.client.get(self.url, params)['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, params)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['closing_balance'], 40)
+        self.assertEqual(dashboard_cache.stats(), {'hits': 1, 'misses': 1})
+
+    def test_process_local_cache_bounds_staleness(self):
+        """Writes in other processes never bump a local cache's counters, so its entries expire quickly."""
+        with self.settings(DASHBOARD_CACHE_TIMEOUT=300, LOCAL_CACHE_MAX_TIMEOUT=5):
+            self.assertEqual(dashboard_cache._timeout(), 5)
+            with shared_cache():
+                self.assertEqual(dashboard_cache._timeout(), 300)
+
+    def test_writes_invalidate_only_touched_bases(self):
+        self.client.force_authenticate(user=self.admin_user)
+        self.client.get(self.url, {'base': self.base.pk})
+        self.client.get(self.url, {'base': self.other_base.pk})
+        self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('expenditure-list'), {
+                "equipment_type_id": self.equipment.pk, "base_id": self.other_base.pk, "quantity": 1,
+            }, format='json')
+
+        self.assertEqual(self.client.get(self.url, {'base': self.base.pk})['X-Cache'], 'HIT')
+        response = self.client.get(self.url, {'base': self.other_base.pk})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['expended'], 1)
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'MISS')
+
+    def test_impossible_dates_are_rejected(self):
+        self.client.force_authenticate(user=self.admin_user)
+        urls = (self.url, reverse('dashboard-series'), reverse('purchase-export', args=['csv']))
+        for url in urls:
+            for params in ({'start_date': '2024-13-45'}, {'end_date': 'yesterday'}):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, (url, params))
+                self.assertIn('valid date', response.data['error'])
+
+    def test_failure_is_logged_with_traceback(self):
+        self.client.force_authenticate(user=self.admin_user)
+        with mock.patch('assets.views.dashboard_totals', side_effect=RuntimeError("database went away")):
+            with self.assertLogs('assets.views', level='ERROR') as logs:
+                response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertIn('database went away', logs.output[0])
+        self.assertIsNotNone(logs.records[0].exc_info)
+
+    def test_commander_is_scoped_to_own_base(self):
+        self.client.force_authenticate(user=self.commander)
+        response = self.client.get(self.url, {'base': self.other_base.pk})
+        self.assertEqual(response.data['filters_applied']['base'], self.base.pk)
+        self.assertEqual(response.data['net_movement']['details']['transfers_in'], 3)
+
+
+class QueryPlanTests(QueryPlanAssertionsMixin, TestCase):
+    """EXPLAIN-based checks that dashboard and list queries stay on indexes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.bases = [Base.objects.create(name=f"Base {i}") for i in range(5)]
+        cls.equipment = [EquipmentType.objects.create(name=f"Item {i}", category="Weapon") for i in range(5)]
+        PurchaseRecord.objects.bulk_create(
+            PurchaseRecord(base=base, equipment_type=equipment, quantity=1)
+            for base in cls.bases for equipment in cls.equipment for _ in range(10)
+        )
+        AssetInventory.objects.bulk_create(
+            AssetInventory(base=base, equipment_type=equipment, quantity=10)
+            for base in cls.bases for equipment in cls.equipment
+        )
+        rebuild_rollups()
+
+    def test_dashboard_queries_use_indexes(self):
+        today = timezone.localdate()
+        inventory, rollups = summary_querysets(
+            base_id=self.bases[0].pk, equipment_type_id=self.equipment[0].pk,
+            start_date=today - timedelta(days=30), end_date=today,
+        )
+        self.assertUsesIndex(inventory)
+        self.assertUsesIndex(rollups, 'rollup_base_equip_day_idx')
+
+    def test_purchase_list_queries_use_indexes(self):
+        latest = PurchaseRecord.objects.order_by('-purchase_date')[:50]
+        self.assertUsesIndex(latest, 'purchase_date_idx')
+        scoped = PurchaseRecord.objects.filter(
+            base=self.bases[0], equipment_type=self.equipment[0]
+        ).order_by('-purchase_date')
+        self.assertUsesIndex(scoped, 'purchase_base_equip_date_idx')
+        own_base = PurchaseRecord.objects.for_base(self.bases[0].pk).order_by('-purchase_date', '-id')[:50]
+        self.assertUsesIndex(own_base, 'purchase_base_date_idx')
+
+
+class BulkPurchaseTests(APITestCase):
+    def setUp(self):
+        self.base = Base.objects.create(name="Main Operating Base")
+        self.admin_user = User.objects.create_user(username='admin', password='password123', role=User.Role.ADMIN)
+        self.rifle = EquipmentType.objects.create(name="M4 Rifle", category="Weapon")
+        self.rounds = EquipmentType.objects.create(name="5.56mm Rounds", category="Ammunition")
+        self.client.force_authenticate(user=self.admin_user)
+        self.url = reverse('purchase-bulk')
+
+    def row(self, equipment, quantity):
+        return {"equipment_type_id": equipment.pk, "base_id": self.base.pk, "quantity": quantity, "vendor": "Arms Corp"}
+
+    def test_json_batch_updates_inventory_and_rollup(self):
+        rows = [self.row(self.rifle, 10), self.row(self.rounds, 500), self.row(self.rifle, 5)]
+        response = self.client.post(self.url, rows, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual([result['status'] for result in response.data['results']], ['created'] * 3)
+        self.assertEqual(PurchaseRecord.objects.count(), 3)
+        self.assertEqual(AssetInventory.objects.get(base=self.base, equipment_type=self.rifle).quantity, 15)
+        self.assertEqual(AssetInventory.objects.get(base=self.base, equipment_type=self.rounds).quantity, 500)
+        self.assertEqual(dashboard_totals(base_id=self.base.pk)['purchases'], 515)
+
+    def test_ndjson_batch(self):
+        body = "\n".join(json.dumps(self.row(self.rifle, quantity)) for quantity in (1, 2, 3)) + "\n"
+        response = self.client.post(self.url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(AssetInventory.objects.get(base=self.base, equipment_type=self.rifle).quantity, 6)
+
+    def test_invalid_row_rejects_whole_batch(self):
+        rows = [self.row(self.rifle, 10), {"equipment_type_id": 9999, "base_id": self.base.pk, "quantity": 1}]
+        response = self.client.post(self.url, rows, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['results'][0]['status'], 'skipped')
+        self.assertIn('equipment_type_id', response.data['results'][1]['errors'])
+        self.assertEqual(PurchaseRecord.objects.count(), 0)
+        self.assertEqual(AssetInventory.objects.count(), 0)
+
+    def test_partial_mode_keeps_valid_rows(self):
+        rows = [self.row(self.rifle, 10), {"base_id": self.base.pk, "quantity": 1}]
+        response = self.client.post(f'{self.url}?partial=true', rows, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['created'], response.data['rejected']), (1, 1))
+        self.assertEqual(PurchaseRecord.objects.count(), 1)
+
+        # Nothing created is not a success
+        response = self.client.post(f'{self.url}?partial=true', rows[1:], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual((response.data['created'], response.data['rejected']), (0, 1))
+
+
+class ListQueryCountTests(ConstantQueryCountMixin, APITestCase):
+    """Every router-registered list endpoint must avoid N+1 queries."""
+
+    def setUp(self):
+        self.admin_user = User.objects.create_user(username='admin', password='password123', role=User.Role.ADMIN)
+        self.client.force_authenticate(user=self.admin_user)
+
+    def seed_purchases(self, count):
+        for _ in range(count):
+            n = PurchaseRecord.objects.count()
+            PurchaseRecord.objects.create(
+                base=Base.objects.create(name=f"Base {n}"),
+                equipment_type=EquipmentType.objects.create(name=f"Item {n}", category="Weapon"),
+                quantity=1,
+            )
+
+    def seed_equipment_types(self, count):
+        start = EquipmentType.objects.count()
+        EquipmentType.objects.bulk_create(
+            EquipmentType(name=f"Item {start + i}", category="Vehicle") for i in range(count)
+        )
+
+    def test_purchase_list(self):
+        self.assertConstantQueryCount(reverse('purchase-list'), self.seed_purchases)
+
+    def test_equipment_type_list(self):
+        self.assertConstantQueryCount(reverse('equipment-type-list'), self.seed_equipment_types)
+
+
+@override_settings(LEDGER_PAGE_SIZE=3, LEDGER_MAX_PAGE_SIZE=5)
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        base = Base.objects.create(name="Main Operating Base")
+        equipment = EquipmentType.objects.create(name="M4 Rifle", category="Weapon")
+        self.admin_user = User.objects.create_user(username='admin', password='password123', role=User.Role.ADMIN)
+        self.client.force_authenticate(user=self.admin_user)
+        PurchaseRecord.objects.bulk_create(
+            PurchaseRecord(base=base, equipment_type=equipment, quantity=i) for i in range(8)
+        )
+        # Give several rows the same timestamp so the id tiebreaker matters
+        PurchaseRecord.objects.filter(quantity__lt=5).update(purchase_date=timezone.now() - timedelta(days=1))
+        self.expected = list(PurchaseRecord.objects.order_by('-purchase_date', '-id').values_list('id', flat=True))
+        self.url = reverse('purchase-list')
+
+    def ids(self, response):
+        return [row['id'] for row in response.data['results']]
+
+    def test_walks_forward_and_back_without_gaps_or_duplicates(self):
+        pages, url = [], self.url
+        while url:
+            response = self.client.get(url)
+            pages.append(self.ids(response))
+            url = response.data['next']
+        self.assertEqual([len(page) for page in pages], [3, 3, 2])
+        self.assertEqual(sum(pages, []), self.expected)
+
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(self.ids(response), pages[1])
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(self.ids(response), pages[0])
+        self.assertIsNone(response.data['previous'])
+
+    def test_page_size_is_capped(self):
+        response = self.client.get(self.url, {'page_size': 100})
+        self.assertEqual(self.ids(response), self.expected[:5])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        # Well-formed cursors whose key has been tampered with
+        for key in (5, ["abc", "1"], ["2024-01-01 00:00:00+00:00", "x"], ["2024-01-01 00:00:00+00:00"]):
+            cursor = base64.urlsafe_b64encode(json.dumps({'k': key, 'r': False}).encode()).decode()
+            response = self.client.get(self.url, {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, key)
+
+
+class LedgerExportTests(APITestCase):
+    def setUp(self):
+        self.base = Base.objects.create(name="Main Operating Base")
+        self.other_base = Base.objects.create(name="Forward Operating Base")
+        self.equipment = EquipmentType.objects.create(name="M4 Rifle", category="Weapon")
+        self.admin_user = User.objects.create_user(username='admin', password='password123', role=User.Role.ADMIN)
+        self.commander = User.objects.create_user(
+            username='commander', password='password123', role=User.Role.BASE_COMMANDER, base=self.base
+        )
+        for base, quantity in ((self.base, 10), (self.other_base, 20), (self.base, 30)):
+            PurchaseRecord.objects.create(base=base, equipment_type=self.equipment, quantity=quantity, vendor="Arms, Corp")
+        PurchaseRecord.objects.filter(quantity=30).update(purchase_date=timezone.now() - timedelta(days=10))
+
+    def export(self, file_format, **params):
+        response = self.client.get(reverse('purchase-export', args=[file_format]), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export_has_flat_columns(self):
+        self.client.force_authenticate(user=self.admin_user)
+        rows = list(csv.DictReader(io.StringIO(self.export('csv', base=self.base.pk))))
+        self.assertEqual([row['quantity'] for row in rows], ['30', '10'])
+        self.assertEqual(rows[0]['base'], "Main Operating Base")
+        self.assertEqual(rows[0]['vendor'], "Arms, Corp")
+
+    def test_ndjson_export_applies_date_range(self):
+        self.client.force_authenticate(user=self.admin_user)
+        today = timezone.localdate().isoformat()
+        lines = self.export('ndjson', start_date=today, end_date=today).splitlines()
+        self.assertEqual(sorted(json.loads(line)['quantity'] for line in lines), [10, 20])
+
+    def test_commander_export_is_scoped_to_own_base(self):
+        self.client.force_authenticate(user=self.commander)
+        lines = self.export('ndjson', base=self.other_base.pk).splitlines()
+        self.assertEqual({json.loads(line)['base_id'] for line in lines}, {self.base.pk})
+
+    def test_malformed_ids_are_rejected_before_streaming(self):
+        self.client.force_authenticate(user=self.admin_user)
+        for file_format in ('csv', 'ndjson'):
+            response = self.client.get(reverse('purchase-export', args=[file_format]), {'base': 'abc'})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertFalse(response.streaming)
+
+
+class ReferenceCacheTests(APITestCase):
+    def setUp(self):
+        self.base = Base.objects.create(name="Main Operating Base")
+        self.equipment = EquipmentType.objects.create(name="M4 Rifle", category="Weapon")
+        self.admin_user = User.objects.create_user(username='admin', password='password123', role=User.Role.ADMIN)
+        self.client.force_authenticate(user=self.admin_user)
+        self.url = reverse('purchase-list')
+
+    def post_purchase(self, base):
+        return self.client.post(self.url, {
+            "equipment_type_id": self.equipment.pk, "base_id": base.pk, "quantity": 1,
+        }, format='json')
+
+    @shared_cache()
+    def test_writes_do_not_query_reference_tables(self):
+        self.post_purchase(self.base)  # warm the cache
+        hits = refcache.bases.hits
+        with CaptureQueriesContext(connection) as captured:
+            response = self.post_purchase(self.base)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['base'], {"id": self.base.pk, "name": self.base.name, "location": ""})
+        touched = [query['sql'] for query in captured if 'users_base' in query['sql'] or 'assets_equipmenttype' in query['sql']]
+        self.assertEqual(touched, [])
+        self.assertGreater(refcache.bases.hits, hits)
+
+    def test_changes_are_visible_immediately(self):
+        self.post_purchase(self.base)
+        new_base = Base.objects.create(name="Forward Operating Base")
+        self.assertEqual(self.post_purchase(new_base).status_code, status.HTTP_201_CREATED)
+
+        self.base.name = "Renamed Base"
+        self.base.save()
+        rows = self.client.get(self.url).data['results']
+        self.assertIn("Renamed Base", {row['base']['name'] for row in rows})
+
+    def test_unknown_id_is_rejected(self):
+        response = self.client.post(self.url, {
+            "equipment_type_id": self.equipment.pk, "base_id": 9999, "quantity": 1,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('base_id', response.data)
+
+    def test_process_local_cache_confirms_ids(self):
+        """A base deleted by another worker cannot be seen through a local cache's stamp."""
+        other = Base.objects.create(name="Forward Operating Base")
+        self.post_purchase(self.base)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {Base._meta.db_table} WHERE id = %s', [other.pk])
+        response = self.post_purchase(other)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('base_id', response.data)
+
+
+class AccessLogTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin_user = User.objects.create_user(username='admin', password='password123', role=User.Role.ADMIN)
+        self.client.force_authenticate(user=self.admin_user)
+        self.url = reverse('dashboard-summary')
+
+    def test_request_is_logged_with_timings(self):
+        with self.assertLogs('mams_project.access', level='INFO') as logs:
+            self.client.get(self.url)
+        entry = logs.records[0].access
+        self.assertEqual(entry['method'], 'GET')
+        self.assertEqual(entry['route'], 'dashboard-summary')
+        self.assertEqual(entry['user_id'], self.admin_user.pk)
+        self.assertEqual(entry['status'], 200)
+        self.assertGreater(entry['db_queries'], 0)
+        self.assertGreaterEqual(entry['latency_ms'], entry['db_ms'])
+
+    @override_settings(ACCESS_LOG_SAMPLE_RATES={'dashboard-summary': 0})
+    def test_route_sampling(self):
+        with self.assertNoLogs('mams_project.access', level='INFO'):
+            self.client.get(self.url)
+        with self.assertLogs('mams_project.access', level='INFO'):
+            self.client.get(reverse('purchase-list'))
+
+    def test_queue_handler_forwards_to_sink(self):
+        handler = QueueListenerHandler('mams_project.tests.access_sink', maxsize=10)
+        source = logging.getLogger('mams_project.tests.access_source')
+        source.addHandler(handler)
+        source.setLevel(logging.INFO)
+        source.propagate = False
+        try:
+            with self.assertLogs('mams_project.tests.access_sink', level='INFO') as logs:
+                source.info("GET", extra={'access': {'status': 200}})
+                handler.queue.join()
+            self.assertEqual(logs.records[0].access, {'status': 200})
+        finally:
+            source.removeHandler(handler)
+            handler.close()
+
+    def test_queue_handler_drops_when_full(self):
+        handler = QueueListenerHandler('mams_project.tests.access_sink', maxsize=1)
+        handler.close()
+        record = logging.makeLogRecord({'msg': 'GET'})
+        handler.emit(record)
+        handler.emit(record)
+        self.assertEqual(handler.dropped, 1)
+
+
+class BenchmarkCommandTests(TestCase):
+    def seed(self):
+        call_command(
+            'seed_world', bases=3, equipment_types=4, personnel=5, purchases=300, transfers=200,
+            assignments=50, expenditures=200, days=60, batch_size=100, stdout=io.StringIO(), stderr=io.StringIO(),
+        )
+
+    def test_seed_world_keeps_inventory_consistent_with_ledgers(self):
+        self.seed()
+        self.assertEqual(TransferRecord.objects.count(), 200)
+        # Dates are preserved and spread over the window, skewed towards today
+        dates = list(PurchaseRecord.objects.values_list('purchase_date', flat=True))
+        recent = sum(1 for date in dates if date > timezone.now() - timedelta(days=30))
+        self.assertGreater(recent, len(dates) / 2)
+        self.assertLess(recent, len(dates))
+
+        for row in AssetInventory.objects.all():
+            totals = dashboard_totals(base_id=row.base_id, equipment_type_id=row.equipment_type_id)
+            net = (totals['purchases'] + totals['transfers_in']
+                   - totals['transfers_out'] - totals['assigned'] - totals['expended'])
+            self.assertEqual(row.quantity, net)
+            self.assertGreaterEqual(row.quantity, 0)
+
+    def test_bench_api_reports_percentiles(self):
+        self.seed()
+        out = io.StringIO()
+        call_command('bench_api', requests=5, warmup=1, stdout=out, stderr=io.StringIO())
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['meta']['rows']['transfers'], 200)
+        for scenario, result in report['results'].items():
+            self.assertEqual(result['errors'], 0, scenario)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        # Writes made by the benchmark are rolled back
+        self.assertEqual(TransferRecord.objects.count(), 200)
+
+
+class ImportLedgerTests(TestCase):
+    def setUp(self):
+        self.alpha = Base.objects.create(name="Alpha")
+        self.bravo = Base.objects.create(name="Bravo")
+        self.rifle = EquipmentType.objects.create(name="M4 Rifle", category="Weapon")
+        self.soldier = User.objects.create_user(username='soldier', password='password123')
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as target:
+            target.write(content)
+        return path
+
+    def run_import(self, **options):
+        out = io.StringIO()
+        call_command('import_ledger', stdout=out, stderr=io.StringIO(), **options)
+        return out.getvalue()
+
+    def test_import_preserves_dates_and_rebuilds_inventory(self):
+        AssetInventory.objects.create(base=self.alpha, equipment_type=self.rifle, quantity=999)
+        purchases = self.write('purchases.csv', (
+            "id,purchase_date,base_id,base,equipment_type_id,equipment_type,category,quantity,vendor,unit_price\n"
+            "7,2021-03-01T09:30:00+00:00,1,Alpha,1,M4 Rifle,Weapon,10,Arms Corp,450.00\n"
+        ))
+        transfers = self.write('transfers.ndjson', json.dumps({
+            'transfer_date': '2021-03-05', 'from_base': 'Alpha', 'to_base': 'Bravo',
+            'equipment_type': 'M4 Rifle', 'quantity': 4, 'initiated_by': '',
+        }) + '\n')
+        assignments = self.write('assignments.csv', (
+            "assignment_date,issuing_base,equipment_type,quantity,assigned_to\n"
+            "2021-03-06 08:00,Alpha,M4 Rifle,2,soldier\n"
+        ))
+        expenditures = self.write('expenditures.csv', (
+            "expenditure_date,base,equipment_type,quantity,notes\n"
+            "2021-03-07,Bravo,M4 Rifle,1,Range day\n"
+        ))
+        self.run_import(purchases=purchases, transfers=transfers, assignments=assignments, expenditures=expenditures)
+
+        purchase = PurchaseRecord.objects.get()
+        self.assertEqual(purchase.purchase_date.isoformat(), '2021-03-01T09:30:00+00:00')
+        self.assertEqual(str(purchase.unit_price), '450.00')
+        self.assertEqual(TransferRecord.objects.get().transfer_date.date().isoformat(), '2021-03-05')
+        self.assertEqual(AssignmentRecord.objects.get().assigned_to, self.soldier)
+        self.assertEqual(
+            dict(AssetInventory.objects.values_list('base__name', 'quantity')), {"Alpha": 4, "Bravo": 3}
+        )
+        self.assertEqual(DailyMovementRollup.objects.filter(day='2021-03-05').count(), 2)
+
+    def test_bad_records_stop_the_import_and_it_resumes_from_the_checkpoint(self):
+        rows = [f"2022-01-0{day},Alpha,M4 Rifle,{day}" for day in range(1, 6)]
+        rows[3] = "2022-01-04,Nowhere,M4 Rifle,4"
+        purchases = self.write('purchases.csv', "purchase_date,base,equipment_type,quantity\n" + "\n".join(rows) + "\n")
+
+        with self.assertRaisesMessage(CommandError, "record 4: unknown base 'Nowhere'"):
+            self.run_import(purchases=purchases, chunk_size=2)
+        self.assertEqual(PurchaseRecord.objects.count(), 2)
+
+        rejects = os.path.join(self.directory.name, 'rejects.ndjson')
+        self.run_import(purchases=purchases, chunk_size=2, rejects=rejects)
+        self.assertEqual(sorted(PurchaseRecord.objects.values_list('quantity', flat=True)), [1, 2, 3, 5])
+        with open(rejects, encoding='utf-8') as source:
+            rejected = [json.loads(line) for line in source]
+        self.assertEqual([(entry['record'], entry['error']) for entry in rejected], [(4, "unknown base 'Nowhere'")])
+
+        # A finished file is not loaded twice
+        self.assertIn("already imported", self.run_import(purchases=purchases))
+        self.assertEqual(PurchaseRecord.objects.count(), 4)
+
+    def test_rejects_are_written_before_the_chunk_commits(self):
+        purchases = self.write('purchases.csv', (
+            "purchase_date,base,equipment_type,quantity\n"
+            "2022-01-01,Alpha,M4 Rifle,1\n"
+            "2022-01-02,Nowhere,M4 Rifle,2\n"
+        ))
+        rejects = os.path.join(self.directory.name, 'rejects.ndjson')
+        with mock.patch.object(LedgerImporter, 'load', side_effect=RuntimeError("crashed")):
+            with self.assertRaisesMessage(RuntimeError, "crashed"):
+                self.run_import(purchases=purchases, rejects=rejects)
+        with open(rejects, encoding='utf-8') as source:
+            self.assertEqual([json.loads(line)['record'] for line in source], [2])
+
+    def test_create_missing_reference_data(self):
+        expenditures = self.write('expenditures.csv', (
+            "expenditure_date,base,equipment_type,category,quantity\n"
+            "2022-02-01,Charlie,Flare,Ammunition,3\n"
+        ))
+        self.run_import(expenditures=expenditures, create_missing=True, no_rebuild=True)
+        record = ExpenditureRecord.objects.select_related('base', 'equipment_type').get()
+        self.assertEqual((record.base.name, record.equipment_type.category), ("Charlie", "Ammunition"))
+
+
+class ReconciliationTests(APITestCase):
+    def setUp(self):
+        self.alpha = Base.objects.create(name="Alpha")
+        self.bravo = Base.objects.create(name="Bravo")
+        self.rifle = EquipmentType.objects.create(name="M4 Rifle", category="Weapon")
+        self.admin_user = User.objects.create_user(username='admin', password='password123', role=User.Role.ADMIN)
+        self.client.force_authenticate(user=self.admin_user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.purchase_id = self.client.post(reverse('purchase-list'), {
+                "equipment_type_id": self.rifle.pk, "base_id": self.alpha.pk, "quantity": 10,
+            }, format='json').data['id']
+            self.transfer_id = self.client.post(reverse('transfer-list'), {
+                "equipment_type_id": self.rifle.pk, "from_base_id": self.alpha.pk, "to_base_id": self.bravo.pk, "quantity": 4,
+            }, format='json').data['id']
+        self.alpha_pair, self.bravo_pair = (self.alpha.pk, self.rifle.pk), (self.bravo.pk, self.rifle.pk)
+
+    def test_expected_balances_in_one_query(self):
+        with self.assertNumQueries(1):
+            balances = reconciliation.expected_balances()
+        self.assertEqual(balances, {self.alpha_pair: 6, self.bravo_pair: 4})
+        self.assertEqual(reconciliation.expected_balances([self.bravo_pair]), {self.bravo_pair: 4})
+
+    def test_update_drift_is_found_and_repaired(self):
+        self.assertEqual(reconciliation.find_drift(), (2, []))
+        self.client.patch(reverse('purchase-detail', args=[self.purchase_id]), {"quantity": 15}, format='json')
+
+        checked, drift = reconciliation.find_drift()
+        self.assertEqual(drift, [reconciliation.Drift(self.alpha.pk, self.rifle.pk, expected=11, actual=6)])
+
+        checked, drift, repaired = reconciliation.reconcile(fix=True)
+        self.assertEqual(len(repaired), 1)
+        self.assertEqual(AssetInventory.objects.get(base=self.alpha).quantity, 11)
+        self.assertEqual(reconciliation.find_drift()[1], [])
+
+    def test_repair_rebuilds_the_rollup_of_repaired_pairs(self):
+        # A write behind the API's back leaves stock and rollup both stale
+        PurchaseRecord.objects.filter(pk=self.purchase_id).update(quantity=15)
+        reconciliation.reconcile(fix=True)
+
+        rollup = DailyMovementRollup.objects.filter(base=self.alpha).values_list('purchases', 'transfers_out')
+        self.assertEqual(list(rollup), [(15, 4)])
+        yesterday = timezone.localdate() - timedelta(days=1)
+        self.assertEqual(balances_as_of(yesterday), {self.alpha_pair: 0, self.bravo_pair: 0})
+        self.assertEqual(take_snapshot(yesterday), 0)
+
+    def test_incremental_checks_only_touched_pairs(self):
+        checked, drift, repaired = reconciliation.reconcile(incremental=True)
+        self.assertEqual((checked, drift), (2, []))
+        self.assertFalse(TouchedInventoryPair.objects.exists())
+        self.assertEqual(reconciliation.reconcile(incremental=True), (0, [], []))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('transfer-detail', args=[self.transfer_id]))
+        checked, drift, repaired = reconciliation.reconcile(incremental=True)
+        self.assertEqual([(item.expected, item.actual) for item in drift], [(10, 6), (0, 4)])
+        # Unrepaired drift stays queued for the next run
+        self.assertEqual(reconciliation.reconcile(incremental=True)[0], 2)
+
+        out = io.StringIO()
+        call_command('reconcile_inventory', incremental=True, repair=True, stdout=out)
+        self.assertEqual(json.loads(out.getvalue())['repaired'], 2)
+        self.assertEqual(dict(AssetInventory.objects.values_list('base__name', 'quantity')), {"Alpha": 10, "Bravo": 0})
+        self.assertFalse(TouchedInventoryPair.objects.exists())
+        with self.assertRaises(CommandError):
+            AssetInventory.objects.filter(base=self.bravo).update(quantity=3)
+            call_command('reconcile_inventory', fail_on_drift=True, stdout=io.StringIO())
+
+    def test_touches_are_written_once_per_transaction(self):
+        reconciliation.reconcile(incremental=True)
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                for quantity in (1, 2, 3):
+                    PurchaseRecord.objects.create(base=self.alpha, equipment_type=self.rifle, quantity=quantity)
+                PurchaseRecord.objects.filter(pk=self.purchase_id).get().delete()
+            self.assertFalse(TouchedInventoryPair.objects.exists())
+        with self.assertNumQueries(1):
+            for callback in callbacks:
+                callback()
+        self.assertEqual(list(TouchedInventoryPair.objects.values_list('base_id', 'equipment_type_id')), [self.alpha_pair])
+
+        # A rolled-back write touches nothing, and the next one is still recorded
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                PurchaseRecord.objects.create(base=self.bravo, equipment_type=self.rifle, quantity=1)
+                raise RuntimeError
+            PurchaseRecord.objects.create(base=self.alpha, equipment_type=self.rifle, quantity=1)
+        self.assertEqual(TouchedInventoryPair.objects.filter(base=self.bravo).count(), 0)
+        self.assertEqual(TouchedInventoryPair.objects.filter(base=self.alpha).count(), 2)
+
+
+class SnapshotTests(APITestCase):
+    def setUp(self):
+        """Ten days of history for one pair, ending in today's inventory of 30."""
+        cache.clear()
+        self.alpha = Base.objects.create(name="Alpha")
+        self.bravo = Base.objects.create(name="Bravo")
+        self.rifle = EquipmentType.objects.create(name="M4 Rifle", category="Weapon")
+        self.admin_user = User.objects.create_user(username='admin', password='password123', role=User.Role.ADMIN)
+        self.commander = User.objects.create_user(
+            username='commander', password='password123', role=User.Role.BASE_COMMANDER, base=self.bravo
+        )
+        self.today = timezone.localdate()
+        history = {
+            -10: {'purchases': 20},
+            -6: {'purchases': 15, 'transfers_out': 3},
+            -3: {'assignments': 2, 'expenditures': 1},
+            -1: {'transfers_in': 1},
+        }
+        for offset, movements in history.items():
+            DailyMovementRollup.objects.create(
+                day=self.today + timedelta(days=offset), base=self.alpha, equipment_type=self.rifle, **movements
+            )
+        DailyMovementRollup.objects.create(
+            day=self.today - timedelta(days=6), base=self.bravo, equipment_type=self.rifle, transfers_in=3
+        )
+        AssetInventory.objects.create(base=self.alpha, equipment_type=self.rifle, quantity=30)
+        AssetInventory.objects.create(base=self.bravo, equipment_type=self.rifle, quantity=3)
+        self.url = reverse('inventory-as-of')
+
+    def brute_force(self, day):
+        balances = dict(
+            ((base_id, equipment_type_id), quantity)
+            for base_id, equipment_type_id, quantity in AssetInventory.objects.values_list(
+                'base_id', 'equipment_type_id', 'quantity'
+            )
+        )
+        for row in DailyMovementRollup.objects.filter(day__gt=day):
+            pair = (row.base_id, row.equipment_type_id)
+            balances[pair] -= (row.purchases + row.transfers_in - row.transfers_out
+                               - row.assignments - row.expenditures)
+        return balances
+
+    def test_as_of_matches_history_from_any_anchor(self):
+        days = [self.today - timedelta(days=offset) for offset in range(12, 0, -1)]
+        expected = {day: self.brute_force(day) for day in days}
+        self.assertEqual(expected[self.today - timedelta(days=11)][(self.alpha.pk, self.rifle.pk)], 0)
+
+        # No snapshots: walk back from the live inventory
+        for day in days:
+            self.assertEqual(balances_as_of(day), expected[day], day)
+        self.assertEqual(take_snapshot(self.today - timedelta(days=8)), 1)
+        self.assertEqual(take_snapshot(self.today - timedelta(days=4)), 2)
+        # Snapshots before and after every day: roll forwards and backwards
+        for day in days:
+            with self.assertNumQueries(2):
+                balances = balances_as_of(day)
+            self.assertEqual({pair: qty for pair, qty in balances.items() if qty},
+                             {pair: qty for pair, qty in expected[day].items() if qty}, day)
+        self.assertEqual(total_as_of(self.today - timedelta(days=5), base_id=self.alpha.pk), 32)
+
+    def test_dashboard_opening_balance_counts_assignments(self):
+        self.client.force_authenticate(user=self.admin_user)
+        call_command('snapshot_inventory', backfill=10, every=3, stdout=io.StringIO())
+        start, end = self.today - timedelta(days=6), self.today - timedelta(days=3)
+        response = self.client.get(reverse('dashboard-summary'), {
+            'base': self.alpha.pk, 'start_date': start.isoformat(), 'end_date': end.isoformat(),
+        })
+        self.assertEqual(response.data['opening_balance'], 20)
+        self.assertEqual(response.data['closing_balance'], 29)
+        self.assertEqual(response.data['net_movement']['total'], 15 - 3 - 1)
+
+        response = self.client.get(reverse('dashboard-summary'), {'start_date': start.isoformat()})
+        self.assertEqual(response.data['opening_balance'], sum(self.brute_force(start - timedelta(days=1)).values()))
+
+    def test_as_of_endpoint_scopes_commanders(self):
+        self.client.force_authenticate(user=self.commander)
+        response = self.client.get(self.url, {'date': (self.today - timedelta(days=7)).isoformat(),
+                                              'base': self.alpha.pk})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['filters_applied']['base'], self.bravo.pk)
+        self.assertEqual(response.data['total'], 0)
+
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.get(self.url, {'date': (self.today - timedelta(days=5)).isoformat()})
+        self.assertEqual(response.data['balances'], [
+            {'base_id': self.alpha.pk, 'equipment_type_id': self.rifle.pk, 'quantity': 32},
+            {'base_id': self.bravo.pk, 'equipment_type_id': self.rifle.pk, 'quantity': 3},
+        ])
+        self.assertEqual(self.client.get(self.url, {'date': 'yesterday'}).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'date': '2024-01-01', 'base': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class DashboardSeriesTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.alpha = Base.objects.create(name="Alpha")
+        self.bravo = Base.objects.create(name="Bravo")
+        self.rifle = EquipmentType.objects.create(name="M4 Rifle", category="Weapon")
+        self.admin_user = User.objects.create_user(username='admin', password='password123', role=User.Role.ADMIN)
+        self.commander = User.objects.create_user(
+            username='commander', password='password123', role=User.Role.BASE_COMMANDER, base=self.bravo
+        )
+        for day, base, movements in (
+            ('2024-01-03', self.alpha, {'purchases': 5}),
+            ('2024-01-04', self.alpha, {'purchases': 2, 'assignments': 1}),
+            ('2024-01-04', self.bravo, {'transfers_in': 3}),
+            ('2024-03-18', self.alpha, {'expenditures': 4, 'transfers_out': 3}),
+        ):
+            DailyMovementRollup.objects.create(
+                day=parse_date(day), base=base, equipment_type=self.rifle, **movements
+            )
+        self.url = reverse('dashboard-series')
+        self.client.force_authenticate(user=self.admin_user)
+
+    def test_month_series_is_one_query_with_gaps_filled(self):
+        params = {'interval': 'month', 'start_date': '2023-12-15', 'end_date': '2024-04-30'}
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.data['buckets'], ['2023-12-01', '2024-01-01', '2024-02-01', '2024-03-01', '2024-04-01'])
+        self.assertEqual(response.data['series']['purchases'], [0, 7, 0, 0, 0])
+        self.assertEqual(response.data['series']['transfers_in'], [0, 3, 0, 0, 0])
+        self.assertEqual(response.data['series']['expenditures'], [0, 0, 0, 4, 0])
+        self.assertEqual(self.client.get(self.url, params)['X-Cache'], 'HIT')
+
+    def test_week_and_day_buckets_align_with_the_database(self):
+        response = self.client.get(self.url, {'interval': 'week', 'end_date': '2024-03-20', 'base': self.alpha.pk})
+        self.assertEqual(response.data['buckets'][0], '2024-01-01')
+        self.assertEqual(response.data['buckets'][-1], '2024-03-18')
+        self.assertEqual(response.data['series']['purchases'][0], 7)
+        self.assertEqual(response.data['series']['transfers_out'][-1], 3)
+        self.assertEqual(sum(response.data['series']['assignments']), 1)
+
+        response = self.client.get(self.url, {'start_date': '2024-01-02', 'end_date': '2024-01-05'})
+        self.assertEqual(response.data['series']['purchases'], [0, 5, 2, 0])
+
+    def test_commander_scoping_and_validation(self):
+        self.client.force_authenticate(user=self.commander)
+        response = self.client.get(self.url, {'interval': 'month', 'base': self.alpha.pk, 'end_date': '2024-01-31'})
+        self.assertEqual(response.data['filters_applied']['base'], self.bravo.pk)
+        self.assertEqual(response.data['series'], {
+            'purchases': [0], 'transfers_in': [3], 'transfers_out': [0], 'assignments': [0], 'expenditures': [0],
+        })
+        self.assertEqual(self.client.get(self.url, {'interval': 'hour'}).status_code, status.HTTP_400_BAD_REQUEST)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {'start_date': '1900-01-01', 'end_date': '2024-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_non_numeric_ids_are_rejected(self):
+        for params in ({'base': 'abc'}, {'equipment_type': 'x'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+            self.assertIn('whole number', response.data['error'])
+
+
+class AsyncViewTests(TransactionTestCase):
+    """The ASGI views, run outside a test transaction so the database pool is used."""
+
+    def setUp(self):
+        cache.clear()
+        self.base = Base.objects.create(name="Alpha")
+        self.rifle = EquipmentType.objects.create(name="M4 Rifle", category="Weapon")
+        self.admin_user = User.objects.create_user(username='admin', password='password123', role=User.Role.ADMIN)
+        today = timezone.localdate()
+        DailyMovementRollup.objects.create(
+            day=today - timedelta(days=5), base=self.base, equipment_type=self.rifle, purchases=12, assignments=2,
+        )
+        DailyMovementRollup.objects.create(day=today, base=self.base, equipment_type=self.rifle, purchases=3)
+        AssetInventory.objects.create(base=self.base, equipment_type=self.rifle, quantity=13)
+        PurchaseRecord.objects.create(base=self.base, equipment_type=self.rifle, quantity=3)
+        self.factory = APIRequestFactory()
+
+    def call(self, view, path, params):
+        request = self.factory.get(path, params)
+        force_authenticate(request, user=self.admin_user)
+        response = async_to_sync(view)(request)
+        response.render()
+        return response
+
+    def test_async_summary_matches_sync_view(self):
+        params = {'start_date': (timezone.localdate() - timedelta(days=6)).isoformat(),
+                  'end_date': (timezone.localdate() - timedelta(days=1)).isoformat()}
+        response = self.call(AsyncDashboardSummaryView.as_view(), '/api/assets/dashboard/summary/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['closing_balance'], 10)
+        self.assertEqual(response.data['opening_balance'], 0)
+        cache.clear()
+        request = self.factory.get('/api/assets/dashboard/summary/', params)
+        force_authenticate(request, user=self.admin_user)
+        self.assertEqual(DashboardSummaryView.as_view()(request).data, response.data)
+
+    def test_async_list_routes_serve_reads_from_the_pool(self):
+        router = DefaultRouter()
+        router.register(r'purchases', PurchaseRecordViewSet, basename='purchase')
+        self.assertEqual(async_list_routes(router), [])
+        with override_settings(ASYNC_VIEWS=True):
+            [route] = async_list_routes(router)
+        self.assertEqual(route.name, 'purchase-list')
+        response = self.call(route.callback, '/api/assets/purchases/', {'page_size': 10})
+        self.assertEqual([row['quantity'] for row in response.data['results']], [3])
+
+    def test_middleware_runs_natively_under_asgi(self):
+        token = MyTokenObtainPairSerializer.get_token(self.admin_user).access_token
+        response = async_to_sync(AsyncClient().get)(
+            reverse('dashboard-summary'), headers={'Authorization': f'Bearer {token}'},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+
+class ShardedInventoryTests(APITestCase):
+    def setUp(self):
+        """Alpha holds 100 rifles, bought through the API; Bravo holds none."""
+        cache.clear()
+        sharding.sharded_pairs.invalidate()
+        self.alpha = Base.objects.create(name="Alpha")
+        self.bravo = Base.objects.create(name="Bravo")
+        self.rifle = EquipmentType.objects.create(name="M4 Rifle", category="Weapon")
+        self.admin_user = User.objects.create_user(username='admin', password='password123', role=User.Role.ADMIN)
+        self.client.force_authenticate(user=self.admin_user)
+        self.client.post(reverse('purchase-list'), {
+            "equipment_type_id": self.rifle.pk, "base_id": self.alpha.pk, "quantity": 100,
+        }, format='json')
+        self.pair = (self.alpha.pk, self.rifle.pk)
+
+    def promote(self, count=4):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(sharding.promote(*self.pair, count=count))
+
+    def stock(self):
+        return AssetInventory.objects.with_stock().get(base=self.alpha, equipment_type=self.rifle).stock
+
+    def test_promotion_keeps_reads_the_same(self):
+        self.promote()
+        row = AssetInventory.objects.get(base=self.alpha, equipment_type=self.rifle)
+        self.assertEqual((row.quantity, row.shards), (0, 4))
+        self.assertEqual(list(InventoryShard.objects.order_by('shard').values_list('quantity', flat=True)), [25] * 4)
+        self.assertEqual(self.stock(), 100)
+        self.assertEqual(dashboard_totals(base_id=self.alpha.pk)['closing_balance'], 100)
+        self.assertEqual(balances_as_of(timezone.localdate()), {self.pair: 100})
+        self.assertEqual(reconciliation.find_drift()[1], [])
+
+    def test_withdrawals_and_deposits_use_the_shards(self):
+        self.promote()
+        inventory.withdraw(*self.pair, 20)
+        inventory.deposit(*self.pair, 5)
+        self.assertEqual(self.stock(), 85)
+        self.assertEqual(AssetInventory.objects.get(base=self.alpha).quantity, 0)
+
+        # No single shard holds 60: they are drained together and evened out
+        inventory.withdraw(*self.pair, 60)
+        self.assertEqual(sorted(InventoryShard.objects.values_list('quantity', flat=True)), [6, 6, 6, 7])
+        with self.assertRaises(inventory.InsufficientStock):
+            inventory.withdraw(*self.pair, 26)
+        self.assertEqual(self.stock(), 25)
+
+    def test_ledger_endpoints_on_a_sharded_pair(self):
+        self.promote()
+        for quantity in (10, 15):
+            response = self.client.post(reverse('expenditure-list'), {
+                "equipment_type_id": self.rifle.pk, "base_id": self.alpha.pk, "quantity": quantity,
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(reverse('transfer-list'), {
+            "equipment_type_id": self.rifle.pk, "from_base_id": self.alpha.pk, "to_base_id": self.bravo.pk,
+            "quantity": 80,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(reverse('dashboard-summary'), {'base': self.alpha.pk})
+        self.assertEqual((response.data['closing_balance'], response.data['expended']), (75, 25))
+        self.assertEqual(reconciliation.find_drift()[1], [])
+
+    def test_bulk_writes_spread_the_stock_over_the_shards(self):
+        self.promote()
+        with transaction.atomic():
+            stock = inventory.lock([self.pair])
+            self.assertEqual(stock[self.pair].quantity, 100)
+            stock[self.pair].quantity = 42
+            inventory.save_quantities(stock.values())
+        self.assertEqual(sorted(InventoryShard.objects.values_list('quantity', flat=True)), [10, 10, 11, 11])
+        self.assertEqual(self.stock(), 42)
+
+    @override_settings(INVENTORY_SHARDS=4, INVENTORY_CONTENTION_WAIT=0, INVENTORY_PROMOTE_AFTER=3)
+    def test_contended_pairs_are_promoted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(2):
+                inventory.withdraw(*self.pair, 1)
+        self.assertEqual(AssetInventory.objects.get(base=self.alpha).shards, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.withdraw(*self.pair, 1)
+        self.assertEqual(AssetInventory.objects.get(base=self.alpha).shards, 4)
+        self.assertEqual(self.stock(), 97)
+
+    def test_idle_pairs_are_demoted(self):
+        self.promote()
+        inventory.withdraw(*self.pair, 10)
+        out = io.StringIO()
+        call_command('rebalance_inventory_shards', stdout=out)
+        # Freshly sharded pairs are kept for two windows
+        self.assertEqual(json.loads(out.getvalue())['demoted'], [])
+
+        InventoryShard.objects.update(created_at=timezone.now() - timedelta(hours=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebalance_inventory_shards', stdout=out)
+        row = AssetInventory.objects.get(base=self.alpha)
+        self.assertEqual((row.quantity, row.shards), (90, 0))
+        self.assertFalse(InventoryShard.objects.exists())
+        inventory.withdraw(*self.pair, 10)
+        self.assertEqual(self.stock(), 80)
+
+    def test_withdrawal_racing_a_demotion(self):
+        """The pair is demoted between the withdrawal's row UPDATE and its look at the shards."""
+        self.promote()
+        sharding.sharded_pairs.invalidate()
+        original = inventory._withdraw_from_shards
+
+        def demoted_first(*args):
+            sharding.demote(*self.pair)
+            return original(*args)
+
+        with mock.patch.object(sharding.sharded_pairs, 'get', return_value=0), \
+                mock.patch.object(inventory, '_withdraw_from_shards', side_effect=demoted_first):
+            inventory.withdraw(*self.pair, 30)
+        self.assertEqual(self.stock(), 70)
+
+
+class ListFilterTests(APITestCase):
+    def setUp(self):
+        search.reset()
+        self.alpha = Base.objects.create(name="Alpha")
+        self.bravo = Base.objects.create(name="Bravo")
+        self.rifle = EquipmentType.objects.create(name="M4 Carbine Rifle", category="Weapon")
+        self.rounds = EquipmentType.objects.create(name="5.56mm Rounds", category="Ammunition")
+        self.admin_user = User.objects.create_user(username='admin', password='password123', role=User.Role.ADMIN)
+        self.client.force_authenticate(user=self.admin_user)
+        for base, equipment, quantity, vendor in (
+            (self.alpha, self.rifle, 5, "Colt Defense"),
+            (self.alpha, self.rounds, 500, "Lake City Ammunition"),
+            (self.bravo, self.rifle, 10, "Colt Defense"),
+            (self.bravo, self.rounds, 900, "Olin Winchester"),
+        ):
+            PurchaseRecord.objects.create(base=base, equipment_type=equipment, quantity=quantity, vendor=vendor)
+        PurchaseRecord.objects.filter(quantity=900).update(purchase_date=timezone.now() - timedelta(days=10))
+
+    def quantities(self, name='purchase', **params):
+        response = self.client.get(reverse(f'{name}-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        results = response.json()
+        return sorted(row['quantity'] for row in results.get('results', results))
+
+    def test_exact_and_range_filters(self):
+        self.assertEqual(self.quantities(base=self.alpha.pk), [5, 500])
+        self.assertEqual(self.quantities(equipment_type=self.rifle.pk), [5, 10])
+        self.assertEqual(self.quantities(category='ammunition'), [500, 900])
+        self.assertEqual(self.quantities(vendor="Colt Defense", base=self.bravo.pk), [10])
+        self.assertEqual(self.quantities(min_quantity=10, max_quantity=500), [10, 500])
+        today = timezone.localdate().isoformat()
+        self.assertEqual(self.quantities(start_date=today, end_date=today), [5, 10, 500])
+
+    def test_prefix_and_fuzzy_search(self):
+        self.assertEqual(self.quantities(search='col'), [5, 10])
+        self.assertEqual(self.quantities(search='city amm'), [500])
+        self.assertEqual(self.quantities(search='defence'), [])
+        self.assertEqual(self.quantities(fuzzy='winchestr'), [900])
+        # Records added after the index was built are found too
+        PurchaseRecord.objects.create(base=self.alpha, equipment_type=self.rifle, quantity=1, vendor="Winchester Arms")
+        self.assertEqual(self.quantities(search='winch'), [1, 900])
+
+    def test_equipment_type_search(self):
+        response = self.client.get(reverse('equipment-type-list'), {'search': 'rifle'})
+        self.assertEqual([row['name'] for row in response.json()], ["M4 Carbine Rifle"])
+        response = self.client.get(reverse('equipment-type-list'), {'fuzzy': 'amunition'})
+        self.assertEqual([row['name'] for row in response.json()], ["5.56mm Rounds"])
+
+    def test_invalid_filters_are_rejected(self):
+        for params in ({'base': 'alpha'}, {'start_date': '2024-13-01'}, {'min_quantity': 'many'}):
+            response = self.client.get(reverse('purchase-list'), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@shared_cache()
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.base = Base.objects.create(name="Alpha")
+        self.equipment = EquipmentType.objects.create(name="M4 Rifle", category="Weapon")
+        self.admin_user = User.objects.create_user(username='admin', password='password123', role=User.Role.ADMIN)
+        self.client.force_authenticate(user=self.admin_user)
+
+    def revalidate(self, url, etag, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+
+    def test_reference_data_revalidates_until_changed(self):
+        for url in (reverse('base-list'), reverse('equipment-type-list')):
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, status.HTTP_200_OK)
+            self.assertIn('no-cache', first['Cache-Control'])
+            with self.assertNumQueries(0):
+                again = self.revalidate(url, first['ETag'])
+            self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(again['ETag'], first['ETag'])
+
+        url = reverse('equipment-type-list')
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            EquipmentType.objects.create(name="M9 Pistol", category="Weapon")
+        changed = self.revalidate(url, etag)
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(changed.json()), 2)
+        self.assertIn('Last-Modified', changed)
+
+    def test_dashboard_summary_answers_304_without_aggregating(self):
+        url = reverse('dashboard-summary')
+        first = self.client.get(url, {'base': self.base.pk})
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            again = self.revalidate(url, first['ETag'], base=self.base.pk)
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+        # Other filters are other representations
+        self.assertEqual(self.revalidate(url, first['ETag']).status_code, status.HTTP_200_OK)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('purchase-list'), {
+                'base_id': self.base.pk, 'equipment_type_id': self.equipment.pk, 'quantity': 5,
+            }, format='json')
+        changed = self.revalidate(url, first['ETag'], base=self.base.pk)
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertEqual(changed.json()['closing_balance'], 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                reverse('purchase-detail', args=[PurchaseRecord.objects.get().pk]), {'quantity': 3}, format='json'
+            )
+        self.assertEqual(self.revalidate(url, changed['ETag'], base=self.base.pk).status_code, status.HTTP_200_OK)
+
+    def test_no_validators_over_a_process_local_cache(self):
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            for url in (reverse('base-list'), reverse('dashboard-summary')):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertNotIn('ETag', response)
+                self.assertEqual(self.revalidate(url, 'W/"x"').status_code, status.HTTP_200_OK)
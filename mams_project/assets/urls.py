@@ -1,13 +1,21 @@
 # assets/urls.py
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PurchaseRecordViewSet, DashboardSummaryView, EquipmentTypeViewSet
+from mams_project.async_views import async_list_routes
+from .views import PurchaseRecordViewSet, DashboardSummaryView, AsyncDashboardSummaryView, DashboardCacheStatsView, EquipmentTypeViewSet, InventoryAsOfView, DashboardSeriesView
 
 router = DefaultRouter()
 router.register(r'purchases', PurchaseRecordViewSet, basename='purchase')
 router.register(r'equipment-types', EquipmentTypeViewSet, basename='equipment-type')
 
+summary_view = AsyncDashboardSummaryView if settings.ASYNC_VIEWS else DashboardSummaryView
+
 urlpatterns = [
+    *async_list_routes(router),
     path('', include(router.urls)),
-    path('dashboard/summary/', DashboardSummaryView.as_view(), name='dashboard-summary'),
+    path('dashboard/summary/', summary_view.as_view(), name='dashboard-summary'),
+    path('dashboard/series/', DashboardSeriesView.as_view(), name='dashboard-series'),
+    path('inventory/as-of/', InventoryAsOfView.as_view(), name='inventory-as-of'),
+    path('dashboard/cache-stats/', DashboardCacheStatsView.as_view(), name='dashboard-cache-stats'),
 ]
\ No newline at end of file
@@ -1,20 +1,59 @@
+import logging
+
+from asgiref.sync import sync_to_async
 from rest_framework import viewsets, status
 from rest_framework.response import Response
-from .models import AssetInventory, PurchaseRecord, EquipmentType
+from .models import PurchaseRecord, EquipmentType
 from .serializers import PurchaseRecordSerializer, EquipmentTypeSerializer
-from logistics.models import TransferRecord, ExpenditureRecord
+from .aggregation import SERIES_INTERVALS, TooManyBuckets, dashboard_totals, movement_series
+from .bulk import BulkCreateMixin
+from .exports import LedgerExportMixin
+from .filtering import ListFilterBackend
+from .rollups import RollupCorrectionMixin, record_movement
+from .scoping import BaseScopedMixin, resolve_filters, FilterError
+from .snapshots import balances_as_of, total_as_of
+from . import dashboard_cache, inventory, refcache
+from mams_project import conditional
+from mams_project.async_views import AsyncAPIView, gather
+from mams_project.db_router import ReplicaReadsMixin, reading_from_replica, replica_reads
+from mams_project.pagination import KeysetPagination
+from mams_project.permissions import IsAdminUser
 from rest_framework.permissions import IsAuthenticated
-from django.utils.dateparse import parse_date
 from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework.views import APIView
-from django.db.models import Sum, Q
 
+logger = logging.getLogger(__name__)
 
-class PurchaseRecordViewSet(viewsets.ModelViewSet):
-    queryset = PurchaseRecord.objects.all().order_by('-purchase_date')
+
+class PurchaseRecordViewSet(ReplicaReadsMixin, BaseScopedMixin, RollupCorrectionMixin, BulkCreateMixin, LedgerExportMixin, viewsets.ModelViewSet):
+    # Bases and equipment types are rendered from the reference-data cache
+    queryset = PurchaseRecord.objects.order_by('-purchase_date', '-id')
     serializer_class = PurchaseRecordSerializer
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-purchase_date', '-id')
+    filter_backends = [ListFilterBackend]
+    filter_fields = {'vendor': 'vendor'}
+    search_fields = ('vendor',)
+    export_date_field = 'purchase_date'
+    export_columns = (
+        ('id', 'id'),
+        ('purchase_date', 'purchase_date'),
+        ('base_id', 'base_id'),
+        ('base', 'base__name'),
+        ('equipment_type_id', 'equipment_type_id'),
+        ('equipment_type', 'equipment_type__name'),
+        ('category', 'equipment_type__category'),
+        ('quantity', 'quantity'),
+        ('vendor', 'vendor'),
+        ('unit_price', 'unit_price'),
+    )
     # permission_classes = [IsAuthenticated, IsAdminOrLogisticsOfficer] # We'll add permissions later
 
+    def bulk_movements(self, purchase):
+        return [(purchase.base_id, purchase.equipment_type_id, purchase.quantity)]
+
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -24,149 +63,292 @@ class PurchaseRecordViewSet(viewsets.ModelViewSet):
             # Save the purchase record
             purchase = serializer.save()
             
-            # Update the AssetInventory
-            inventory, created = AssetInventory.objects.get_or_create(
-                base=purchase.base,
-                equipment_type=purchase.equipment_type
-            )
-            inventory.quantity += purchase.quantity
-            inventory.save()
+            # Update the AssetInventory in a single upsert
+            inventory.deposit(purchase.base_id, purchase.equipment_type_id, purchase.quantity)
+
+            # Fold the purchase into the daily dashboard rollup
+            record_movement(purchase)
 
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
-class EquipmentTypeViewSet(viewsets.ModelViewSet):
+class EquipmentTypeViewSet(ReplicaReadsMixin, conditional.ConditionalGetMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows Equipment Types to be viewed or edited.
     """
     queryset = EquipmentType.objects.all().order_by('name')
     serializer_class = EquipmentTypeSerializer
+    filter_backends = [ListFilterBackend]
+    filter_fields = {'category': 'category__iexact'}
+    search_fields = ('name', 'category')
+    search_cache = refcache.equipment_types
+    conditional_cache = refcache.equipment_types
     # permission_classes = [IsAuthenticated] # Add permissions later if needed
 
-class DashboardSummaryView(APIView):
+def ended_before_today(end_date):
+    # The live inventory is today's balance; a period that ended earlier
+    # closes on the balance held at the end of end_date
+    return bool(end_date) and end_date < timezone.localdate()
+
+
+def summary_data(filters, totals, closing_balance):
+    """Assemble the dashboard summary from dashboard_totals() and the closing balance."""
+    base_id = filters['base_id']
+    equipment_type_id = filters['equipment_type_id']
+    start_date = filters['start_date']
+    end_date = filters['end_date']
+    purchases = totals['purchases']
+    transfers_in = totals['transfers_in']
+    transfers_out = totals['transfers_out']
+    expended = totals['expended']
+
+    # --- 3. Calculate Net Movement and Opening Balance ---
+    # Net Movement = All inflows minus all outflows within the period
+    net_movement = (purchases + transfers_in) - (transfers_out + expended)
+
+    # Opening Balance = Closing Balance - every movement in the period,
+    # assignments included, i.e. the balance at the end of the day
+    # before start_date
+    opening_balance = closing_balance - net_movement + totals['assigned']
+
+    # --- 4. Assemble the Response ---
+    filters_applied = {
+        "base": int(base_id) if base_id else 'all',
+        "equipment_type": int(equipment_type_id) if equipment_type_id else 'all',
+        "start_date": start_date.isoformat() if start_date else None,
+        "end_date": end_date.isoformat() if end_date else None,
+    }
+
+    return {
+        "filters_applied": filters_applied,
+        "opening_balance": opening_balance,
+        "closing_balance": closing_balance,
+        "assigned": totals['assigned'],
+        "expended": expended,
+        "net_movement": {
+            "total": net_movement,
+            "details": {
+                "purchases": purchases,
+                "transfers_in": transfers_in,
+                "transfers_out": transfers_out,
+            }
+        }
+    }
+
+
+def summary_etag(cache_key):
+    # The cache key carries the version counters of the base (or all-bases)
+    # scope and the effective filters; the day is added because a period
+    # ending today is closed from the snapshots once today is over. Without
+    # a shared cache the counters miss other workers' writes: no ETag then.
+    if not dashboard_cache.shared():
+        return None
+    return conditional.etag(cache_key, timezone.localdate())
+
+
+def replica_may_lag(base_id, from_replica):
+    # A replica may not have applied the write behind a recent bump yet:
+    # what it returned must not be cached, nor tagged, under the new version
+    return from_replica and dashboard_cache.recently_bumped(base_id)
+
+
+def summary_failed(exc):
+    # Called from the view's except block, so the traceback is still at hand
+    logger.exception("Dashboard summary failed: %s", exc)
+    return Response(
+        {"error": "An error occurred while calculating the dashboard summary."},
+        status=500
+    )
+
+
+class DashboardSummaryView(ReplicaReadsMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         try:
-            # --- 1. Get and Parse Filters ---
-            base_id = request.query_params.get('base')
-            equipment_type_id = request.query_params.get('equipment_type')
-            start_date_str = request.query_params.get('start_date', '')
-            end_date_str = request.query_params.get('end_date', '')
-            
-            # Parse dates safely
-            start_date = parse_date(start_date_str) if start_date_str else None
-            end_date = parse_date(end_date_str) if end_date_str else None
+            # --- 1. Get and Parse Filters, applying Role-Based Access Control ---
+            try:
+                filters = resolve_filters(request)
+            except FilterError as exc:
+                return Response({"error": str(exc)}, status=400)
+            base_id = filters['base_id']
+            equipment_type_id = filters['equipment_type_id']
+            start_date = filters['start_date']
+            end_date = filters['end_date']
 
-            # --- 2. Apply Role-Based Access Control (RBAC) Filters ---
-            user = request.user
-            base_filter = Q()
-            
-            if user.role == 'BASE_COMMANDER':
-                if not hasattr(user, 'base') or not user.base:
-                    return Response({"error": "User is not assigned to a base."}, status=400)
-                # Force filter to the commander's base
-                base_filter = Q(base_id=user.base.id)
-            elif base_id:
-                # Admin can filter by any base
-                base_filter = Q(base_id=base_id)
-
-            equipment_filter = Q()
-            if equipment_type_id:
-                equipment_filter = Q(equipment_type_id=equipment_type_id)
-
-            # --- 3. Calculate Closing Balance (Current State) ---
-            closing_balance = AssetInventory.objects.filter(
-                base_filter & equipment_filter
-            ).aggregate(total=Sum('quantity'))['total'] or 0
-
-            # --- 4. Calculate Movements within the Date Range ---
-            # Purchases
-            purchases_query = PurchaseRecord.objects.filter(base_filter & equipment_filter)
-            if start_date:
-                purchases_query = purchases_query.filter(purchase_date__gte=start_date)
-            if end_date:
-                purchases_query = purchases_query.filter(purchase_date__lte=end_date)
-            purchases = purchases_query.aggregate(total=Sum('quantity'))['total'] or 0
-            
-            # Transfers In
-            transfers_in_query = TransferRecord.objects.filter(equipment_filter)
-            if base_id:
-                transfers_in_query = transfers_in_query.filter(to_base_id=base_id)
-            elif user.role == 'BASE_COMMANDER' and hasattr(user, 'base') and user.base:
-                transfers_in_query = transfers_in_query.filter(to_base_id=user.base.id)
-            else:
-                # For admin with no base filter, get all transfers in
-                transfers_in_query = transfers_in_query.all()
-                
-            if start_date:
-                transfers_in_query = transfers_in_query.filter(transfer_date__gte=start_date)
-            if end_date:
-                transfers_in_query = transfers_in_query.filter(transfer_date__lte=end_date)
-            transfers_in = transfers_in_query.aggregate(total=Sum('quantity'))['total'] or 0
-            
-            # Transfers Out
-            transfers_out_query = TransferRecord.objects.filter(equipment_filter)
-            if base_id:
-                transfers_out_query = transfers_out_query.filter(from_base_id=base_id)
-            elif user.role == 'BASE_COMMANDER' and hasattr(user, 'base') and user.base:
-                transfers_out_query = transfers_out_query.filter(from_base_id=user.base.id)
-            else:
-                # For admin with no base filter, get all transfers out
-                transfers_out_query = transfers_out_query.all()
-                
-            if start_date:
-                transfers_out_query = transfers_out_query.filter(transfer_date__gte=start_date)
-            if end_date:
-                transfers_out_query = transfers_out_query.filter(transfer_date__lte=end_date)
-            transfers_out = transfers_out_query.aggregate(total=Sum('quantity'))['total'] or 0
-            
-            # Expenditures
-            expenditures_query = ExpenditureRecord.objects.filter(base_filter & equipment_filter)
-            if start_date:
-                expenditures_query = expenditures_query.filter(expenditure_date__gte=start_date)
-            if end_date:
-                expenditures_query = expenditures_query.filter(expenditure_date__lte=end_date)
-            expended = expenditures_query.aggregate(total=Sum('quantity'))['total'] or 0
-
-            # --- 5. Calculate Net Movement and Opening Balance ---
-            # Net Movement = All inflows minus all outflows within the period
-            net_movement = (purchases + transfers_in) - (transfers_out + expended)
+            # Serve repeat requests for the same effective filters from cache;
+            # the key's version counters double as the response's ETag
+            cache_key = dashboard_cache.summary_key(base_id, equipment_type_id, start_date, end_date)
+            etag = summary_etag(cache_key)
+            not_modified = conditional.not_modified(request, etag)
+            if not_modified is not None:
+                return not_modified
+            cached = dashboard_cache.get_summary(cache_key)
+            if cached is not None:
+                return conditional.add_validators(Response(cached, headers={'X-Cache': 'HIT'}), etag)
+
+            # --- 2. Calculate Balances and Movements in one round trip ---
+            totals = dashboard_totals(
+                base_id=base_id,
+                equipment_type_id=equipment_type_id,
+                start_date=start_date,
+                end_date=end_date,
+            )
+            closing_balance = totals['closing_balance']
+            if ended_before_today(end_date):
+                closing_balance = total_as_of(end_date, base_id, equipment_type_id)
+
+            data = summary_data(filters, totals, closing_balance)
+            if replica_may_lag(base_id, reading_from_replica()):
+                return Response(data, headers={'X-Cache': 'MISS'})
+            dashboard_cache.set_summary(cache_key, data)
+            return conditional.add_validators(Response(data, headers={'X-Cache': 'MISS'}), etag)
             
-            # Opening Balance = Closing Balance - Net Movement
-            opening_balance = closing_balance - net_movement
+        except Exception as e:
+            return summary_failed(e)
+
+
+class AsyncDashboardSummaryView(AsyncAPIView):
+    """
+    DashboardSummaryView for the ASGI deployment: the movement totals and,
+    for a period that ended before today, the historical closing balance
+    are independent queries and run concurrently in the database pool.
+    """
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request):
+        try:
+            try:
+                filters = resolve_filters(request)
+            except FilterError as exc:
+                return Response({"error": str(exc)}, status=400)
+            base_id = filters['base_id']
+            equipment_type_id = filters['equipment_type_id']
+            start_date = filters['start_date']
+            end_date = filters['end_date']
+
+            cache_key = await sync_to_async(dashboard_cache.summary_key)(
+                base_id, equipment_type_id, start_date, end_date,
+            )
+            etag = summary_etag(cache_key)
+            not_modified = conditional.not_modified(request, etag)
+            if not_modified is not None:
+                return not_modified
+            cached = await sync_to_async(dashboard_cache.get_summary)(cache_key)
+            if cached is not None:
+                return conditional.add_validators(Response(cached, headers={'X-Cache': 'HIT'}), etag)
+
+            calls = [(dashboard_totals, base_id, equipment_type_id, start_date, end_date)]
+            if ended_before_today(end_date):
+                calls.append((total_as_of, end_date, base_id, equipment_type_id))
+            with replica_reads():
+                totals, *closing = await gather(*calls, timer=getattr(request, 'db_timer', None))
+                from_replica = reading_from_replica()
+
+            data = summary_data(filters, totals, closing[0] if closing else totals['closing_balance'])
+            if await sync_to_async(replica_may_lag)(base_id, from_replica):
+                return Response(data, headers={'X-Cache': 'MISS'})
+            await sync_to_async(dashboard_cache.set_summary)(cache_key, data)
+            return conditional.add_validators(Response(data, headers={'X-Cache': 'MISS'}), etag)
 
-            # --- 6. Assemble the Response ---
-            filters_applied = {
-                "base": int(base_id) if base_id else (user.base.id if user.role == 'BASE_COMMANDER' and hasattr(user, 'base') and user.base else 'all'),
+        except Exception as e:
+            return summary_failed(e)
+
+
+class DashboardSeriesView(ReplicaReadsMixin, APIView):
+    """
+    Movements bucketed by `interval` (day, week or month) for charts, under
+    the same filters and base scoping as the summary. Returns one list per
+    movement, aligned with `buckets` (the first day of each bucket); empty
+    buckets are zeros.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            filters = resolve_filters(request)
+        except FilterError as exc:
+            return Response({"error": str(exc)}, status=400)
+        interval = request.query_params.get('interval', 'day')
+        if interval not in SERIES_INTERVALS:
+            return Response({"error": f"interval must be one of: {', '.join(SERIES_INTERVALS)}."}, status=400)
+        base_id = filters['base_id']
+        equipment_type_id = filters['equipment_type_id']
+        start_date = filters['start_date']
+        end_date = filters['end_date']
+
+        cache_key = dashboard_cache.summary_key(
+            base_id, equipment_type_id, start_date, end_date, kind=f'series-{interval}',
+        )
+        cached = dashboard_cache.get_summary(cache_key)
+        if cached is not None:
+            return Response(cached, headers={'X-Cache': 'HIT'})
+
+        try:
+            buckets, series = movement_series(interval, base_id, equipment_type_id, start_date, end_date)
+        except TooManyBuckets as exc:
+            return Response({"error": str(exc)}, status=400)
+        data = {
+            "filters_applied": {
+                "base": int(base_id) if base_id else 'all',
                 "equipment_type": int(equipment_type_id) if equipment_type_id else 'all',
                 "start_date": start_date.isoformat() if start_date else None,
                 "end_date": end_date.isoformat() if end_date else None,
-            }
-            
-            data = {
-                "filters_applied": filters_applied,
-                "opening_balance": opening_balance,
-                "closing_balance": closing_balance,
-                "assigned": 0, # Placeholder - requires AssignmentRecord query
-                "expended": expended,
-                "net_movement": {
-                    "total": net_movement,
-                    "details": {
-                        "purchases": purchases,
-                        "transfers_in": transfers_in,
-                        "transfers_out": transfers_out,
-                    }
-                }
-            }
-            return Response(data)
-            
-        except Exception as e:
-            # Log the error for debugging
-            import traceback
-            print(f"Dashboard Summary Error: {e}")
-            print(traceback.format_exc())
-            return Response(
-                {"error": "An error occurred while calculating the dashboard summary."}, 
-                status=500
-            )
\ No newline at end of file
+            },
+            "interval": interval,
+            "buckets": [bucket.isoformat() for bucket in buckets],
+            "series": series,
+        }
+        if replica_may_lag(base_id, reading_from_replica()):
+            return Response(data, headers={'X-Cache': 'MISS'})
+        dashboard_cache.set_summary(cache_key, data)
+        return Response(data, headers={'X-Cache': 'MISS'})
+
+
+class InventoryAsOfView(ReplicaReadsMixin, APIView):
+    """
+    Stock per base and equipment type at the end of a past day, computed from
+    the nearest inventory snapshot. Takes `date` (required), `base` and
+    `equipment_type`; base commanders only see their own base.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            filters = resolve_filters(request)
+        except FilterError as exc:
+            return Response({"error": str(exc)}, status=400)
+        date_str = request.query_params.get('date', '')
+        try:
+            day = parse_date(date_str)
+        except ValueError:
+            day = None
+        if day is None:
+            return Response({"error": "A valid 'date' (YYYY-MM-DD) is required."}, status=400)
+
+        base_id = filters['base_id']
+        equipment_type_id = filters['equipment_type_id']
+        balances = balances_as_of(day, base_id, equipment_type_id)
+        return Response({
+            "as_of": day.isoformat(),
+            "filters_applied": {
+                "base": int(base_id) if base_id else 'all',
+                "equipment_type": int(equipment_type_id) if equipment_type_id else 'all',
+            },
+            "total": sum(balances.values()),
+            "balances": [
+                {"base_id": pair[0], "equipment_type_id": pair[1], "quantity": quantity}
+                for pair, quantity in sorted(balances.items()) if quantity
+            ],
+        })
+
+
+class DashboardCacheStatsView(APIView):
+    """Reports hit/miss counts for the dashboard summary and reference-data caches."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            "dashboard": dashboard_cache.stats(),
+            "reference_data": refcache.stats(),
+        })
@@ -0,0 +1,30 @@
+# Gunicorn reads this file from the working directory (the one holding manage.py).
+# It refuses several workers over a process-local cache, and keeps the
+# Prometheus multi-process directory consistent; see mams_project/metrics.py.
+import glob
+import os
+
+
+def on_starting(server):
+    if server.cfg.workers > 1:
+        # Cache invalidation relies on version counters every worker can see
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mams_project.settings')
+        from django.core.exceptions import ImproperlyConfigured
+        from mams_project.shared_cache import is_shared
+        if not is_shared():
+            raise ImproperlyConfigured(
+                f"{server.cfg.workers} workers need a shared cache: set CACHE_BACKEND and "
+                "CACHE_LOCATION (e.g. django.core.cache.backends.redis.RedisCache)."
+            )
+    # Samples left behind by a previous master would be counted again
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from logistics import transfer_queue
+
+
+class Command(BaseCommand):
+    help = (
+        "Settle the transfers accepted as PENDING (settings.TRANSFERS_ASYNC): move their stock "
+        "in batches and mark them COMPLETED, or REJECTED when the source base is short. Runs "
+        "until stopped, polling the queue every --poll seconds while it is empty; several "
+        "workers can run at once. --once drains the queue and exits, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            help="Transfers settled per transaction (default: TRANSFER_QUEUE_BATCH_SIZE).",
+        )
+        parser.add_argument('--poll', type=float, default=0.5, help="Seconds to wait while the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Drain the queue once and exit.")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            completed, rejected = transfer_queue.drain(options['batch_size'])
+            self.report(completed, rejected)
+            return
+        try:
+            while True:
+                # A long-running worker expires its connection the way the
+                # request cycle would
+                close_old_connections()
+                completed, rejected = transfer_queue.process_pending(options['batch_size'])
+                if completed or rejected:
+                    self.report(completed, rejected)
+                else:
+                    time.sleep(options['poll'])
+        except KeyboardInterrupt:
+            pass
+
+    def report(self, completed, rejected):
+        self.stdout.write(self.style.SUCCESS(f"Completed {completed} transfers, rejected {rejected}."))
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0004_ledger_time_range_indexes'),
+        ('logistics', '0002_initial'),
+        ('users', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assignmentrecord',
+            index=models.Index(fields=['issuing_base', 'equipment_type', 'assignment_date'], name='assign_base_equip_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assignmentrecord',
+            index=models.Index(fields=['assignment_date'], name='assignment_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expenditurerecord',
+            index=models.Index(fields=['base', 'equipment_type', 'expenditure_date'], name='expend_base_equip_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expenditurerecord',
+            index=models.Index(fields=['expenditure_date'], name='expenditure_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transferrecord',
+            index=models.Index(fields=['to_base', 'transfer_date'], name='transfer_to_base_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transferrecord',
+            index=models.Index(fields=['from_base', 'transfer_date'], name='transfer_from_base_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transferrecord',
+            index=models.Index(fields=['transfer_date'], name='transfer_date_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0005_keyset_pagination_indexes'),
+        ('logistics', '0003_ledger_time_range_indexes'),
+        ('users', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='assignmentrecord',
+            name='assignment_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='expenditurerecord',
+            name='expenditure_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transferrecord',
+            name='transfer_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='assignmentrecord',
+            index=models.Index(fields=['assignment_date', 'id'], name='assignment_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expenditurerecord',
+            index=models.Index(fields=['expenditure_date', 'id'], name='expenditure_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transferrecord',
+            index=models.Index(fields=['transfer_date', 'id'], name='transfer_date_idx'),
+        ),
+    ]
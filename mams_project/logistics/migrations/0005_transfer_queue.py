@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0009_inventory_shards'),
+        ('logistics', '0004_keyset_pagination_indexes'),
+        ('users', '0002_user_token_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transferrecord',
+            name='status',
+            field=models.CharField(choices=[('COMPLETED', 'Completed'), ('IN_TRANSIT', 'In Transit'), ('PENDING', 'Pending'), ('REJECTED', 'Rejected')], default='COMPLETED', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='transferrecord',
+            index=models.Index(condition=models.Q(('status', 'PENDING')), fields=['id'], name='transfer_pending_idx'),
+        ),
+    ]
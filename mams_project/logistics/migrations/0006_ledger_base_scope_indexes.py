@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0010_ledger_base_scope_indexes'),
+        ('logistics', '0005_transfer_queue'),
+        ('users', '0002_user_token_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assignmentrecord',
+            index=models.Index(fields=['issuing_base', 'assignment_date', 'id'], name='assign_base_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expenditurerecord',
+            index=models.Index(fields=['base', 'expenditure_date', 'id'], name='expend_base_date_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+# See assets/migrations/0011_trigram_search_indexes.py, which also installs
+# the pg_trgm extension.
+INDEXES = [('expenditurerecord', 'expend_notes_trgm_idx', 'notes')]
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model_name, name, column in INDEXES:
+        table = apps.get_model('logistics', model_name)._meta.db_table
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model_name, name, column in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0011_trigram_search_indexes'),
+        ('logistics', '0006_ledger_base_scope_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
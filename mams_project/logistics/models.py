@@ -2,9 +2,14 @@ from django.db import models
 from django.conf import settings
 from users.models import Base
 from assets.models import EquipmentType
+from assets.scoping import BaseScopedQuerySet
 
 class TransferRecord(models.Model):
-    """Logs the transfer of assets between two bases."""
+    """
+    Logs the transfer of assets between two bases. Transfers accepted as
+    PENDING have not moved any stock yet; the transfer queue completes or
+    rejects them (see logistics/transfer_queue.py).
+    """
     equipment_type = models.ForeignKey(EquipmentType, on_delete=models.PROTECT)
     quantity = models.PositiveIntegerField()
     from_base = models.ForeignKey(Base, related_name='transfers_out', on_delete=models.PROTECT)
@@ -16,9 +21,22 @@ class TransferRecord(models.Model):
         COMPLETED = 'COMPLETED', 'Completed'
         IN_TRANSIT = 'IN_TRANSIT', 'In Transit'
         PENDING = 'PENDING', 'Pending'
-        
+        REJECTED = 'REJECTED', 'Rejected'
+
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.COMPLETED)
 
+    base_fields = ('from_base', 'to_base')
+    objects = BaseScopedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['to_base', 'transfer_date'], name='transfer_to_base_date_idx'),
+            models.Index(fields=['from_base', 'transfer_date'], name='transfer_from_base_date_idx'),
+            models.Index(fields=['transfer_date', 'id'], name='transfer_date_idx'),
+            # The transfer queue: only the few pending rows are indexed
+            models.Index(fields=['id'], condition=models.Q(status='PENDING'), name='transfer_pending_idx'),
+        ]
+
     def __str__(self):
         return f"Transferred {self.quantity} of {self.equipment_type.name} from {self.from_base} to {self.to_base}"
 
@@ -31,10 +49,30 @@ class AssignmentRecord(models.Model):
     assignment_date = models.DateTimeField(auto_now_add=True)
     issuing_base = models.ForeignKey(Base, on_delete=models.PROTECT)
 
+    base_fields = ('issuing_base',)
+    objects = BaseScopedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['issuing_base', 'equipment_type', 'assignment_date'], name='assign_base_equip_date_idx'),
+            models.Index(fields=['assignment_date', 'id'], name='assignment_date_idx'),
+            models.Index(fields=['issuing_base', 'assignment_date', 'id'], name='assign_base_date_idx'),
+        ]
+
 class ExpenditureRecord(models.Model):
     """Logs the consumption/expenditure of assets (e.g., ammunition)."""
     equipment_type = models.ForeignKey(EquipmentType, on_delete=models.PROTECT)
     base = models.ForeignKey(Base, on_delete=models.PROTECT)
     quantity = models.PositiveIntegerField()
     expenditure_date = models.DateTimeField(auto_now_add=True)
-    notes = models.TextField(blank=True, help_text="Reason for expenditure, e.g., 'Training Exercise Alpha'")
\ No newline at end of file
+    notes = models.TextField(blank=True, help_text="Reason for expenditure, e.g., 'Training Exercise Alpha'")
+
+    base_fields = ('base',)
+    objects = BaseScopedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['base', 'equipment_type', 'expenditure_date'], name='expend_base_equip_date_idx'),
+            models.Index(fields=['expenditure_date', 'id'], name='expenditure_date_idx'),
+            models.Index(fields=['base', 'expenditure_date', 'id'], name='expend_base_date_idx'),
+        ]
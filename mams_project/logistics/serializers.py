@@ -2,6 +2,8 @@ from rest_framework import serializers
 from .models import TransferRecord, AssignmentRecord, ExpenditureRecord
 from assets.models import EquipmentType
 from assets.serializers import EquipmentTypeSerializer, BaseSerializer
+from assets import refcache
+from assets.refcache import CachedNestedField, CachedPrimaryKeyRelatedField
 from users.models import User
 from users.models import Base
 
@@ -11,17 +13,17 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'first_name', 'last_name', 'role']
 
 class TransferRecordSerializer(serializers.ModelSerializer):
-    equipment_type = EquipmentTypeSerializer(read_only=True)
-    equipment_type_id = serializers.PrimaryKeyRelatedField(
-        queryset=EquipmentType.objects.all(), source='equipment_type', write_only=True
+    equipment_type = CachedNestedField(EquipmentTypeSerializer, refcache.equipment_types, source='equipment_type_id')
+    equipment_type_id = CachedPrimaryKeyRelatedField(
+        refcache.equipment_types, queryset=EquipmentType.objects.all(), source='equipment_type', write_only=True
     )
-    from_base = BaseSerializer(read_only=True)
-    from_base_id = serializers.PrimaryKeyRelatedField(
-        queryset=Base.objects.all(), source='from_base', write_only=True
+    from_base = CachedNestedField(BaseSerializer, refcache.bases, source='from_base_id')
+    from_base_id = CachedPrimaryKeyRelatedField(
+        refcache.bases, queryset=Base.objects.all(), source='from_base', write_only=True
     )
-    to_base = BaseSerializer(read_only=True)
-    to_base_id = serializers.PrimaryKeyRelatedField(
-        queryset=Base.objects.all(), source='to_base', write_only=True
+    to_base = CachedNestedField(BaseSerializer, refcache.bases, source='to_base_id')
+    to_base_id = CachedPrimaryKeyRelatedField(
+        refcache.bases, queryset=Base.objects.all(), source='to_base', write_only=True
     )
     initiated_by = UserSerializer(read_only=True)
     
@@ -32,19 +34,21 @@ class TransferRecordSerializer(serializers.ModelSerializer):
             'from_base', 'from_base_id', 'to_base', 'to_base_id', 
             'transfer_date', 'initiated_by', 'status'
         ]
+        # Set by the server: COMPLETED, or PENDING until the transfer queue settles it
+        read_only_fields = ['status']
 
 class AssignmentRecordSerializer(serializers.ModelSerializer):
-    equipment_type = EquipmentTypeSerializer(read_only=True)
-    equipment_type_id = serializers.PrimaryKeyRelatedField(
-        queryset=EquipmentType.objects.all(), source='equipment_type', write_only=True
+    equipment_type = CachedNestedField(EquipmentTypeSerializer, refcache.equipment_types, source='equipment_type_id')
+    equipment_type_id = CachedPrimaryKeyRelatedField(
+        refcache.equipment_types, queryset=EquipmentType.objects.all(), source='equipment_type', write_only=True
     )
     assigned_to = UserSerializer(read_only=True)
     assigned_to_id = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(), source='assigned_to', write_only=True
     )
-    issuing_base = BaseSerializer(read_only=True)
-    issuing_base_id = serializers.PrimaryKeyRelatedField(
-        queryset=Base.objects.all(), source='issuing_base', write_only=True
+    issuing_base = CachedNestedField(BaseSerializer, refcache.bases, source='issuing_base_id')
+    issuing_base_id = CachedPrimaryKeyRelatedField(
+        refcache.bases, queryset=Base.objects.all(), source='issuing_base', write_only=True
     )
     
     class Meta:
@@ -55,13 +59,13 @@ class AssignmentRecordSerializer(serializers.ModelSerializer):
         ]
 
 class ExpenditureRecordSerializer(serializers.ModelSerializer):
-    equipment_type = EquipmentTypeSerializer(read_only=True)
-    equipment_type_id = serializers.PrimaryKeyRelatedField(
-        queryset=EquipmentType.objects.all(), source='equipment_type', write_only=True
+    equipment_type = CachedNestedField(EquipmentTypeSerializer, refcache.equipment_types, source='equipment_type_id')
+    equipment_type_id = CachedPrimaryKeyRelatedField(
+        refcache.equipment_types, queryset=EquipmentType.objects.all(), source='equipment_type', write_only=True
     )
-    base = BaseSerializer(read_only=True)
-    base_id = serializers.PrimaryKeyRelatedField(
-        queryset=Base.objects.all(), source='base', write_only=True
+    base = CachedNestedField(BaseSerializer, refcache.bases, source='base_id')
+    base_id = CachedPrimaryKeyRelatedField(
+        refcache.bases, queryset=Base.objects.all(), source='base', write_only=True
     )
     
     class Meta:
@@ -1,3 +1,558 @@
-from django.test import TestCase
+import io
+import json
+import random
+import sys
+import threading
+import time
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, router
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.urls import reverse
+from rest_framework import status
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient, APITestCase
+from mams_project.db_router import replica_reads
+from mams_project.testing import ConstantQueryCountMixin, QueryPlanAssertionsMixin, shared_cache
+from users.models import User, Base
+from assets import dashboard_cache, reconciliation
+from assets.models import EquipmentType, AssetInventory
+from .models import TransferRecord, AssignmentRecord, ExpenditureRecord
+from . import transfer_queue
 
-# Create your tests here.
+
+class QueryPlanTests(QueryPlanAssertionsMixin, TestCase):
+    """EXPLAIN-based checks that ledger list and dashboard queries stay on indexes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.bases = [Base.objects.create(name=f"Base {i}") for i in range(5)]
+        cls.equipment = [EquipmentType.objects.create(name=f"Item {i}", category="Ammunition") for i in range(5)]
+        cls.soldier = User.objects.create_user(username='soldier', password='password123')
+        pairs = [(base, equipment) for base in cls.bases for equipment in cls.equipment]
+        TransferRecord.objects.bulk_create(
+            TransferRecord(equipment_type=equipment, quantity=1, from_base=base, to_base=cls.bases[-1])
+            for base, equipment in pairs for _ in range(10)
+        )
+        AssignmentRecord.objects.bulk_create(
+            AssignmentRecord(equipment_type=equipment, quantity=1, issuing_base=base, assigned_to=cls.soldier)
+            for base, equipment in pairs for _ in range(10)
+        )
+        ExpenditureRecord.objects.bulk_create(
+            ExpenditureRecord(equipment_type=equipment, quantity=1, base=base)
+            for base, equipment in pairs for _ in range(10)
+        )
+
+    def test_transfer_queries_use_indexes(self):
+        base = self.bases[0]
+        self.assertUsesIndex(TransferRecord.objects.order_by('-transfer_date')[:50], 'transfer_date_idx')
+        self.assertUsesIndex(
+            TransferRecord.objects.filter(to_base=base).order_by('-transfer_date'), 'transfer_to_base_date_idx'
+        )
+        self.assertUsesIndex(
+            TransferRecord.objects.filter(from_base=base).order_by('-transfer_date'), 'transfer_from_base_date_idx'
+        )
+
+    def test_assignment_queries_use_indexes(self):
+        self.assertUsesIndex(AssignmentRecord.objects.order_by('-assignment_date')[:50], 'assignment_date_idx')
+        scoped = AssignmentRecord.objects.filter(
+            issuing_base=self.bases[0], equipment_type=self.equipment[0]
+        ).order_by('-assignment_date')
+        self.assertUsesIndex(scoped, 'assign_base_equip_date_idx')
+
+    def test_expenditure_queries_use_indexes(self):
+        self.assertUsesIndex(ExpenditureRecord.objects.order_by('-expenditure_date')[:50], 'expenditure_date_idx')
+        scoped = ExpenditureRecord.objects.filter(
+            base=self.bases[0], equipment_type=self.equipment[0]
+        ).order_by('-expenditure_date')
+        self.assertUsesIndex(scoped, 'expend_base_equip_date_idx')
+
+    def test_commander_lists_use_base_indexes(self):
+        base = self.bases[0]
+        self.assertUsesIndex(
+            AssignmentRecord.objects.for_base(base.pk).order_by('-assignment_date', '-id')[:50], 'assign_base_date_idx'
+        )
+        self.assertUsesIndex(
+            ExpenditureRecord.objects.for_base(base.pk).order_by('-expenditure_date', '-id')[:50], 'expend_base_date_idx'
+        )
+
+
+class BulkLogisticsTests(APITestCase):
+    def setUp(self):
+        self.alpha = Base.objects.create(name="Alpha")
+        self.bravo = Base.objects.create(name="Bravo")
+        self.equipment = EquipmentType.objects.create(name="5.56mm Rounds", category="Ammunition")
+        self.admin_user = User.objects.create_user(username='admin', password='password123', role=User.Role.ADMIN)
+        AssetInventory.objects.create(base=self.alpha, equipment_type=self.equipment, quantity=100)
+        self.client.force_authenticate(user=self.admin_user)
+
+    def transfer(self, source, destination, quantity):
+        return {
+            "equipment_type_id": self.equipment.pk, "quantity": quantity,
+            "from_base_id": source.pk, "to_base_id": destination.pk,
+        }
+
+    def stock(self, base):
+        return AssetInventory.objects.get(base=base, equipment_type=self.equipment).quantity
+
+    def test_transfers_apply_net_deltas_in_order(self):
+        # Bravo can only send stock back after receiving it earlier in the batch
+        rows = [self.transfer(self.alpha, self.bravo, 60), self.transfer(self.bravo, self.alpha, 20)]
+        response = self.client.post(reverse('transfer-bulk'), rows, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((self.stock(self.alpha), self.stock(self.bravo)), (60, 40))
+        self.assertEqual(TransferRecord.objects.filter(initiated_by=self.admin_user).count(), 2)
+
+    def test_overdraw_rejects_whole_batch(self):
+        rows = [self.transfer(self.alpha, self.bravo, 60), self.transfer(self.alpha, self.bravo, 60)]
+        response = self.client.post(reverse('transfer-bulk'), rows, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['results'][1]['errors'], {"error": "Insufficient assets at source base."})
+        self.assertEqual(self.stock(self.alpha), 100)
+        self.assertFalse(TransferRecord.objects.exists())
+
+    def test_partial_mode_rejects_only_overdrawing_rows(self):
+        rows = [
+            {"equipment_type_id": self.equipment.pk, "base_id": self.alpha.pk, "quantity": quantity}
+            for quantity in (70, 40, 30)
+        ]
+        response = self.client.post(f"{reverse('expenditure-bulk')}?partial=true", rows, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']], ['created', 'rejected', 'created']
+        )
+        self.assertEqual(self.stock(self.alpha), 0)
+        self.assertEqual(ExpenditureRecord.objects.count(), 2)
+
+        response = self.client.post(f"{reverse('expenditure-bulk')}?partial=true", rows[:1], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ExpenditureRecord.objects.count(), 2)
+
+
+class ListQueryCountTests(ConstantQueryCountMixin, APITestCase):
+    """Every router-registered list endpoint must avoid N+1 queries."""
+
+    def setUp(self):
+        self.admin_user = User.objects.create_user(username='admin', password='password123', role=User.Role.ADMIN)
+        self.client.force_authenticate(user=self.admin_user)
+        self.created = 0
+
+    def related(self):
+        """A fresh equipment type, pair of bases and user for each seeded record."""
+        self.created += 1
+        n = self.created
+        return (
+            EquipmentType.objects.create(name=f"Item {n}", category="Ammunition"),
+            Base.objects.create(name=f"Origin {n}"),
+            Base.objects.create(name=f"Destination {n}"),
+            User.objects.create(username=f'soldier{n}'),
+        )
+
+    def seed_transfers(self, count):
+        for _ in range(count):
+            equipment, origin, destination, user = self.related()
+            TransferRecord.objects.create(
+                equipment_type=equipment, quantity=1, from_base=origin, to_base=destination, initiated_by=user
+            )
+
+    def seed_assignments(self, count):
+        for _ in range(count):
+            equipment, origin, destination, user = self.related()
+            AssignmentRecord.objects.create(equipment_type=equipment, quantity=1, issuing_base=origin, assigned_to=user)
+
+    def seed_expenditures(self, count):
+        for _ in range(count):
+            equipment, origin, destination, user = self.related()
+            ExpenditureRecord.objects.create(equipment_type=equipment, quantity=1, base=origin)
+
+    def test_transfer_list(self):
+        self.assertConstantQueryCount(reverse('transfer-list'), self.seed_transfers)
+
+    def test_assignment_list(self):
+        self.assertConstantQueryCount(reverse('assignment-list'), self.seed_assignments)
+
+    def test_expenditure_list(self):
+        self.assertConstantQueryCount(reverse('expenditure-list'), self.seed_expenditures)
+
+
+class TransferExportTests(APITestCase):
+    def test_base_filter_matches_either_side_of_a_transfer(self):
+        alpha, bravo, charlie = (Base.objects.create(name=name) for name in ("Alpha", "Bravo", "Charlie"))
+        equipment = EquipmentType.objects.create(name="Humvee", category="Vehicle")
+        for source, destination in ((alpha, bravo), (bravo, alpha), (bravo, charlie)):
+            TransferRecord.objects.create(equipment_type=equipment, quantity=1, from_base=source, to_base=destination)
+        admin_user = User.objects.create_user(username='admin', password='password123', role=User.Role.ADMIN)
+        self.client.force_authenticate(user=admin_user)
+
+        response = self.client.get(reverse('transfer-export', args=['ndjson']), {'base': alpha.pk})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([(row['from_base'], row['to_base']) for row in rows], [("Alpha", "Bravo"), ("Bravo", "Alpha")])
+
+
+class MetricsTests(APITestCase):
+    def setUp(self):
+        self.base = Base.objects.create(name="Alpha")
+        self.other_base = Base.objects.create(name="Bravo")
+        self.equipment = EquipmentType.objects.create(name="Humvee", category="Vehicle")
+        AssetInventory.objects.create(base=self.base, equipment_type=self.equipment, quantity=1)
+        self.admin_user = User.objects.create_user(username='admin', password='password123', role=User.Role.ADMIN)
+        self.client.force_authenticate(user=self.admin_user)
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_requests_are_timed(self):
+        before = self.sample('mams_http_request_duration_seconds_count', method='GET', route='transfer-list', status='200')
+        response = self.client.get(reverse('transfer-list'))
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"$')
+        self.assertEqual(
+            self.sample('mams_http_request_duration_seconds_count', method='GET', route='transfer-list', status='200'),
+            before + 1,
+        )
+        self.assertGreater(self.sample('mams_http_request_db_queries_sum', route='transfer-list'), 0)
+        self.assertGreater(self.sample('mams_http_response_size_bytes_sum', route='transfer-list'), 0)
+
+    def test_inventory_conflicts_are_counted(self):
+        before = self.sample('mams_inventory_conflicts_total', ledger='transfer')
+        response = self.client.post(reverse('transfer-list'), {
+            'equipment_type_id': self.equipment.pk,
+            'from_base_id': self.base.pk,
+            'to_base_id': self.other_base.pk,
+            'quantity': 5,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.sample('mams_inventory_conflicts_total', ledger='transfer'), before + 1)
+
+    def test_metrics_endpoint_is_admin_only(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'mams_http_request_duration_seconds_bucket', response.content)
+
+        officer = User.objects.create_user(username='officer', password='password123')
+        self.client.force_authenticate(user=officer)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_403_FORBIDDEN)
+
+
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class InventoryConcurrencyStressTests(TransactionTestCase):
+    """
+    Hammer the inventory-mutating endpoints from several threads at once and
+    check that stock never goes negative and no update is lost.
+    """
+    THREADS = 8
+    REQUESTS_PER_THREAD = 25
+    INITIAL_STOCK = 150
+
+    def setUp(self):
+        self.bases = [Base.objects.create(name="Alpha"), Base.objects.create(name="Bravo")]
+        self.equipment = EquipmentType.objects.create(name="5.56mm Rounds", category="Ammunition")
+        self.admin_user = User.objects.create_user(username='admin', password='password123', role=User.Role.ADMIN)
+        for base in self.bases:
+            AssetInventory.objects.create(base=base, equipment_type=self.equipment, quantity=self.INITIAL_STOCK)
+
+    def _request(self, client, rng):
+        source, destination = rng.sample(self.bases, 2)
+        quantity = rng.randint(1, 10)
+        kind = rng.choice(['transfer', 'assignment', 'expenditure'])
+        if kind == 'transfer':
+            return client.post(reverse('transfer-list'), {
+                "equipment_type_id": self.equipment.pk, "quantity": quantity,
+                "from_base_id": source.pk, "to_base_id": destination.pk,
+            }, format='json')
+        if kind == 'assignment':
+            return client.post(reverse('assignment-list'), {
+                "equipment_type_id": self.equipment.pk, "quantity": quantity,
+                "issuing_base_id": source.pk, "assigned_to_id": self.admin_user.pk,
+            }, format='json')
+        return client.post(reverse('expenditure-list'), {
+            "equipment_type_id": self.equipment.pk, "quantity": quantity, "base_id": source.pk,
+        }, format='json')
+
+    def _worker(self, seed, statuses, errors):
+        client = APIClient()
+        client.force_authenticate(user=self.admin_user)
+        rng = random.Random(seed)
+        try:
+            for _ in range(self.REQUESTS_PER_THREAD):
+                statuses.append(self._request(client, rng).status_code)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    def test_concurrent_mutations_never_overdraw_or_lose_updates(self):
+        statuses, errors = [], []
+        threads = [
+            threading.Thread(target=self._worker, args=(seed, statuses, errors))
+            for seed in range(self.THREADS)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(statuses), self.THREADS * self.REQUESTS_PER_THREAD)
+        self.assertTrue(set(statuses) <= {201, 400}, statuses)
+        sys.stderr.write(
+            f"\n[inventory stress] {len(statuses)} requests in {elapsed:.2f}s "
+            f"({len(statuses) / elapsed:.1f} req/s), {statuses.count(201)} accepted\n"
+        )
+
+        # Every base's stock must equal its opening stock plus its ledger movements
+        def total(queryset):
+            return queryset.aggregate(total=Sum('quantity'))['total'] or 0
+
+        for base in self.bases:
+            expected = (
+                self.INITIAL_STOCK
+                + total(TransferRecord.objects.filter(to_base=base))
+                - total(TransferRecord.objects.filter(from_base=base))
+                - total(AssignmentRecord.objects.filter(issuing_base=base))
+                - total(ExpenditureRecord.objects.filter(base=base))
+            )
+            quantity = AssetInventory.objects.get(base=base, equipment_type=self.equipment).quantity
+            self.assertGreaterEqual(quantity, 0)
+            self.assertEqual(quantity, expected)
+
+
+# An in-memory SQLite database standing in for a lagging read replica. It is
+# registered at import so the test runner creates (and migrates) it for the
+# tests that declare it.
+connections.settings.setdefault('stale_replica', connections.configure_settings({
+    'default': connections.settings['default'],
+    'stale_replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+})['stale_replica'])
+
+
+@override_settings(DATABASE_REPLICAS=['stale_replica'])
+class ReadReplicaTests(APITestCase):
+    """The replica holds the reference data but none of the stock delivered since."""
+    databases = {'default', 'stale_replica'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alpha = Base.objects.create(name="Alpha")
+        cls.bravo = Base.objects.create(name="Bravo")
+        cls.rifle = EquipmentType.objects.create(name="M4 Rifle", category="Weapon")
+        cls.admin_user = User.objects.create_user(username='admin', password='password123', role=User.Role.ADMIN)
+        for instance in (cls.alpha, cls.bravo, cls.rifle, cls.admin_user):
+            instance.save(using='stale_replica', force_insert=True)
+        AssetInventory.objects.using('stale_replica').create(base=cls.alpha, equipment_type=cls.rifle, quantity=0)
+        AssetInventory.objects.create(base=cls.alpha, equipment_type=cls.rifle, quantity=10)
+        TransferRecord.objects.create(equipment_type=cls.rifle, quantity=1, from_base=cls.bravo, to_base=cls.alpha)
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.admin_user)
+
+    def test_reads_go_to_the_replica(self):
+        response = self.client.get(reverse('transfer-list'))
+        self.assertEqual(response.data['results'], [])
+        response = self.client.get(reverse('dashboard-summary'), {'base': self.alpha.pk})
+        self.assertEqual(response.data['closing_balance'], 0)
+
+    @shared_cache()
+    def test_replica_figures_are_not_cached_right_after_a_write(self):
+        cache.clear()
+        url = reverse('dashboard-summary')
+        dashboard_cache.bump_bases([self.alpha.pk])
+        for attempt in range(2):
+            response = self.client.get(url, {'base': self.alpha.pk})
+            self.assertEqual((response['X-Cache'], response.data['closing_balance']), ('MISS', 0))
+            self.assertNotIn('ETag', response)
+
+        with self.settings(REPLICA_LAG_WINDOW=0):
+            cache.clear()
+            dashboard_cache.bump_bases([self.alpha.pk])
+            self.client.get(url, {'base': self.alpha.pk})
+            self.assertEqual(self.client.get(url, {'base': self.alpha.pk})['X-Cache'], 'HIT')
+
+    def test_create_endpoints_never_read_stale_inventory(self):
+        response = self.client.post(reverse('transfer-list'), {
+            "equipment_type_id": self.rifle.pk, "from_base_id": self.alpha.pk,
+            "to_base_id": self.bravo.pk, "quantity": 4,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(reverse('expenditure-list'), {
+            "equipment_type_id": self.rifle.pk, "base_id": self.alpha.pk, "quantity": 6,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(AssetInventory.objects.get(base=self.alpha).quantity, 0)
+        self.assertEqual(AssetInventory.objects.get(base=self.bravo).quantity, 4)
+
+    def test_reads_after_a_write_stay_on_the_primary(self):
+        self.assertEqual(router.db_for_read(AssetInventory), 'default')
+        with replica_reads():
+            self.assertEqual(router.db_for_read(AssetInventory), 'stale_replica')
+            EquipmentType.objects.create(name="M9 Pistol", category="Weapon")
+            self.assertEqual(router.db_for_read(AssetInventory), 'default')
+            self.assertEqual(AssetInventory.objects.get(base=self.alpha).quantity, 10)
+
+
+@override_settings(TRANSFERS_ASYNC=True)
+class TransferQueueTests(APITestCase):
+    def setUp(self):
+        self.alpha = Base.objects.create(name="Alpha")
+        self.bravo = Base.objects.create(name="Bravo")
+        self.equipment = EquipmentType.objects.create(name="5.56mm Rounds", category="Ammunition")
+        self.admin_user = User.objects.create_user(username='admin', password='password123', role=User.Role.ADMIN)
+        self.client.force_authenticate(user=self.admin_user)
+        self.client.post(reverse('purchase-list'), {
+            "equipment_type_id": self.equipment.pk, "base_id": self.alpha.pk, "quantity": 10,
+        }, format='json')
+
+    def accept(self, quantity):
+        return self.client.post(reverse('transfer-list'), {
+            "equipment_type_id": self.equipment.pk, "quantity": quantity,
+            "from_base_id": self.alpha.pk, "to_base_id": self.bravo.pk,
+        }, format='json')
+
+    def stock(self):
+        return dict(AssetInventory.objects.values_list('base__name', 'quantity'))
+
+    def test_transfers_are_accepted_then_settled_in_order(self):
+        responses = [self.accept(4) for _ in range(3)]
+        self.assertEqual([response.status_code for response in responses], [status.HTTP_202_ACCEPTED] * 3)
+        self.assertEqual(responses[0].data['status'], TransferRecord.Status.PENDING)
+        self.assertEqual(self.stock(), {"Alpha": 10})
+
+        progress = self.client.get(responses[0]['Location'])
+        self.assertEqual(progress.data, {'id': responses[0].data['id'], 'status': 'PENDING'})
+        self.assertEqual(progress['Retry-After'], '1')
+        # Pending transfers have not moved anything the ledgers know of
+        self.assertEqual(reconciliation.find_drift()[1], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(transfer_queue.process_pending(), (2, 1))
+        self.assertEqual(self.stock(), {"Alpha": 2, "Bravo": 8})
+        self.assertEqual(
+            [self.client.get(response['Location']).data['status'] for response in responses],
+            ['COMPLETED', 'COMPLETED', 'REJECTED'],
+        )
+        self.assertEqual(
+            self.client.get(responses[2]['Location']).data['error'], "Insufficient assets at source base."
+        )
+        self.assertEqual(transfer_queue.process_pending(), (0, 0))
+        self.assertEqual(reconciliation.find_drift()[1], [])
+        summary = self.client.get(reverse('dashboard-summary'), {'base': self.bravo.pk}).data
+        self.assertEqual((summary['net_movement']['details']['transfers_in'], summary['closing_balance']), (8, 8))
+
+    def test_transfers_the_source_cannot_cover_are_refused_at_once(self):
+        response = self.accept(11)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(TransferRecord.objects.exists())
+
+    def test_worker_command_drains_the_queue(self):
+        for _ in range(3):
+            self.accept(3)
+        out = io.StringIO()
+        call_command('process_transfers', once=True, batch_size=2, stdout=out)
+        self.assertIn("Completed 3 transfers, rejected 0.", out.getvalue())
+        self.assertEqual(self.stock(), {"Alpha": 1, "Bravo": 9})
+        self.assertFalse(transfer_queue.pending().exists())
+
+    @override_settings(TRANSFERS_ASYNC=False)
+    def test_clients_cannot_set_the_status(self):
+        response = self.client.post(reverse('transfer-list'), {
+            "equipment_type_id": self.equipment.pk, "quantity": 4, "status": "PENDING",
+            "from_base_id": self.alpha.pk, "to_base_id": self.bravo.pk,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['status'], TransferRecord.Status.COMPLETED)
+        self.assertEqual(self.stock(), {"Alpha": 6, "Bravo": 4})
+
+
+class RoleScopingTests(APITestCase):
+    def setUp(self):
+        self.alpha = Base.objects.create(name="Alpha")
+        self.bravo = Base.objects.create(name="Bravo")
+        self.charlie = Base.objects.create(name="Charlie")
+        self.equipment = EquipmentType.objects.create(name="5.56mm Rounds", category="Ammunition")
+        self.soldier = User.objects.create_user(username='soldier', password='password123')
+        self.commander = User.objects.create_user(
+            username='commander', password='password123', role=User.Role.BASE_COMMANDER, base=self.alpha
+        )
+        self.admin_user = User.objects.create_user(username='admin', password='password123', role=User.Role.ADMIN)
+        routes = [(self.alpha, self.bravo), (self.bravo, self.alpha), (self.bravo, self.charlie)] * 3
+        self.transfers = TransferRecord.objects.bulk_create(
+            TransferRecord(equipment_type=self.equipment, quantity=1, from_base=source, to_base=destination)
+            for source, destination in routes
+        )
+        ExpenditureRecord.objects.bulk_create(
+            ExpenditureRecord(equipment_type=self.equipment, quantity=1, base=base)
+            for base in (self.alpha, self.bravo) * 3
+        )
+
+    def listed(self, name, **params):
+        response = self.client.get(reverse(f'{name}-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()['results']
+
+    def test_commander_lists_only_own_base(self):
+        self.client.force_authenticate(user=self.commander)
+        transfers = self.listed('transfer')
+        self.assertEqual(len(transfers), 6)
+        self.assertTrue(all(self.alpha.pk in (row['from_base']['id'], row['to_base']['id']) for row in transfers))
+        self.assertEqual({row['base']['id'] for row in self.listed('expenditure')}, {self.alpha.pk})
+
+    def test_scope_applies_before_pagination(self):
+        self.client.force_authenticate(user=self.commander)
+        response = self.client.get(reverse('transfer-list'), {'page_size': 4})
+        self.assertEqual(len(response.json()['results']), 4)
+        rest = self.client.get(response.json()['next']).json()
+        self.assertEqual(len(rest['results']), 2)
+        self.assertIsNone(rest['next'])
+
+    def test_other_base_record_is_not_found(self):
+        self.client.force_authenticate(user=self.commander)
+        outside = next(t for t in self.transfers if self.alpha.pk not in (t.from_base_id, t.to_base_id))
+        inside = next(t for t in self.transfers if t.to_base_id == self.alpha.pk)
+        self.assertEqual(
+            self.client.get(reverse('transfer-detail', args=[outside.pk])).status_code, status.HTTP_404_NOT_FOUND
+        )
+        self.assertEqual(self.client.get(reverse('transfer-detail', args=[inside.pk])).status_code, status.HTTP_200_OK)
+
+    def test_admin_and_unassigned_commander(self):
+        self.client.force_authenticate(user=self.admin_user)
+        self.assertEqual(len(self.listed('transfer')), 9)
+        self.commander.base = None
+        self.commander.save()
+        self.client.force_authenticate(user=self.commander)
+        self.assertEqual(self.listed('transfer'), [])
+
+
+class LogisticsFilterTests(APITestCase):
+    def setUp(self):
+        self.alpha = Base.objects.create(name="Alpha")
+        self.bravo = Base.objects.create(name="Bravo")
+        self.equipment = EquipmentType.objects.create(name="5.56mm Rounds", category="Ammunition")
+        self.admin_user = User.objects.create_user(username='admin', password='password123', role=User.Role.ADMIN)
+        self.client.force_authenticate(user=self.admin_user)
+        TransferRecord.objects.create(equipment_type=self.equipment, quantity=1, from_base=self.alpha, to_base=self.bravo)
+        TransferRecord.objects.create(
+            equipment_type=self.equipment, quantity=2, from_base=self.bravo, to_base=self.alpha,
+            status=TransferRecord.Status.PENDING,
+        )
+        for quantity, notes in ((3, "Training exercise Alpha"), (4, "Live fire qualification")):
+            ExpenditureRecord.objects.create(base=self.alpha, equipment_type=self.equipment, quantity=quantity, notes=notes)
+
+    def quantities(self, name, **params):
+        response = self.client.get(reverse(f'{name}-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        return sorted(row['quantity'] for row in response.json()['results'])
+
+    def test_transfer_filters(self):
+        self.assertEqual(self.quantities('transfer', base=self.alpha.pk), [1, 2])
+        self.assertEqual(self.quantities('transfer', from_base=self.alpha.pk), [1])
+        self.assertEqual(self.quantities('transfer', status='PENDING'), [2])
+
+    def test_expenditure_notes_search(self):
+        self.assertEqual(self.quantities('expenditure', search='train'), [3])
+        self.assertEqual(self.quantities('expenditure', fuzzy='qualifcation'), [4])
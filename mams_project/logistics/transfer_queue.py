@@ -0,0 +1,96 @@
+"""
+The transfer queue behind accept-fast transfers (settings.TRANSFERS_ASYNC).
+
+The create endpoint only validates a transfer and stores it as PENDING; the
+pending rows are the queue. Workers (the process_transfers command) claim
+the oldest of them with SELECT ... FOR UPDATE SKIP LOCKED, so several can
+run side by side without taking the same transfer, and settle a whole batch
+in one transaction: the inventory rows of every (base, equipment_type) the
+batch touches are locked once, the transfers are replayed against them in
+order, and the net change of every pair is written back at once.
+
+A queued transfer goes straight from PENDING to COMPLETED or REJECTED. It
+is never marked IN_TRANSIT: the claim and the settlement share one
+transaction, so no other reader could see that status, and the row lock
+already keeps other workers off it. Until its batch commits, a claimed
+transfer reads as PENDING.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from assets import inventory
+from assets.rollups import record_movements
+from mams_project import metrics
+
+from .models import TransferRecord
+
+REJECTED_ERROR = "Insufficient assets at source base."
+
+
+def batch_size():
+    return getattr(settings, 'TRANSFER_QUEUE_BATCH_SIZE', 500)
+
+
+def pending():
+    return TransferRecord.objects.filter(status=TransferRecord.Status.PENDING)
+
+
+def process_pending(limit=None):
+    """
+    Settle up to `limit` (default TRANSFER_QUEUE_BATCH_SIZE) pending
+    transfers, oldest first. A transfer its source cannot cover when its
+    turn comes is REJECTED and moves nothing; the others are COMPLETED and
+    folded into the daily rollup. Claimed transfers stay PENDING until
+    this commits (see the module docstring). Returns (completed, rejected)
+    counts; (0, 0) once the queue is empty, or every pending transfer is being
+    settled by another worker.
+    """
+    with transaction.atomic():
+        batch = list(
+            pending().select_for_update(skip_locked=True).order_by('id')[:limit or batch_size()]
+        )
+        if not batch:
+            return 0, 0
+
+        stock = inventory.lock(
+            pair for transfer in batch
+            for pair in ((transfer.from_base_id, transfer.equipment_type_id),
+                         (transfer.to_base_id, transfer.equipment_type_id))
+        )
+        balances = {pair: row.quantity for pair, row in stock.items()}
+        completed, rejected = [], []
+        for transfer in batch:
+            source = (transfer.from_base_id, transfer.equipment_type_id)
+            if balances[source] < transfer.quantity:
+                rejected.append(transfer)
+                continue
+            balances[source] -= transfer.quantity
+            balances[transfer.to_base_id, transfer.equipment_type_id] += transfer.quantity
+            completed.append(transfer)
+
+        changed = [row for pair, row in stock.items() if row.quantity != balances[pair]]
+        for row in changed:
+            row.quantity = balances[(row.base_id, row.equipment_type_id)]
+        inventory.save_quantities(changed)
+
+        for transfers, status in ((completed, TransferRecord.Status.COMPLETED), (rejected, TransferRecord.Status.REJECTED)):
+            if transfers:
+                TransferRecord.objects.filter(pk__in=[transfer.pk for transfer in transfers]).update(status=status)
+                for transfer in transfers:
+                    transfer.status = status
+        record_movements(completed)
+
+    if rejected:
+        metrics.inventory_conflict('transfer', len(rejected))
+    return len(completed), len(rejected)
+
+
+def drain(limit=None):
+    """Settle batches until the queue is empty. Returns the (completed, rejected) totals."""
+    completed = rejected = 0
+    while True:
+        batch_completed, batch_rejected = process_pending(limit)
+        if not (batch_completed or batch_rejected):
+            return completed, rejected
+        completed += batch_completed
+        rejected += batch_rejected
@@ -1,6 +1,7 @@
 # logistics/urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from mams_project.async_views import async_list_routes
 from .views import TransferRecordViewSet, AssignmentRecordViewSet, ExpenditureRecordViewSet  # Assuming you create other viewsets for Assignment/Expenditure
 
 router = DefaultRouter()
@@ -10,5 +11,6 @@ router.register(r'expenditures', ExpenditureRecordViewSet, basename='expenditure
 
 
 urlpatterns = [
+    *async_list_routes(router),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,13 +1,56 @@
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
+from django.conf import settings
 from django.db import transaction
 from .models import TransferRecord, AssignmentRecord, ExpenditureRecord
 from .serializers import TransferRecordSerializer, AssignmentRecordSerializer, ExpenditureRecordSerializer
-from assets.models import AssetInventory
+from .transfer_queue import REJECTED_ERROR
+from assets import inventory
+from assets.bulk import BulkCreateMixin
+from assets.exports import LedgerExportMixin
+from assets.filtering import ListFilterBackend
+from assets.rollups import RollupCorrectionMixin, record_movement
+from assets.scoping import BaseScopedMixin
+from mams_project import metrics
+from mams_project.db_router import ReplicaReadsMixin
+from mams_project.pagination import KeysetPagination
 
-class TransferRecordViewSet(viewsets.ModelViewSet):
-    queryset = TransferRecord.objects.all().order_by('-transfer_date')
+class TransferRecordViewSet(ReplicaReadsMixin, BaseScopedMixin, RollupCorrectionMixin, BulkCreateMixin, LedgerExportMixin, viewsets.ModelViewSet):
+    # Bases and equipment types are rendered from the reference-data cache
+    queryset = TransferRecord.objects.select_related('initiated_by').order_by('-transfer_date', '-id')
     serializer_class = TransferRecordSerializer
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-transfer_date', '-id')
+    filter_backends = [ListFilterBackend]
+    filter_fields = {'from_base': 'from_base_id', 'to_base': 'to_base_id', 'status': 'status'}
+    export_date_field = 'transfer_date'
+    export_columns = (
+        ('id', 'id'),
+        ('transfer_date', 'transfer_date'),
+        ('status', 'status'),
+        ('from_base_id', 'from_base_id'),
+        ('from_base', 'from_base__name'),
+        ('to_base_id', 'to_base_id'),
+        ('to_base', 'to_base__name'),
+        ('equipment_type_id', 'equipment_type_id'),
+        ('equipment_type', 'equipment_type__name'),
+        ('category', 'equipment_type__category'),
+        ('quantity', 'quantity'),
+        ('initiated_by', 'initiated_by__username'),
+    )
+    insufficient_stock_error = REJECTED_ERROR
+
+    def bulk_movements(self, transfer):
+        return [
+            (transfer.from_base_id, transfer.equipment_type_id, -transfer.quantity),
+            (transfer.to_base_id, transfer.equipment_type_id, transfer.quantity),
+        ]
+
+    def bulk_save_kwargs(self):
+        return {'initiated_by': self.request.user}
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -17,38 +60,77 @@ class TransferRecordViewSet(viewsets.ModelViewSet):
         to_base = serializer.validated_data['to_base']
         equipment_type = serializer.validated_data['equipment_type']
         quantity = serializer.validated_data['quantity']
+
+        if getattr(settings, 'TRANSFERS_ASYNC', False):
+            return self.accept(serializer)
         
-        with transaction.atomic():
-            # 1. Check if source base has enough assets
-            source_inventory = AssetInventory.objects.get(base=from_base, equipment_type=equipment_type)
-            if source_inventory.quantity < quantity:
-                return Response(
-                    {"error": "Insufficient assets at source base."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # 2. Decrement from source
-            source_inventory.quantity -= quantity
-            source_inventory.save()
-            
-            # 3. Increment at destination
-            dest_inventory, created = AssetInventory.objects.get_or_create(
-                base=to_base, equipment_type=equipment_type
+        try:
+            with transaction.atomic():
+                # 1. Move the assets: a conditional decrement at the source
+                #    and an upsert at the destination, in deterministic order
+                inventory.move(from_base.id, to_base.id, equipment_type.id, quantity)
+
+                # 2. Save the transfer record and fold it into the daily rollup
+                transfer = serializer.save(initiated_by=request.user)
+                record_movement(transfer)
+        except inventory.InsufficientStock:
+            metrics.inventory_conflict(self.basename)
+            return Response(
+                {"error": REJECTED_ERROR},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            dest_inventory.quantity += quantity
-            dest_inventory.save()
-            
-            # 4. Save the transfer record
-            serializer.save(initiated_by=request.user)
             
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-class AssignmentRecordViewSet(viewsets.ModelViewSet):
+    def accept(self, serializer):
+        """
+        Store a validated transfer as PENDING for the transfer queue and
+        answer 202 with the URL to poll. A transfer the source cannot cover
+        even now is refused at once; the stock is checked again, under lock,
+        when the transfer is settled.
+        """
+        data = serializer.validated_data
+        available = inventory.stock(data['from_base'].id, data['equipment_type'].id)
+        if available < data['quantity']:
+            metrics.inventory_conflict(self.basename)
+            return Response({"error": REJECTED_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+        transfer = serializer.save(initiated_by=self.request.user, status=TransferRecord.Status.PENDING)
+        location = reverse('transfer-status', args=[transfer.pk], request=self.request)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED, headers={'Location': location})
+
+    @action(detail=True, url_path='status', url_name='status')
+    def transfer_status(self, request, pk=None):
+        """Where an accepted transfer stands; clients poll this until it leaves PENDING."""
+        transfer = get_object_or_404(self.get_queryset().values('id', 'status'), pk=pk)
+        if transfer['status'] == TransferRecord.Status.PENDING:
+            return Response(transfer, headers={'Retry-After': '1'})
+        if transfer['status'] == TransferRecord.Status.REJECTED:
+            transfer['error'] = REJECTED_ERROR
+        return Response(transfer)
+
+class AssignmentRecordViewSet(ReplicaReadsMixin, BaseScopedMixin, RollupCorrectionMixin, LedgerExportMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows Assignment Records to be viewed or edited.
     """
-    queryset = AssignmentRecord.objects.all().order_by('-assignment_date')
+    queryset = AssignmentRecord.objects.select_related('assigned_to').order_by('-assignment_date', '-id')
     serializer_class = AssignmentRecordSerializer
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-assignment_date', '-id')
+    filter_backends = [ListFilterBackend]
+    filter_fields = {'assigned_to': 'assigned_to_id'}
+    export_date_field = 'assignment_date'
+    export_columns = (
+        ('id', 'id'),
+        ('assignment_date', 'assignment_date'),
+        ('issuing_base_id', 'issuing_base_id'),
+        ('issuing_base', 'issuing_base__name'),
+        ('equipment_type_id', 'equipment_type_id'),
+        ('equipment_type', 'equipment_type__name'),
+        ('category', 'equipment_type__category'),
+        ('quantity', 'quantity'),
+        ('assigned_to_id', 'assigned_to_id'),
+        ('assigned_to', 'assigned_to__username'),
+    )
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -58,30 +140,49 @@ class AssignmentRecordViewSet(viewsets.ModelViewSet):
         equipment_type = serializer.validated_data['equipment_type']
         quantity = serializer.validated_data['quantity']
         
-        with transaction.atomic():
-            # Check if base has enough assets to assign
-            inventory = AssetInventory.objects.get(base=issuing_base, equipment_type=equipment_type)
-            if inventory.quantity < quantity:
-                return Response(
-                    {"error": "Insufficient assets at issuing base for assignment."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Decrement from inventory
-            inventory.quantity -= quantity
-            inventory.save()
-            
-            # Save the assignment record
-            serializer.save()
+        try:
+            with transaction.atomic():
+                # Decrement from inventory only if enough assets remain
+                inventory.withdraw(issuing_base.id, equipment_type.id, quantity)
+
+                # Save the assignment record and fold it into the daily rollup
+                assignment = serializer.save()
+                record_movement(assignment)
+        except inventory.InsufficientStock:
+            metrics.inventory_conflict(self.basename)
+            return Response(
+                {"error": "Insufficient assets at issuing base for assignment."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
             
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-class ExpenditureRecordViewSet(viewsets.ModelViewSet):
+class ExpenditureRecordViewSet(ReplicaReadsMixin, BaseScopedMixin, RollupCorrectionMixin, BulkCreateMixin, LedgerExportMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows Expenditure Records to be viewed or edited.
     """
-    queryset = ExpenditureRecord.objects.all().order_by('-expenditure_date')
+    queryset = ExpenditureRecord.objects.order_by('-expenditure_date', '-id')
     serializer_class = ExpenditureRecordSerializer
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-expenditure_date', '-id')
+    filter_backends = [ListFilterBackend]
+    search_fields = ('notes',)
+    export_date_field = 'expenditure_date'
+    export_columns = (
+        ('id', 'id'),
+        ('expenditure_date', 'expenditure_date'),
+        ('base_id', 'base_id'),
+        ('base', 'base__name'),
+        ('equipment_type_id', 'equipment_type_id'),
+        ('equipment_type', 'equipment_type__name'),
+        ('category', 'equipment_type__category'),
+        ('quantity', 'quantity'),
+        ('notes', 'notes'),
+    )
+    insufficient_stock_error = "Insufficient assets at base for expenditure."
+
+    def bulk_movements(self, expenditure):
+        return [(expenditure.base_id, expenditure.equipment_type_id, -expenditure.quantity)]
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -91,21 +192,20 @@ class ExpenditureRecordViewSet(viewsets.ModelViewSet):
         equipment_type = serializer.validated_data['equipment_type']
         quantity = serializer.validated_data['quantity']
         
-        with transaction.atomic():
-            # Check if base has enough assets to expend
-            inventory = AssetInventory.objects.get(base=base, equipment_type=equipment_type)
-            if inventory.quantity < quantity:
-                return Response(
-                    {"error": "Insufficient assets at base for expenditure."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Decrement from inventory
-            inventory.quantity -= quantity
-            inventory.save()
-            
-            # Save the expenditure record
-            serializer.save()
+        try:
+            with transaction.atomic():
+                # Decrement from inventory only if enough assets remain
+                inventory.withdraw(base.id, equipment_type.id, quantity)
+
+                # Save the expenditure record and fold it into the daily rollup
+                expenditure = serializer.save()
+                record_movement(expenditure)
+        except inventory.InsufficientStock:
+            metrics.inventory_conflict(self.basename)
+            return Response(
+                {"error": "Insufficient assets at base for expenditure."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
             
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -0,0 +1,67 @@
+# Logging plumbing for the structured API access log written by
+# APILoggingMiddleware. Imported by the LOGGING config, so it must not touch
+# models or settings at import time.
+import atexit
+import json
+import logging
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+
+class JSONFormatter(logging.Formatter):
+    """Render an access record (the `access` attribute) as one JSON line."""
+
+    def format(self, record):
+        entry = {'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat()}
+        entry.update(getattr(record, 'access', None) or {'message': record.getMessage()})
+        return json.dumps(entry, default=str)
+
+
+class _ForwardToLogger(logging.Handler):
+    """Hands records pulled off the queue to the handlers of `sink_logger`."""
+
+    def __init__(self, sink_logger):
+        super().__init__()
+        self.sink_logger = sink_logger
+
+    def emit(self, record):
+        logging.getLogger(self.sink_logger).handle(record)
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room rather than fail on a full queue; the thread is draining it
+        self.queue.put(self._sentinel)
+
+
+class QueueListenerHandler(QueueHandler):
+    """
+    Puts records on a bounded in-memory queue; a QueueListener thread passes
+    them on to the handlers configured for `sink_logger`. The request thread
+    only pays for a put_nowait(), so a slow sink (file, socket, collector)
+    never blocks a worker. When the queue is full the record is dropped and
+    counted rather than waited on.
+    """
+
+    def __init__(self, sink_logger, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+        self.listener = _Listener(self.queue, _ForwardToLogger(sink_logger))
+        self.listener.start()
+        self._running = True
+        atexit.register(self.close)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        """Flush queued records to the sink and stop the listener thread."""
+        if self._running:
+            self._running = False
+            self.listener.stop()
+            atexit.unregister(self.close)
+        super().close()
@@ -0,0 +1,125 @@
+"""
+Async request handling for the ASGI deployment (settings.ASYNC_VIEWS).
+
+Database work from async views runs in a bounded pool of worker threads,
+each with its own persistent connection, so independent queries of one
+request run concurrently and a slow client never holds a thread: only the
+event loop waits on it. The pool size (ASYNC_DB_THREADS) caps the number of
+connections a process opens.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from inspect import isawaitable
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection, connections
+from django.urls import path
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.views import APIView
+
+from . import db_router
+
+_executor = None
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'ASYNC_DB_THREADS', 8), thread_name_prefix='async-db',
+        )
+    return _executor
+
+
+def _call(timer, scope, fn, args, kwargs):
+    # Pool threads live outside the request cycle, so they expire their own
+    # connections the way request_started/request_finished would.
+    close_old_connections()
+    try:
+        with ExitStack() as stack:
+            stack.enter_context(db_router.use_scope(scope))
+            if timer is not None:
+                for pool_connection in connections.all():
+                    stack.enter_context(pool_connection.execute_wrapper(timer))
+            return fn(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_in_pool(fn, *args, timer=None, **kwargs):
+    """
+    Run blocking `fn` in the database pool; `timer` (a request's db_timer)
+    counts its queries. Inside a transaction the call stays on the
+    request's own connection instead: a pool connection could not see the
+    uncommitted rows.
+    """
+    if connection.in_atomic_block:
+        return await sync_to_async(fn)(*args, **kwargs)
+    # run_in_executor does not copy the caller's context, so each pool
+    # thread keeps its own connection rather than sharing the request's;
+    # the replica routing scope is handed over explicitly instead.
+    loop = asyncio.get_running_loop()
+    call = functools.partial(_call, timer, db_router.current_scope(), fn, args, kwargs)
+    return await loop.run_in_executor(executor(), call)
+
+
+async def gather(*calls, timer=None):
+    """Run (fn, *args) calls concurrently in the pool; returns their results in order."""
+    return await asyncio.gather(*(run_in_pool(fn, *args, timer=timer) for fn, *args in calls))
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers are coroutines. Authentication, permission and
+    throttle checks are synchronous and run in a worker thread before the
+    handler; error handling and response finalisation are APIView's.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+def async_list_routes(router):
+    """
+    URL patterns that serve the list route of every viewset in `router`
+    from the database pool, for inclusion ahead of `router.urls`. Reads
+    (GET, HEAD) run in the pool; other methods on the route (create) run
+    the viewset as usual. Empty unless settings.ASYNC_VIEWS is on, so WSGI
+    deployments keep the plain synchronous views.
+    """
+    if not getattr(settings, 'ASYNC_VIEWS', False):
+        return []
+    patterns = []
+    for prefix, viewset, basename in router.registry:
+        mapping = router.get_method_map(viewset, {'get': 'list', 'post': 'create'})
+        if 'get' not in mapping:
+            continue
+        sync_view = viewset.as_view(mapping, basename=basename, detail=False, suffix='List')
+
+        async def view(request, *args, sync_view=sync_view, **kwargs):
+            if request.method in ('GET', 'HEAD'):
+                return await run_in_pool(sync_view, request, *args, timer=getattr(request, 'db_timer', None), **kwargs)
+            return await sync_to_async(sync_view)(request, *args, **kwargs)
+
+        patterns.append(path(f'{prefix}/', csrf_exempt(view), name=f'{basename}-list'))
+    return patterns
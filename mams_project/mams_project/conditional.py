@@ -0,0 +1,81 @@
+"""
+Conditional GET for read endpoints whose content is versioned by cheap
+counters: the reference data (assets/refcache.py) and the dashboard summary
+(assets/dashboard_cache.py).
+
+A view derives its ETag, and Last-Modified where the time of the last
+change is known, from the counters before doing any other work. A request
+whose If-None-Match (or If-Modified-Since) still matches is answered
+304 Not Modified without running the serializers or the aggregation
+queries. Nothing is hashed after rendering.
+
+The counters only follow other workers' writes when they live in a shared
+cache (see shared_cache.py). Over a process-local cache no validators are
+sent (an ETag of None), since a 304 could then confirm stale data
+indefinitely.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .shared_cache import is_shared
+
+
+def etag(*parts):
+    """A weak ETag for the given version parts; the JSON and browsable renderings share it."""
+    digest = hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def not_modified(request, etag, last_modified=None):
+    """Return the 304 response for `request` if its validators match, else None."""
+    if etag is None or request.method not in ('GET', 'HEAD'):
+        return None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        add_validators(response, etag, last_modified)
+    return response
+
+
+def add_validators(response, etag, last_modified=None):
+    """Send the validators with a successful response and make clients revalidate it."""
+    if etag is None or response.status_code not in (200, 304):
+        return response
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Responses depend on who asks (base scoping), so only the client may
+    # store them, and it must check back before reusing one
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Answer a viewset's list and retrieve conditionally. Viewsets over
+    reference data set `conditional_cache` to its ReferenceCache; others
+    implement get_validators(request), returning (etag or None,
+    last_modified or None).
+    """
+    conditional_cache = None
+
+    def get_validators(self, request):
+        if not is_shared():
+            return None, None
+        version, changed_at = self.conditional_cache.validators()
+        return etag(self.conditional_cache.version_key, version), changed_at
+
+    def conditionally(self, handler, request, *args, **kwargs):
+        tag, last_modified = self.get_validators(request)
+        response = not_modified(request, tag, last_modified)
+        if response is None:
+            response = add_validators(handler(request, *args, **kwargs), tag, last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditionally(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditionally(super().retrieve, request, *args, **kwargs)
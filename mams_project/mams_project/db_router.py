@@ -0,0 +1,104 @@
+"""
+Read/write split between the primary ('default') and the read replicas
+listed in settings.DATABASE_REPLICAS.
+
+Reads go to a replica only inside replica_reads(), which the dashboard,
+list and export views open, and only until the first write in that scope:
+from then on the scope reads its own writes from the primary. Everything
+else, including every create endpoint, reads and writes the primary, so
+stock checks never see a lagging copy of the inventory.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+PRIMARY = 'default'
+
+_scope = ContextVar('replica_reads', default=None)
+
+
+def replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+@contextmanager
+def replica_reads():
+    """Let reads made in this block (and this context) use a replica."""
+    token = _scope.set({'alias': None, 'pinned': False})
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def current_scope():
+    return _scope.get()
+
+
+def reading_from_replica():
+    """Whether the reads of the current scope have gone to a replica."""
+    scope = _scope.get()
+    return scope is not None and scope['alias'] is not None and not scope['pinned']
+
+
+@contextmanager
+def use_scope(scope):
+    """Carry a request's routing scope into a worker thread."""
+    token = _scope.set(scope)
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+class ReadReplicaRouter:
+    """
+    One replica is picked per scope and kept for it, so the reads of one
+    request never go back in time by switching to a replica that lags more.
+    """
+
+    def db_for_read(self, model, **hints):
+        scope = _scope.get()
+        if scope is None or scope['pinned']:
+            return None
+        if scope['alias'] is None:
+            aliases = replicas()
+            if not aliases:
+                return None
+            scope['alias'] = random.choice(aliases)
+        return scope['alias']
+
+    def db_for_write(self, model, **hints):
+        scope = _scope.get()
+        if scope is not None:
+            scope['pinned'] = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        aliases = {PRIMARY, *replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+class ReplicaReadsMixin:
+    """
+    Serve a view's read-only requests from a replica: the `replica_actions`
+    of a viewset, or every GET of a plain APIView.
+    """
+    replica_actions = ('list', 'export')
+
+    def reads_from_replica(self, request):
+        action_map = getattr(self, 'action_map', None)
+        if action_map is not None:
+            return action_map.get(request.method.lower()) in self.replica_actions
+        return request.method in ('GET', 'HEAD')
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.reads_from_replica(request):
+            return super().dispatch(request, *args, **kwargs)
+        with replica_reads():
+            return super().dispatch(request, *args, **kwargs)
@@ -0,0 +1,77 @@
+# Prometheus metrics for the API, exposed at /api/metrics/.
+#
+# With several worker processes, set PROMETHEUS_MULTIPROC_DIR to an empty
+# writable directory before the workers start: every process then writes its
+# samples to files there and the endpoint aggregates them, whichever worker
+# serves the scrape (see gunicorn.conf.py for the cleanup hooks).
+import os
+
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+from rest_framework.views import APIView
+
+from .permissions import IsAdminUser
+
+REQUEST_LATENCY = Histogram(
+    'mams_http_request_duration_seconds', "Time spent handling a request.",
+    ['method', 'route', 'status'],
+    buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10),
+)
+REQUEST_DB_TIME = Histogram(
+    'mams_http_request_db_duration_seconds', "Time spent in database calls per request.",
+    ['route'],
+    buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5),
+)
+REQUEST_DB_QUERIES = Histogram(
+    'mams_http_request_db_queries', "Database queries executed per request.",
+    ['route'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+RESPONSE_SIZE = Histogram(
+    'mams_http_response_size_bytes', "Size of non-streaming response bodies.",
+    ['route'],
+    buckets=(100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000),
+)
+INVENTORY_CONFLICTS = Counter(
+    'mams_inventory_conflicts_total', "Inventory writes rejected because the base held too little stock.",
+    ['ledger'],
+)
+INVENTORY_SHARDING = Counter(
+    'mams_inventory_sharding_total', "Inventory pairs promoted to sharded counters or demoted back.",
+    ['event'],
+)
+
+
+def observe_request(method, route, status, latency, db_seconds, db_queries, size=None):
+    REQUEST_LATENCY.labels(method, route, status).observe(latency)
+    REQUEST_DB_TIME.labels(route).observe(db_seconds)
+    REQUEST_DB_QUERIES.labels(route).observe(db_queries)
+    if size is not None:
+        RESPONSE_SIZE.labels(route).observe(size)
+
+
+def inventory_conflict(ledger, count=1):
+    INVENTORY_CONFLICTS.labels(ledger).inc(count)
+
+
+def inventory_sharding(event):
+    INVENTORY_SHARDING.labels(event).inc()
+
+
+def registry():
+    """The registry to expose: this process's, or every worker's in multi-process mode."""
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    aggregated = CollectorRegistry()
+    multiprocess.MultiProcessCollector(aggregated)
+    return aggregated
+
+
+class MetricsView(APIView):
+    """Prometheus text exposition of the API metrics. Admins only."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(generate_latest(registry()), content_type=CONTENT_TYPE_LATEST)
@@ -1,20 +1,195 @@
-# Create a new file: mams_project/middleware.py
 import logging
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
 
-logger = logging.getLogger(__name__)
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.utils.functional import SimpleLazyObject, empty
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import metrics
+
+logger = logging.getLogger('mams_project.access')
+
+
+class _DBTimer:
+    """
+    execute_wrapper that adds up the time spent in database calls. Async
+    views may run a request's queries on several threads at once.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.seconds += elapsed
+                self.queries += 1
+
+
+@contextmanager
+def track_db(request):
+    """
+    Time every database call made while handling `request`, on all
+    connections. The timer is stored as `request.db_timer` and reused by
+    inner middleware, so queries are only wrapped once.
+    """
+    timer = getattr(request, 'db_timer', None)
+    if timer is not None:
+        yield timer
+        return
+    timer = request.db_timer = _DBTimer()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timer))
+        yield timer
+
+
+def route_name(request):
+    match = request.resolver_match
+    return match.view_name if match else None
+
+
+class AsyncCapableMiddleware:
+    """
+    Base for middleware that runs under both WSGI and ASGI: subclasses
+    implement `__acall__` next to `__call__`, and the async one is used when
+    the rest of the stack is async, so ASGI requests never drop to a thread.
+    """
+    sync_capable = True
+    async_capable = True
 
-class APILoggingMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoiseMiddleware that also passes ASGI requests through without a thread."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        static_file = self.find_file(request.path_info) if self.autorefresh else self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+class MetricsMiddleware(AsyncCapableMiddleware):
+    """
+    Records latency, database time, query count and response size of every
+    request in the Prometheus metrics (labelled by route name) and reports
+    the timings to the client in a Server-Timing header. Goes first in
+    MIDDLEWARE so the latency covers the whole stack.
+    """
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with track_db(request) as timer:
+            response = self.get_response(request)
+        return self.record(request, response, started, timer)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with track_db(request) as timer:
+            response = await self.get_response(request)
+        return self.record(request, response, started, timer)
+
+    def record(self, request, response, started, timer):
+        latency = time.perf_counter() - started
+        route = route_name(request) or 'unmatched'
+        size = None if response.streaming else len(response.content)
+        metrics.observe_request(request.method, route, response.status_code, latency, timer.seconds, timer.queries, size)
+        response['Server-Timing'] = (
+            f'app;dur={latency * 1000:.1f}, db;dur={timer.seconds * 1000:.1f};desc="{timer.queries} queries"'
+        )
+        return response
+
+
+class APILoggingMiddleware(AsyncCapableMiddleware):
+    """
+    Structured access log for `/api/` requests: method, route name, user id,
+    status, total latency and database time, emitted once the response is
+    ready. Records go to the `mams_project.access` logger, which settings
+    route through a queue so the request thread never waits on the sink.
+
+    ACCESS_LOG_SAMPLE_RATES maps route names to the fraction of requests to
+    log (default ACCESS_LOG_DEFAULT_SAMPLE_RATE); server errors are always
+    logged.
+    """
 
     def __call__(self, request):
-        # Log before the view is called
-        if request.path.startswith('/api/'):
-            user = request.user if request.user.is_authenticated else 'Anonymous'
-            log_data = f"API Request: {request.method} {request.path} by User: {user}"
-            logger.info(log_data)
-        
-        response = self.get_response(request)
-        
-        # Could also log response data here if needed
-        return response
\ No newline at end of file
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled(request):
+            return self.get_response(request)
+        started = time.perf_counter()
+        with track_db(request) as timer:
+            queries, seconds = timer.queries, timer.seconds
+            response = self.get_response(request)
+        self.log(request, response, started, timer, queries, seconds)
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled(request):
+            return await self.get_response(request)
+        started = time.perf_counter()
+        with track_db(request) as timer:
+            queries, seconds = timer.queries, timer.seconds
+            response = await self.get_response(request)
+        self.log(request, response, started, timer, queries, seconds)
+        return response
+
+    def enabled(self, request):
+        return request.path.startswith('/api/') and logger.isEnabledFor(logging.INFO)
+
+    def log(self, request, response, started, timer, queries, seconds):
+        latency = time.perf_counter() - started
+        route = route_name(request)
+        if response.status_code < 500 and not self.sampled(route):
+            return
+
+        user = getattr(request, 'user', None)
+        if isinstance(user, SimpleLazyObject) and user._wrapped is empty:
+            # Never resolved by a view; loading the session here would be a
+            # query (and is not allowed on the event loop)
+            user = None
+        logger.info("%s %s %s", request.method, route or request.path, response.status_code, extra={'access': {
+            'method': request.method,
+            'route': route,
+            'path': request.path,
+            'user_id': user.pk if user is not None and user.is_authenticated else None,
+            'status': response.status_code,
+            'latency_ms': round(latency * 1000, 3),
+            'db_ms': round((timer.seconds - seconds) * 1000, 3),
+            'db_queries': timer.queries - queries,
+        }})
+
+    def sampled(self, route):
+        rates = getattr(settings, 'ACCESS_LOG_SAMPLE_RATES', {})
+        rate = rates.get(route, getattr(settings, 'ACCESS_LOG_DEFAULT_SAMPLE_RATE', 1.0))
+        return rate >= 1 or random.random() < rate
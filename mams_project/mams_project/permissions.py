@@ -11,11 +11,11 @@ class IsBaseCommander(BasePermission):
     
     def has_object_permission(self, request, view, obj):
         # Allow commander to see/edit objects related to their own base
-        if hasattr(obj, 'base'):
-            return obj.base == request.user.base
-        if hasattr(obj, 'from_base'): # For transfers
-            return obj.from_base == request.user.base or obj.to_base == request.user.base
-        return False
+        # Compare ids so neither the object's base nor the user's is loaded;
+        # ledger models name their base FKs in `base_fields` (see
+        # assets.scoping.BaseScopedQuerySet)
+        fields = getattr(obj, 'base_fields', ('base',) if hasattr(obj, 'base_id') else ())
+        return any(getattr(obj, f'{field}_id') == request.user.base_id for field in fields)
 
 # ... other roles
 class IsLogisticsOfficer(BasePermission):
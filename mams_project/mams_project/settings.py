@@ -52,8 +52,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'mams_project.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'mams_project.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -87,7 +88,7 @@ AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         # Set a default policy. We require authentication for all endpoints by default.
@@ -101,6 +102,52 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
 }
 
+# How long a user's active flag, token version and row are cached by the
+# claims-based JWT authentication
+USER_AUTH_CACHE_TTL = int(os.getenv('USER_AUTH_CACHE_TTL', '60'))
+
+# Upper bound on the number of records accepted by one bulk ingestion request
+BULK_MAX_ROWS = int(os.getenv('BULK_MAX_ROWS', '10000'))
+
+# Keyset pagination of the ledger list endpoints; clients may ask for up to
+# LEDGER_MAX_PAGE_SIZE rows with ?page_size=
+LEDGER_PAGE_SIZE = int(os.getenv('LEDGER_PAGE_SIZE', '50'))
+LEDGER_MAX_PAGE_SIZE = int(os.getenv('LEDGER_MAX_PAGE_SIZE', '500'))
+
+# Rows fetched per server-side cursor round trip by the streaming ledger exports
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))
+
+# Text search of the list endpoints without pg_trgm (assets/search.py): the
+# in-memory index of a column is rebuilt every SEARCH_INDEX_REBUILD_INTERVAL
+# seconds, and a prefix matching more than SEARCH_MAX_VALUES distinct values
+# is scanned for instead.
+SEARCH_INDEX_REBUILD_INTERVAL = int(os.getenv('SEARCH_INDEX_REBUILD_INTERVAL', '300'))
+SEARCH_MAX_VALUES = int(os.getenv('SEARCH_MAX_VALUES', '1000'))
+
+# Serve the dashboard and list endpoints from async views; asgi.py turns this
+# on, WSGI deployments keep the synchronous views. Database work of async
+# views runs in a pool of ASYNC_DB_THREADS threads (one connection each).
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+ASYNC_DB_THREADS = int(os.getenv('ASYNC_DB_THREADS', '8'))
+
+# Accept transfers as PENDING and answer 202 instead of moving the stock
+# inside the request; the process_transfers worker settles up to
+# TRANSFER_QUEUE_BATCH_SIZE pending transfers per transaction.
+TRANSFERS_ASYNC = os.getenv('TRANSFERS_ASYNC', 'False') == 'True'
+TRANSFER_QUEUE_BATCH_SIZE = int(os.getenv('TRANSFER_QUEUE_BATCH_SIZE', '500'))
+
+# Sharded stock counters (assets/sharding.py). A (base, equipment_type) pair
+# whose stock updates take longer than INVENTORY_CONTENTION_WAIT seconds
+# INVENTORY_PROMOTE_AFTER times within one INVENTORY_CONTENTION_WINDOW
+# (seconds) is split over INVENTORY_SHARDS rows; 0 leaves every pair in one
+# row. rebalance_inventory_shards folds back pairs that saw fewer than
+# INVENTORY_DEMOTE_BELOW writes in the last window.
+INVENTORY_SHARDS = int(os.getenv('INVENTORY_SHARDS', '0'))
+INVENTORY_CONTENTION_WAIT = float(os.getenv('INVENTORY_CONTENTION_WAIT', '0.05'))
+INVENTORY_PROMOTE_AFTER = int(os.getenv('INVENTORY_PROMOTE_AFTER', '20'))
+INVENTORY_CONTENTION_WINDOW = int(os.getenv('INVENTORY_CONTENTION_WINDOW', '60'))
+INVENTORY_DEMOTE_BELOW = int(os.getenv('INVENTORY_DEMOTE_BELOW', '30'))
+
 # CORS settings to allow your Next.js frontend to connect
 CORS_ALLOWED_ORIGINS = [
     "https://military-asset-management-system-eight.vercel.app",
@@ -121,9 +168,114 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD', 'your_db_password'),
         'HOST': os.getenv('DB_HOST', 'localhost'),
         'PORT': os.getenv('DB_PORT', '5432'),
+        # Keep connections open between requests, checking them before reuse
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# Read replicas, as comma-separated host[:port] in DB_REPLICA_HOSTS; they are
+# added as replica_1, replica_2, ... and serve the dashboard, list and export
+# reads (see mams_project/db_router.py). DB_REPLICA_NAME lets a second local
+# database stand in for a replica during development.
+DATABASE_REPLICAS = []
+for _number, _address in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    _host, _, _port = _address.strip().partition(':')
+    DATABASES[f'replica_{_number}'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'HOST': _host,
+        'PORT': _port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{_number}')
+DATABASE_ROUTERS = ['mams_project.db_router.ReadReplicaRouter']
+
+# Seconds a replica may lag the primary. Dashboard figures computed on a
+# replica this soon after a write to their scope are served but not cached.
+REPLICA_LAG_WINDOW = float(os.getenv('REPLICA_LAG_WINDOW', '2'))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Defaults to per-process local memory; point CACHE_BACKEND/CACHE_LOCATION at a
+# shared backend (e.g. django.core.cache.backends.redis.RedisCache) in production.
+# The version counters that invalidate cached data live in this cache, so a
+# local-memory cache is only correct for a single process: gunicorn refuses to
+# start several workers with one (see gunicorn.conf.py).
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'mams-default'),
     }
 }
 
+# Dashboard summaries are invalidated by writes through the version counters
+# in a shared cache. With a process-local cache, writes made by other
+# processes (management commands, the transfer queue) are not seen, so
+# entries there live at most LOCAL_CACHE_MAX_TIMEOUT seconds.
+DASHBOARD_CACHE_ALIAS = 'default'
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_CACHE_TIMEOUT', '300'))
+LOCAL_CACHE_MAX_TIMEOUT = int(os.getenv('LOCAL_CACHE_MAX_TIMEOUT', '5'))
+
+# How often (seconds) each worker checks whether bases or equipment types
+# changed in another process and its in-memory copy must be reloaded.
+REFERENCE_CACHE_CHECK_INTERVAL = float(os.getenv('REFERENCE_CACHE_CHECK_INTERVAL', '5'))
+
+
+# Logging
+# https://docs.djangoproject.com/en/5.2/topics/logging/
+# APILoggingMiddleware writes one structured record per API request to
+# `mams_project.access`. That logger only enqueues; a background listener
+# hands records to the handlers of `mams_project.access_sink`, which is where
+# file/socket/collector handlers belong.
+
+ACCESS_LOG_LEVEL = os.getenv('ACCESS_LOG_LEVEL', 'INFO')
+ACCESS_LOG_QUEUE_SIZE = int(os.getenv('ACCESS_LOG_QUEUE_SIZE', '10000'))
+
+# Fraction of requests logged per route name, e.g. {'dashboard-summary': 0.1};
+# routes not listed use the default. 5xx responses are always logged.
+ACCESS_LOG_DEFAULT_SAMPLE_RATE = float(os.getenv('ACCESS_LOG_DEFAULT_SAMPLE_RATE', '1.0'))
+ACCESS_LOG_SAMPLE_RATES = {}
+
+# Print the records to stderr as JSON lines, e.g. for a container's log
+# collector. Off by default, so tests and management commands stay quiet.
+ACCESS_LOG_CONSOLE = os.getenv('ACCESS_LOG_CONSOLE', 'False') == 'True'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'access_json': {'()': 'mams_project.access_log.JSONFormatter'},
+    },
+    'handlers': {
+        'access_queue': {
+            '()': 'mams_project.access_log.QueueListenerHandler',
+            'sink_logger': 'mams_project.access_sink',
+            'maxsize': ACCESS_LOG_QUEUE_SIZE,
+        },
+        'access_console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'access_json',
+        } if ACCESS_LOG_CONSOLE else {
+            'class': 'logging.NullHandler',
+        },
+    },
+    'loggers': {
+        'mams_project.access': {
+            'handlers': ['access_queue'],
+            'level': ACCESS_LOG_LEVEL,
+            'propagate': False,
+        },
+        'mams_project.access_sink': {
+            'handlers': ['access_console'],
+            'level': ACCESS_LOG_LEVEL,
+            'propagate': False,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -0,0 +1,19 @@
+"""
+Whether a Django cache is shared by every process serving the site.
+
+The version counters kept in the cache (dashboard summaries, reference
+data, and the ETags derived from both) only invalidate across workers when
+all of them read the same cache. LocMemCache, the default, is private to
+one process, and DummyCache keeps nothing.
+"""
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS
+
+PROCESS_LOCAL_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def is_shared(alias=DEFAULT_CACHE_ALIAS):
+    return settings.CACHES[alias]['BACKEND'] not in PROCESS_LOCAL_BACKENDS
@@ -0,0 +1,79 @@
+# Shared helpers for the app test suites.
+import re
+import tempfile
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+
+def shared_cache():
+    """
+    override_settings giving the default cache a backend that is shared
+    across processes (a temporary directory), as in production.
+    """
+    return override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': tempfile.mkdtemp(prefix='mams-test-cache-'),
+    }})
+
+
+class QueryPlanAssertionsMixin:
+    """
+    Assertions over EXPLAIN output for TestCase subclasses.
+
+    Test tables are tiny, so on PostgreSQL sequential scans are disabled for
+    the test transaction: the planner then only picks a sequential scan when
+    no usable index exists, which is exactly what these tests guard against.
+    """
+
+    def setUp(self):
+        super().setUp()
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def _sequential_scan_pattern(self, table):
+        if connection.vendor == 'postgresql':
+            return rf'Seq Scan on "?{table}"?\b'
+        # SQLite reports a full table walk as "SCAN <table>" and an index walk
+        # as "SCAN <table> USING [COVERING] INDEX <name>".
+        return rf'\bSCAN "?{table}"?(?! USING (COVERING )?INDEX)\b'
+
+    def assertUsesIndex(self, queryset, index_name=None):
+        """Assert that `queryset` never sequentially scans its model's table."""
+        plan = queryset.explain()
+        table = queryset.model._meta.db_table
+        self.assertIsNone(
+            re.search(self._sequential_scan_pattern(table), plan),
+            f"Sequential scan on {table}:\n{plan}",
+        )
+        if index_name:
+            self.assertIn(index_name, plan, f"Index {index_name} not used:\n{plan}")
+        return plan
+
+
+class ConstantQueryCountMixin:
+    """
+    Guards list endpoints against N+1 queries: the number of queries a GET
+    issues must not depend on how many rows it returns.
+    """
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(captured)
+
+    def assertConstantQueryCount(self, url, seed, few=1, many=20):
+        """
+        Call `seed(n)` to add n rows behind `url`, request it, then add more
+        rows and request it again; both requests must issue as many queries.
+        """
+        seed(few)
+        baseline = self.count_queries(url)
+        seed(many)
+        self.assertEqual(
+            self.count_queries(url), baseline,
+            f"{url} issues more queries with {few + many} rows than with {few}",
+        )
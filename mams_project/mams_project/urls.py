@@ -1,20 +1,22 @@
 # mams_project/urls.py
 from django.contrib import admin
 from django.urls import path, include
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
+from rest_framework_simplejwt.views import TokenRefreshView
+from users.views import MyTokenObtainPairView
+from .metrics import MetricsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
 
     # API Authentication Endpoints
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/token/', MyTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 
     # App-specific API Endpoints
     path('api/assets/', include('assets.urls')),
     path('api/logistics/', include('logistics.urls')),
     path('api/users/', include('users.urls')), # You would add user management endpoints here
+
+    # Prometheus scrape endpoint (admins only)
+    path('api/metrics/', MetricsView.as_view(), name='metrics'),
 ]
\ No newline at end of file
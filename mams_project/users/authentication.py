@@ -0,0 +1,147 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.functional import cached_property
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+
+AUTH_STATE_KEY = 'users:auth-state:{user_id}'
+USER_KEY = 'users:user:{user_id}'
+
+# Claims MyTokenObtainPairSerializer embeds that are enough to serve a read
+# request without loading the user row.
+REQUIRED_CLAIMS = ('role', 'base_id', 'token_version')
+
+
+def _ttl():
+    return getattr(settings, 'USER_AUTH_CACHE_TTL', 60)
+
+
+def auth_state(user_id):
+    """
+    Return {'is_active', 'token_version', 'role', 'base_id'} for a user, or
+    None if the user does not exist. Served from the cache; user saves
+    refresh it.
+    """
+    key = AUTH_STATE_KEY.format(user_id=user_id)
+    state = cache.get(key)
+    if state is None:
+        row = User.objects.filter(pk=user_id).values('is_active', 'token_version', 'role', 'base_id').first()
+        state = row or {}
+        cache.set(key, state, _ttl())
+    return state or None
+
+
+def cached_user(user_id):
+    """Return the full User, kept in the cache for USER_AUTH_CACHE_TTL seconds."""
+    key = USER_KEY.format(user_id=user_id)
+    user = cache.get(key)
+    if user is None:
+        user = User.objects.select_related('base').filter(pk=user_id).first()
+        if user is None:
+            raise AuthenticationFailed("User not found", code='user_not_found')
+        cache.set(key, user, _ttl())
+    return user
+
+
+@receiver([post_save, post_delete], sender=User)
+def _user_changed(sender, instance, **kwargs):
+    cache.delete_many([AUTH_STATE_KEY.format(user_id=instance.pk), USER_KEY.format(user_id=instance.pk)])
+
+
+class ClaimsUser(TokenUser):
+    """
+    Lightweight authenticated user built from token claims. It carries what
+    the RBAC checks need (id, username, role, base_id) without a query; any
+    other attribute is read from the full user, loaded on first use.
+    """
+
+    @cached_property
+    def id(self):
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def pk(self):
+        return self.id
+
+    @cached_property
+    def role(self):
+        return self.token['role']
+
+    @cached_property
+    def base_id(self):
+        return self.token['base_id']
+
+    @property
+    def is_staff(self):
+        return self._user.is_staff
+
+    @property
+    def is_superuser(self):
+        return self._user.is_superuser
+
+    @cached_property
+    def _user(self):
+        return cached_user(self.id)
+
+    def __str__(self):
+        return self.username
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self._user, attr)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that does not SELECT the user row per request.
+
+    Every request checks the token against the user's cached auth state, so
+    deactivated users and revoked tokens (see User.revoke_tokens) are
+    rejected, and so is a token whose role or base claims no longer match
+    the user (a refresh copies the claims it was issued with): the user
+    has to log in again for the new ones. Read requests then get a ClaimsUser built from the token;
+    writes, which may store the user on a record, get the full User from a
+    short-TTL cache. Tokens issued without the custom claims fall back to
+    the full user.
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return self.get_request_user(validated_token, request), validated_token
+
+    def get_request_user(self, validated_token, request):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as exc:
+            raise InvalidToken("Token contained no recognizable user identification") from exc
+
+        state = auth_state(user_id)
+        if state is None:
+            raise AuthenticationFailed("User not found", code='user_not_found')
+        if not state['is_active']:
+            raise AuthenticationFailed("User is inactive", code='user_inactive')
+        if validated_token.get('token_version', 0) != state['token_version']:
+            raise AuthenticationFailed("Token has been revoked", code='token_revoked')
+        for claim in ('role', 'base_id'):
+            if claim in validated_token and validated_token[claim] != state[claim]:
+                raise AuthenticationFailed("Token claims are out of date", code='token_stale')
+
+        if request.method in SAFE_METHODS and all(claim in validated_token for claim in REQUIRED_CLAIMS):
+            return ClaimsUser(validated_token)
+        return cached_user(user_id)
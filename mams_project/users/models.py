@@ -16,6 +16,14 @@ class User(AbstractUser):
 
     role = models.CharField(max_length=50, choices=Role.choices, default=Role.LOGISTICS_OFFICER)
     base = models.ForeignKey(Base, on_delete=models.SET_NULL, null=True, blank=True, related_name='personnel')
+    # Embedded in issued JWTs; bumping it invalidates every outstanding token
+    token_version = models.PositiveIntegerField(default=0)
 
     def __str__(self):
-        return self.username
\ No newline at end of file
+        return self.username
+
+    def revoke_tokens(self):
+        """Invalidate all access and refresh tokens issued to this user so far."""
+        self.token_version = models.F('token_version') + 1
+        self.save(update_fields=['token_version'])
+        self.refresh_from_db(fields=['token_version'])
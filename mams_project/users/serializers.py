@@ -116,5 +116,6 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
         # Add custom claims
         token['username'] = user.username
         token['role'] = user.role
-        token['base_id'] = user.base.id if user.base else None
+        token['base_id'] = user.base_id
+        token['token_version'] = user.token_version
         return token
\ No newline at end of file
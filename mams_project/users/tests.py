@@ -1,3 +1,142 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from assets.models import EquipmentType, AssetInventory
+from logistics.models import TransferRecord
+from .authentication import ClaimsUser
+from .models import User, Base
+from .serializers import MyTokenObtainPairSerializer
+
+
+class ClaimsAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.base = Base.objects.create(name="Main Operating Base")
+        self.other_base = Base.objects.create(name="Forward Operating Base")
+        self.equipment = EquipmentType.objects.create(name="M4 Rifle", category="Weapon")
+        self.commander = User.objects.create_user(
+            username='commander', password='password123', role=User.Role.BASE_COMMANDER, base=self.base
+        )
+        self.admin_user = User.objects.create_user(username='admin', password='password123', role=User.Role.ADMIN)
+
+    def login(self, user):
+        response = self.client.post(
+            reverse('token_obtain_pair'), {'username': user.username, 'password': 'password123'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def test_token_carries_rbac_claims(self):
+        response = self.client.post(
+            reverse('token_obtain_pair'), {'username': 'commander', 'password': 'password123'}, format='json'
+        )
+        self.assertIn('access', response.data)
+        token = AccessToken(response.data['access'])
+        self.assertEqual(token['role'], User.Role.BASE_COMMANDER)
+        self.assertEqual(token['base_id'], self.base.pk)
+        self.assertEqual(token['token_version'], 0)
+
+    def test_dashboard_rbac_runs_without_auth_queries(self):
+        self.login(self.commander)
+        url = reverse('dashboard-summary')
+        self.client.get(url)  # warms the auth state and the dashboard cache
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'base': self.other_base.pk})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        # The commander is still pinned to their own base
+        self.assertEqual(response.data['filters_applied']['base'], self.base.pk)
+
+    def test_admin_permission_checked_from_claims(self):
+        self.login(self.admin_user)
+        url = reverse('dashboard-cache-stats')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.login(self.commander)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_me_loads_full_user(self):
+        self.login(self.commander)
+        response = self.client.get(reverse('me'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['email'], self.commander.email)
+        self.assertEqual(response.data['base']['id'], self.base.pk)
+        self.assertEqual(response.data['role'], 'Base Commander')
+
+    def test_revoked_token_rejected(self):
+        self.login(self.commander)
+        url = reverse('dashboard-summary')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        self.commander.revoke_tokens()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.login(self.commander)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    def test_deactivated_user_rejected(self):
+        self.login(self.commander)
+        url = reverse('dashboard-summary')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        self.commander.is_active = False
+        self.commander.save()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_writes_use_real_user(self):
+        AssetInventory.objects.create(base=self.base, equipment_type=self.equipment, quantity=10)
+        self.login(self.admin_user)
+        response = self.client.post(reverse('transfer-list'), {
+            'equipment_type_id': self.equipment.pk,
+            'from_base_id': self.base.pk,
+            'to_base_id': self.other_base.pk,
+            'quantity': 4,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(TransferRecord.objects.get().initiated_by, self.admin_user)
+
+    def test_demoted_user_loses_claimed_role(self):
+        response = self.client.post(
+            reverse('token_obtain_pair'), {'username': 'admin', 'password': 'password123'}, format='json'
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        url = reverse('dashboard-cache-stats')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        self.admin_user.role = User.Role.LOGISTICS_OFFICER
+        self.admin_user.save()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+        # A refreshed token still carries the old claims
+        refreshed = self.client.post(reverse('token_refresh'), {'refresh': response.data['refresh']}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refreshed.data['access']}")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.login(self.admin_user)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_reassigned_commander_loses_old_base(self):
+        self.login(self.commander)
+        url = reverse('dashboard-summary')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        self.commander.base = self.other_base
+        self.commander.save()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.login(self.commander)
+        self.assertEqual(self.client.get(url).data['filters_applied']['base'], self.other_base.pk)
+
+    def test_claims_user_attributes(self):
+        token = AccessToken(str(MyTokenObtainPairSerializer.get_token(self.commander).access_token))
+        user = ClaimsUser(token)
+        with self.assertNumQueries(0):
+            self.assertEqual(user.id, self.commander.pk)
+            self.assertEqual(user.role, User.Role.BASE_COMMANDER)
+            self.assertEqual(user.base_id, self.base.pk)
+            self.assertTrue(user.is_authenticated)
+        self.assertEqual(user.base, self.base)
@@ -5,11 +5,15 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.views import TokenObtainPairView
 from .serializers import BaseSerializer, UserListDetailSerializer, MyTokenObtainPairSerializer
+from assets import refcache
+from mams_project.conditional import ConditionalGetMixin
 
-class BaseViewSet(viewsets.ReadOnlyModelViewSet):
+class BaseViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """Provides a read-only API endpoint for listing all bases."""
     queryset = Base.objects.all().order_by('name')
     serializer_class = BaseSerializer
+    # Clients revalidate with the ETag; unchanged bases answer 304
+    conditional_cache = refcache.bases
     permission_classes = [IsAuthenticated] # Only authenticated users can see the list of bases
 
 class MyTokenObtainPairView(TokenObtainPairView):